@@ -0,0 +1,88 @@
+# 节点模块以顶层模块名导入 (与节点包导入 zml_font_registry 等共享模块的方式一致)
+import atexit
+import enum
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import types
+
+ZML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zml_w")
+if ZML_DIR not in sys.path:
+    sys.path.insert(0, ZML_DIR)
+
+# ==========================================
+# ComfyUI 模块替身：在 ComfyUI 之外运行测试时，只提供节点模块导入时用到的最小接口；
+# 在 ComfyUI 环境中 (真实模块可以导入) 不做任何替换
+# ==========================================
+STUB_ROOT = tempfile.mkdtemp(prefix="zml_tests_")
+atexit.register(shutil.rmtree, STUB_ROOT, ignore_errors=True)
+
+
+def _module_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def install_stub(name, **attrs):
+    """真实模块不存在时注册同名替身模块，返回 sys.modules 中的模块"""
+    if name in sys.modules or _module_available(name):
+        return importlib.import_module(name)
+    module = types.ModuleType(name)
+    module.__path__ = []  # 允许再注册子模块
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def _stub_dir(name):
+    path = os.path.join(STUB_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+install_stub(
+    "folder_paths",
+    get_user_directory=lambda: _stub_dir("user"),
+    get_temp_directory=lambda: _stub_dir("temp"),
+    get_input_directory=lambda: _stub_dir("input"),
+    get_output_directory=lambda: _stub_dir("output"),
+    get_folder_paths=lambda folder_name: [],
+    get_filename_list=lambda folder_name: [],
+    get_full_path=lambda folder_name, filename: None,
+)
+install_stub("comfy")
+install_stub("comfy.utils")
+install_stub("comfy.sd")
+
+
+class _RouteTableStub:
+    """PromptServer.instance.routes 的替身：装饰器原样返回处理函数，测试中可直接调用"""
+    def _route(self, path, **kwargs):
+        return lambda handler: handler
+    get = post = _route
+
+
+install_stub("server", PromptServer=types.SimpleNamespace(
+    instance=types.SimpleNamespace(routes=_RouteTableStub(), send_sync=lambda *args, **kwargs: None)))
+
+
+class _LatentPreviewMethod(enum.Enum):
+    NoPreviews = "none"
+    Auto = "auto"
+    Latent2RGB = "latent2rgb"
+    TAESD = "taesd"
+
+
+install_stub("comfy.samplers")
+install_stub("comfy.sample", prepare_noise=lambda latent_image, seed, noise_inds=None: None)
+install_stub("comfy.cli_args", args=types.SimpleNamespace(preview_method=_LatentPreviewMethod.NoPreviews))
+install_stub("nodes", KSamplerAdvanced=type("KSamplerAdvanced", (), {}), VAEDecode=type("VAEDecode", (), {}))
+install_stub("latent_preview", LatentPreviewMethod=_LatentPreviewMethod, LatentPreviewer=type("LatentPreviewer", (), {}),
+             get_previewer=lambda *args, **kwargs: None, prepare_callback=lambda *args, **kwargs: None)
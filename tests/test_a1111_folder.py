@@ -0,0 +1,57 @@
+# 批量加载 A1111 数据：IS_CHANGED 随文件夹内图像的增删改与选项变化，内容不变时保持不变
+import os
+
+import pytest
+
+zml_ksampler_nodes = pytest.importorskip("zml_ksampler_nodes")
+Node = zml_ksampler_nodes.ZML_LoadA1111DataFolder
+
+OPTIONS = {"lora_output_format": "JSON格式", "跳过无数据图像": True, "线程数": 8}
+
+
+def is_changed(folder, recursive=False, **options):
+    return Node.IS_CHANGED(文件夹路径=str(folder), 包含子文件夹=recursive, **{**OPTIONS, **options})
+
+
+def test_is_changed_tracks_folder_contents(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "notes.txt").write_text("ignored")
+    first = is_changed(tmp_path)
+    assert first == is_changed(tmp_path)
+    assert isinstance(first, str)
+
+    (tmp_path / "notes.txt").write_text("still ignored")
+    assert is_changed(tmp_path) == first
+
+    (tmp_path / "b.jpg").write_bytes(b"b")
+    added = is_changed(tmp_path)
+    assert added != first
+
+    stat = os.stat(tmp_path / "a.png")
+    os.utime(tmp_path / "a.png", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    touched = is_changed(tmp_path)
+    assert touched != added
+
+    # 只有大小变化 (修改时间还原) 也能察觉
+    before = os.stat(tmp_path / "b.jpg")
+    (tmp_path / "b.jpg").write_bytes(b"bb")
+    os.utime(tmp_path / "b.jpg", ns=(before.st_atime_ns, before.st_mtime_ns))
+    assert is_changed(tmp_path) != touched
+
+
+def test_is_changed_tracks_options_and_subfolders(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.png").write_bytes(b"a")
+    base = is_changed(tmp_path)
+    assert is_changed(tmp_path, lora_output_format="A1111格式 (<>)") != base
+    assert is_changed(tmp_path, 跳过无数据图像=False) != base
+
+    recursive = is_changed(tmp_path, recursive=True)
+    (tmp_path / "sub" / "c.webp").write_bytes(b"c")
+    assert is_changed(tmp_path) == base
+    assert is_changed(tmp_path, recursive=True) != recursive
+
+
+def test_is_changed_for_missing_folder_is_stable(tmp_path):
+    missing = tmp_path / "missing"
+    assert is_changed(missing) == is_changed(missing)
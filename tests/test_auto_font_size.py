@@ -0,0 +1,85 @@
+# ZML_TextToImage 自动字号：与改动前逐字号实际排版的二分比较
+import os
+import random
+
+import pytest
+
+zml_text_annotation = pytest.importorskip("zml_text_annotation")
+from zml_font_registry import FONT_DIR, list_font_files, load_truetype, load_default_font
+
+LATIN = "The quick brown fox jumps over the lazy dog, 1990s! \\(style\\) masterpiece best_quality AVAWAYToTa"
+CJK = "这是一段用于测试自动字号的中文文本，包含标点符号。春眠不觉晓处处闻啼鸟夜来风雨声花落知多少"
+
+
+def make_real_fit(node, text, target_width, target_height, char_spacing, line_spacing, orientation, stroke_width, font_name):
+    """逐字号实际排版判断能否放下 (与改动前的 check_fit 相同)"""
+    font_path = os.path.join(FONT_DIR, font_name) if font_name != "Default" else None
+    base_safety_margin = int(target_height * 0.02)
+    max_line_dim = target_width if orientation == "横排" else target_height
+
+    def check_fit(fs):
+        if fs <= 0:
+            return False
+        font = load_truetype(font_path, fs) if font_path else load_default_font(fs)
+        lines = node._prepare_lines(text, font, char_spacing, orientation, max_dim=max_line_dim)
+        actual_w, actual_h = node._get_text_block_size(lines, font, char_spacing, line_spacing, orientation)
+        return (actual_w + 2 * stroke_width <= target_width) and \
+               (actual_h + 2 * stroke_width + base_safety_margin <= target_height)
+    return check_fit
+
+
+def reference_font_size(check_fit, user_initial_font_size, target_width, target_height):
+    """改动前的实现：逐字号实际排版的二分，再尝试 +1/+2"""
+    low, high = 1, min(4096, max(user_initial_font_size * 2, target_width, target_height, 500))
+    best = 1
+    while low <= high:
+        mid = (low + high) // 2
+        if check_fit(mid):
+            best, low = mid, mid + 1
+        else:
+            high = mid - 1
+    for i in range(1, 3):
+        if check_fit(best + i):
+            best += i
+        else:
+            break
+    return best
+
+
+def corpus(count, seed=5):
+    rng = random.Random(seed)
+    fonts = sorted(list_font_files()) + ["Default"]
+    for _ in range(count):
+        src = rng.choice([LATIN, CJK, LATIN + CJK])
+        n = rng.randint(1, len(src))
+        start = rng.randint(0, len(src) - n)
+        text = src[start:start + n]
+        if rng.random() < 0.3:
+            text = text[:len(text) // 2] + "\n" + text[len(text) // 2:]
+        yield (text, rng.choice([24, 48, 96]), rng.randint(60, 600), rng.randint(60, 600),
+               rng.randint(-5, 20), rng.randint(-5, 20), rng.choice(("横排", "竖排")), rng.choice([0, 1, 3]), rng.choice(fonts))
+
+
+def test_auto_font_size_matches_reference_bisection():
+    node = zml_text_annotation.ZML_TextToImage()
+    cases = list(corpus(60))
+    within_one = 0
+    for text, initial, width, height, cs, ls, orientation, stroke, font_name in cases:
+        check_fit = make_real_fit(node, text, width, height, cs, ls, orientation, stroke, font_name)
+        expected = reference_font_size(check_fit, initial, width, height)
+        got = node._auto_adjust_font_size(text, initial, width, height, cs, ls, orientation, stroke, FONT_DIR, font_name)
+        case = (text, initial, width, height, cs, ls, orientation, stroke, font_name, expected, got)
+
+        # 结果必须能实际放下
+        assert got == 1 or check_fit(got), case
+        if abs(got - expected) <= 1:
+            within_one += 1
+            continue
+        # 只允许在"能否放下"随字号反复 (换行导致) 的情况下偏离：此时二分本身会停在任意一段可放下的字号上
+        top = max(got, expected) + 2
+        profile = [check_fit(fs) for fs in range(1, top + 1)]
+        last_fit = max((fs for fs, ok in enumerate(profile, 1) if ok), default=0)
+        assert not all(profile[:last_fit]), case
+
+    # 整体上绝大多数情况与原二分相差不超过1号
+    assert within_one >= 0.9 * len(cases)
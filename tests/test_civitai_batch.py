@@ -0,0 +1,183 @@
+# Civitai 批量元数据获取：对本地桩 HTTP 服务器验证并发上限、按主机限速、429/5xx 退避重试与本地缓存
+import asyncio
+import json
+import os
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+zml_lora_nodes = pytest.importorskip("zml_lora_nodes")
+
+SERVER_DELAY = 0.05  # 每个请求的处理时间，使并发请求在时间上重叠
+
+
+class CivitaiStub:
+    """记录每个请求的 (开始时间, 路径) 与同时处理中的最大请求数；failures 中的路径先依次返回给定的错误码"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failures = {}
+
+    def handle(self, handler):
+        path = handler.path
+        with self.lock:
+            self.requests.append((time.monotonic(), path))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            pending = self.failures.get(path)
+            status = pending.pop(0) if pending else 200
+        try:
+            time.sleep(SERVER_DELAY)
+            if status != 200:
+                handler.send_response(status)
+                if status == 429:
+                    handler.send_header("Retry-After", "0")
+                handler.end_headers()
+                return
+            body = self.response_for(path)
+            if body is None:
+                handler.send_response(404)
+                handler.end_headers()
+                return
+            payload = json.dumps(body).encode("utf-8")
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def response_for(path):
+        if path.startswith("/api/v1/model-versions/by-hash/"):
+            digest = path.rsplit("/", 1)[1]
+            return {"modelId": int(digest[:6], 16), "trainedWords": [f"word_{digest[:6]}"],
+                    "description": "<p>version</p>", "baseModel": "SDXL 1.0", "images": []}
+        if path.startswith("/api/v1/models/"):
+            return {"name": "stub model " + path.rsplit("/", 1)[1], "description": "<p>model</p>"}
+        return None
+
+    def count(self, prefix):
+        with self.lock:
+            return sum(1 for _, path in self.requests if path.startswith(prefix))
+
+    def starts(self):
+        with self.lock:
+            return sorted(start for start, _ in self.requests)
+
+
+@pytest.fixture
+def civitai(tmp_path, monkeypatch):
+    stub = CivitaiStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stub.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    loras_dir = tmp_path / "loras"
+    loras_dir.mkdir()
+    monkeypatch.setattr(zml_lora_nodes, "CIVITAI_API_BASE", f"http://127.0.0.1:{httpd.server_address[1]}/api/v1")
+    monkeypatch.setattr(zml_lora_nodes, "CIVITAI_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(zml_lora_nodes, "civitai_rate_limiter", zml_lora_nodes.HostRateLimiter(0.0))
+    monkeypatch.setattr(zml_lora_nodes, "civitai_cache", zml_lora_nodes.JsonCacheFile(str(tmp_path / "civitai.json")))
+    monkeypatch.setattr(zml_lora_nodes, "lora_hash_cache", zml_lora_nodes.LoraHashCache(str(tmp_path / "sha256.json")))
+    monkeypatch.setattr(zml_lora_nodes.folder_paths, "get_full_path",
+                        lambda folder_name, filename: str(loras_dir / filename))
+    stub.loras_dir = loras_dir
+    stub.cache_file = str(tmp_path / "civitai.json")
+    yield stub
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_loras(stub, count):
+    names = []
+    for i in range(count):
+        name = f"lora_{i}.safetensors"
+        (stub.loras_dir / name).write_bytes(f"weights {i}".encode("utf-8"))
+        names.append(name)
+    return names
+
+
+def lora_hash(stub, name):
+    return zml_lora_nodes.calculate_sha256(str(stub.loras_dir / name))
+
+
+def run_batch(names, max_workers):
+    async def json_body():
+        return {"lora_filenames": names, "max_workers": max_workers}
+    response = asyncio.run(zml_lora_nodes.fetch_civitai_metadata_batch_api(types.SimpleNamespace(json=json_body)))
+    return json.loads(response.body)
+
+
+def test_batch_concurrency_is_bounded(civitai):
+    names = make_loras(civitai, 8)
+    result = run_batch(names, max_workers=2)
+    assert result["status"] == "success"
+    assert all(r["status"] == "success" for r in result["results"].values())
+    assert civitai.count("/api/v1/model-versions/by-hash/") == 8
+    assert civitai.max_in_flight == 2
+    # 触发词已写入 zml 子文件夹
+    assert (civitai.loras_dir / "zml" / "lora_0.txt").read_text(encoding="utf-8").startswith("word_")
+
+
+def test_requests_to_one_host_are_rate_limited(civitai, monkeypatch):
+    interval = 0.15
+    monkeypatch.setattr(zml_lora_nodes, "civitai_rate_limiter", zml_lora_nodes.HostRateLimiter(interval))
+    run_batch(make_loras(civitai, 4), max_workers=4)
+    starts = civitai.starts()
+    assert len(starts) == 8  # 每个LoRA: 按哈希查询版本 + 查询模型
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= interval - 0.02
+
+
+def test_429_and_5xx_are_retried_with_backoff(civitai):
+    names = make_loras(civitai, 1)
+    path = f"/api/v1/model-versions/by-hash/{lora_hash(civitai, names[0])}"
+    civitai.failures[path] = [429, 503, 502]
+    result = run_batch(names, max_workers=1)
+    assert result["results"][names[0]]["status"] == "success"
+    assert civitai.count(path) == 4
+    starts = [start for start, p in civitai.requests if p == path]
+    # 429 按 Retry-After (0秒) 立即重试；5xx 按 0.05s, 0.1s 指数退避
+    assert starts[2] - starts[1] >= 0.1 - 0.01 + SERVER_DELAY
+    assert starts[3] - starts[2] >= 0.2 - 0.01 + SERVER_DELAY
+
+
+def test_exhausted_retries_are_not_cached(civitai):
+    names = make_loras(civitai, 1)
+    digest = lora_hash(civitai, names[0])
+    path = f"/api/v1/model-versions/by-hash/{digest}"
+    civitai.failures[path] = [503] * (zml_lora_nodes.CIVITAI_MAX_RETRIES + 1)
+    assert zml_lora_nodes.fetch_civitai_data_by_hash(digest) is None
+    assert civitai.count(path) == zml_lora_nodes.CIVITAI_MAX_RETRIES + 1
+    assert zml_lora_nodes.civitai_cache.get_entry(digest) is None
+
+
+def test_second_lookup_is_served_from_cache_file(civitai, monkeypatch):
+    names = make_loras(civitai, 3)
+    run_batch(names, max_workers=3)
+    requests_after_batch = len(civitai.requests)
+    assert os.path.isfile(civitai.cache_file)
+
+    # 新的缓存对象只能从 civitai.json 读取结果
+    monkeypatch.setattr(zml_lora_nodes, "civitai_cache", zml_lora_nodes.JsonCacheFile(civitai.cache_file))
+    for name in names:
+        data = zml_lora_nodes.fetch_civitai_data_by_hash(lora_hash(civitai, name))
+        assert data["model"]["name"].startswith("stub model")
+    assert len(civitai.requests) == requests_after_batch
@@ -0,0 +1,86 @@
+# ZML_CropPureColorBackground 不规则形状模式：边缘连通背景与改动前逐像素BFS的一致性
+from collections import deque
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("scipy")
+zml_resolution_nodes = pytest.importorskip("zml_resolution_nodes")
+
+
+def reference_border_background(np_image, 背景颜色, target_rgb, 阈值):
+    """改动前的实现：从四条边上的背景像素出发，逐像素四连通BFS"""
+    h, w = np_image.shape[:2]
+
+    def is_background(y, x):
+        pixel = np_image[y, x]
+        if 背景颜色 == "透明":
+            return pixel[3] == 0
+        if target_rgb is None: return False
+        return np.sum(np.abs(pixel[:3].astype(np.float32) - target_rgb)) <= 阈值
+
+    border_bg_mask = np.zeros((h, w), dtype=bool); q = deque()
+    for c in range(w):
+        if is_background(0, c) and not border_bg_mask[0, c]: q.append((0, c)); border_bg_mask[0, c] = True
+        if is_background(h-1, c) and not border_bg_mask[h-1, c]: q.append((h-1, c)); border_bg_mask[h-1, c] = True
+    for r in range(1, h-1):
+        if is_background(r, 0) and not border_bg_mask[r, 0]: q.append((r, 0)); border_bg_mask[r, 0] = True
+        if is_background(r, w-1) and not border_bg_mask[r, w-1]: q.append((r, w-1)); border_bg_mask[r, w-1] = True
+    while q:
+        y, x = q.popleft()
+        for dy, dx in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            ny, nx = y + dy, x + dx
+            if 0 <= ny < h and 0 <= nx < w and not border_bg_mask[ny, nx] and is_background(ny, nx):
+                border_bg_mask[ny, nx] = True; q.append((ny, nx))
+    return border_bg_mask
+
+
+def synthetic_image(rng, h, w, bg_rgb):
+    """带接近阈值噪声的纯色背景，上面画若干圆环 (环内留有与背景同色的洞) 和透明区域"""
+    img = np.empty((h, w, 4), dtype=np.int32)
+    img[..., :3] = np.array(bg_rgb) + rng.integers(-6, 7, (h, w, 3))
+    img[..., 3] = 255
+    yy, xx = np.ogrid[:h, :w]
+    for _ in range(rng.integers(1, 5)):
+        cy, cx = rng.integers(0, h), rng.integers(0, w)
+        r = rng.integers(2, max(3, min(h, w) // 3))
+        ring = (yy - cy) ** 2 + (xx - cx) ** 2 < r * r
+        img[ring, :3] = rng.integers(0, 256, 3)
+        img[ring, 3] = rng.choice([0, 255])
+        hole = (yy - cy) ** 2 + (xx - cx) ** 2 < (r * r) // 4
+        img[hole, :3] = bg_rgb
+        img[hole, 3] = rng.choice([0, 255])
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("背景颜色, target_rgb", [
+    ("白色", (255, 255, 255)), ("黑色", (0, 0, 0)), ("绿色", (0, 255, 0)), ("透明", None), ("自定义", (18, 52, 86)),
+])
+def test_border_connected_mask_matches_bfs(背景颜色, target_rgb):
+    rng = np.random.default_rng(0)
+    bg_rgb = target_rgb if target_rgb is not None else (255, 255, 255)
+    target = np.array(target_rgb, dtype=np.float32) if target_rgb is not None else None
+    for h, w in [(2, 2), (3, 9), (31, 45), (64, 50)]:
+        for _ in range(4):
+            np_image = synthetic_image(rng, h, w, bg_rgb)
+            for 阈值 in (0, 10, 40):
+                if 背景颜色 == "透明":
+                    bg_mask = np_image[:, :, 3] == 0
+                else:
+                    bg_mask = np.sum(np.abs(np_image[..., :3].astype(np.float32) - target), axis=-1) <= 阈值
+                expected = reference_border_background(np_image, 背景颜色, target, 阈值)
+                got = zml_resolution_nodes.border_connected_mask(bg_mask)
+                assert np.array_equal(got, expected), (背景颜色, h, w, 阈值)
+
+
+def test_irregular_crop_keeps_enclosed_background():
+    # 白底上一个红色方框，框内是白色：与边缘不连通的白色应保留为不透明
+    img = np.ones((40, 50, 3), dtype=np.float32)
+    img[10:30, 15:40] = (1.0, 0.0, 0.0)
+    img[15:25, 20:35] = 1.0
+    node = zml_resolution_nodes.ZML_CropPureColorBackground()
+    (out,) = node.crop_background(torch.from_numpy(img)[None], "不规则形状", "白色", 10, 0, "无")
+    assert out.shape == (1, 20, 25, 4)
+    assert torch.all(out[0, ..., 3] == 1.0)
+    assert torch.all(out[0, 5:15, 5:20, :3] == 1.0)
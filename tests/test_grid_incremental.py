@@ -0,0 +1,78 @@
+# XY 图表节点：常驻画布增量重绘与全新节点整张绘制的结果一致，过大的图表不保留画布
+import numpy as np
+import pytest
+import torch
+
+zml_xyz_nodes = pytest.importorskip("zml_xyz_nodes")
+
+FONT = "可商用/英文/thats___.ttf"
+
+
+def make_frames(seed, count=6, h=40, w=56):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(count, h, w, 3, generator=generator)
+
+
+def custom_grid(node, images, labels, inner_border, bg):
+    return node.draw_custom_grid("字符串", labels, "右", 3, 0.0, 1.0, FONT, 14, "#000000", bg,
+                                 inner_border, "#3366CC", 5, "#000000", [images])[0]
+
+
+def xyz_grid(node, images, x_labels, tile_megapixels=0):
+    info = {"x_labels": x_labels, "y_labels": ["r1", "r2"], "x_title": "X", "y_title": "Y",
+            "count_x": 3, "count_y": 2}
+    return node.draw_grid([images], info, FONT, 14, 6, "白色", "黑色", "横向排列", 1.0, tile_megapixels)[0]
+
+
+@pytest.mark.parametrize("bg", ["#FFFFFF", ""])
+@pytest.mark.parametrize("inner_border", [0, 7])
+def test_custom_grid_incremental_matches_full_redraw(inner_border, bg):
+    node = zml_xyz_nodes.ZML_XY_Custom_Grid()
+    images = make_frames(0)
+    custom_grid(node, images, "a\nb\nc", inner_border, bg)
+    changed = images.clone()
+    changed[4] = make_frames(1, count=1)[0]
+    for labels in ("a\nb\nc", "a\nB\nc"):
+        incremental = custom_grid(node, changed, labels, inner_border, bg)
+        assert node.content_cache["canvas"] is not None
+        full = custom_grid(zml_xyz_nodes.ZML_XY_Custom_Grid(), changed, labels, inner_border, bg)
+        assert torch.equal(incremental, full)
+
+
+def test_xyz_grid_incremental_matches_full_redraw():
+    node = zml_xyz_nodes.ZML_XY_Grid_Drawer()
+    images = make_frames(0)
+    xyz_grid(node, images, ["x1", "x2", "x3"])
+    changed = images.clone()
+    changed[2] = make_frames(2, count=1)[0]
+    incremental = xyz_grid(node, changed, ["x1", "x2*", "x3"])
+    assert node.canvas_cache.canvas is not None
+    assert torch.equal(incremental, xyz_grid(zml_xyz_nodes.ZML_XY_Grid_Drawer(), changed, ["x1", "x2*", "x3"]))
+
+
+def test_large_canvas_is_not_cached(monkeypatch):
+    monkeypatch.setattr(zml_xyz_nodes, "XY_CANVAS_CACHE_MAX_PIXELS", 100)
+    digests = []
+    original = zml_xyz_nodes.tensor_frame_digests
+    monkeypatch.setattr(zml_xyz_nodes, "tensor_frame_digests", lambda t: digests.append(t) or original(t))
+
+    custom = zml_xyz_nodes.ZML_XY_Custom_Grid()
+    custom_grid(custom, make_frames(0), "a", 7, "#FFFFFF")
+    assert custom.content_cache["canvas"] is None
+
+    grid = zml_xyz_nodes.ZML_XY_Grid_Drawer()
+    xyz_grid(grid, make_frames(0), ["x1", "x2", "x3"])
+    assert grid.canvas_cache.canvas is None
+    assert digests == []
+
+
+def test_label_strip_cache_is_bounded_by_bytes():
+    cache = zml_xyz_nodes.LabelStripCache(max_bytes=3 * 100 * 100 * 3)
+    strip = lambda: np.zeros((100, 100, 3), dtype=np.uint8)
+    for i in range(10):
+        cache.get(("label", i), strip)
+    assert list(cache.entries) == [("label", 7), ("label", 8), ("label", 9)]
+    assert cache.total_bytes == 3 * 100 * 100 * 3
+    # 超过上限的单条文字条照常返回，但不进入缓存
+    big = cache.get(("label", "big"), lambda: np.zeros((200, 200, 3), dtype=np.uint8))
+    assert big.shape == (200, 200, 3) and ("label", "big") not in cache.entries
@@ -0,0 +1,103 @@
+# LoRA 预览图缩略图缓存：旧版本清理与总大小/过期清理；预览图列表的 ETag 与缩略图版本号
+import asyncio
+import json
+import os
+import time
+import types
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("aiohttp")
+zml_lora_nodes = pytest.importorskip("zml_lora_nodes")
+
+
+@pytest.fixture
+def thumb_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "thumbs"
+    monkeypatch.setattr(zml_lora_nodes, "LORA_THUMB_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(zml_lora_nodes, "LORA_THUMB_LEGACY_DIR", str(tmp_path / "legacy"))
+    monkeypatch.setattr(zml_lora_nodes, "_lora_thumb_last_prune", 0.0)
+    return cache_dir
+
+
+def save_preview(path, color, size=600):
+    Image.new("RGB", (size, size), color).save(path)
+
+
+def cached_files(cache_dir):
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(cache_dir) for f in files)
+
+
+def test_overwritten_preview_replaces_old_thumbnail(tmp_path, thumb_dir):
+    preview = tmp_path / "lora.png"
+    save_preview(preview, "red")
+    first = zml_lora_nodes.get_lora_thumbnail(str(preview), 200)
+    assert first.startswith(str(thumb_dir)) and Image.open(first).size == (256, 256)
+    assert zml_lora_nodes.get_lora_thumbnail(str(preview), 200) == first
+
+    save_preview(preview, "blue", size=700)
+    os.utime(preview, ns=(time.time_ns(), os.stat(preview).st_mtime_ns + 10**9))
+    second = zml_lora_nodes.get_lora_thumbnail(str(preview), 200)
+    assert second != first
+    assert cached_files(thumb_dir) == [second]
+
+
+def test_other_buckets_are_kept(tmp_path, thumb_dir):
+    preview = tmp_path / "lora.png"
+    save_preview(preview, "red", size=1200)
+    small = zml_lora_nodes.get_lora_thumbnail(str(preview), 100)
+    large = zml_lora_nodes.get_lora_thumbnail(str(preview), 500)
+    assert cached_files(thumb_dir) == sorted([small, large])
+
+
+def test_prune_enforces_size_cap_and_age(tmp_path, thumb_dir, monkeypatch):
+    paths = []
+    for i in range(6):
+        preview = tmp_path / f"lora_{i}.png"
+        save_preview(preview, (i * 40, 0, 0))
+        paths.append(zml_lora_nodes.get_lora_thumbnail(str(preview), 200))
+    now = time.time()
+    for i, path in enumerate(paths):
+        os.utime(path, (now - 100 + i, now - 100 + i))
+    os.utime(paths[5], (now - zml_lora_nodes.LORA_THUMB_MAX_AGE - 10,) * 2)  # 很久未使用
+    sizes = [os.path.getsize(p) for p in paths]
+
+    monkeypatch.setattr(zml_lora_nodes, "LORA_THUMB_CACHE_MAX_BYTES", sum(sizes[2:5]))
+    (tmp_path / "legacy").mkdir()
+    zml_lora_nodes.prune_lora_thumbnails(force=True)
+    assert cached_files(thumb_dir) == sorted(paths[2:5])
+    assert not (tmp_path / "legacy").exists()
+
+
+def get_images(if_none_match=""):
+    request = types.SimpleNamespace(match_info={"type": "loras"}, query={"versions": "1"},
+                                    headers={"If-None-Match": if_none_match})
+    response = asyncio.run(zml_lora_nodes.get_images(request))
+    body = json.loads(response.body) if response.status == 200 else None
+    return response.status, response.headers["ETag"], body
+
+
+def test_preview_overwritten_in_place_changes_version(tmp_path, monkeypatch):
+    root = tmp_path / "loras"
+    (root / "sub" / "zml").mkdir(parents=True)
+    (root / "sub" / "style.safetensors").write_bytes(b"lora")
+    preview = root / "sub" / "zml" / "style.png"
+    save_preview(preview, "red")
+    monkeypatch.setattr(zml_lora_nodes.folder_paths, "get_filename_list", lambda t: ["sub/style.safetensors"])
+    monkeypatch.setattr(zml_lora_nodes.folder_paths, "get_folder_paths", lambda t: [str(root)])
+
+    status, etag, body = get_images()
+    assert status == 200 and body["images"] == {"sub/style.safetensors": "sub/style.png"}
+    version = body["versions"]["sub/style.png"]
+    assert get_images(etag)[0] == 304
+
+    # 在插件之外原地覆盖预览图：目录修改时间不变，预览图自身的修改时间与大小变化
+    dir_stat = os.stat(preview.parent)
+    save_preview(preview, "blue", size=640)
+    os.utime(preview, ns=(time.time_ns(), os.stat(preview).st_mtime_ns + 10**9))
+    os.utime(preview.parent, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+
+    status, new_etag, body = get_images(etag)
+    assert status == 200 and new_etag != etag
+    assert body["versions"]["sub/style.png"] != version
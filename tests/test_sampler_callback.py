@@ -0,0 +1,114 @@
+# 采样脚本回调：编译后的闭包与改动前逐步解释指令的回调结果逐位一致，并给出每步开销的 CPU 基准
+import time
+
+import pytest
+import torch
+
+zml_ksampler_nodes = pytest.importorskip("zml_ksampler_nodes")
+
+SHAPE = (1, 4, 128, 128)
+STEPS = 20
+
+SCRIPTS = {
+    "模糊+锐化+对比度暗角": [
+        {"type": "blur_sharpen", "mode": "模糊", "strength": 0.6},
+        {"type": "blur_sharpen", "mode": "锐化", "strength": 0.3},
+        {"type": "contrast", "contrast": 1.05, "brightness": 0.02, "vignette": 0.1},
+    ],
+    "对比度暗角": [{"type": "contrast", "contrast": 1.05, "brightness": 0.02, "vignette": 0.1}],
+    "噪波+动态CFG": [{"type": "noise", "noise": 0.05}, {"type": "dynamic_cfg", "target_cfg": 5.5}],
+}
+
+
+def reference_script_step(x, instructions, cfg_state):
+    """改动前的回调：每一步重新解释指令，卷积核与暗角遮罩每次重新构建"""
+    for instr in instructions:
+        op_type = instr.get('type', 'noise')
+        if op_type == 'noise':
+            strength = instr['noise']
+            if strength != 0:
+                noise = torch.randn_like(x, device=x.device) * strength
+                x.add_(noise)
+        elif op_type == 'blur_sharpen':
+            mode = instr['mode']
+            strength = instr['strength']
+            if mode == "模糊":
+                blurred = zml_ksampler_nodes.apply_gaussian_blur(x, strength)
+                x.copy_(blurred)
+            elif mode == "锐化":
+                blurred = zml_ksampler_nodes.apply_gaussian_blur(x, 1.0)
+                detail = x - blurred
+                x.add_(detail * strength)
+        elif op_type == 'contrast':
+            c_factor = instr['contrast']
+            b_offset = instr['brightness']
+            vignette = instr.get('vignette', 0.0)
+            if c_factor != 1.0:
+                mean = x.mean(dim=(2, 3), keepdim=True)
+                x.sub_(mean).mul_(c_factor).add_(mean)
+            if b_offset != 0.0:
+                x[:, 0, :, :].add_(b_offset)
+            if vignette > 0.0:
+                B, C, H, W = x.shape
+                y_range = torch.linspace(-1, 1, H, device=x.device)
+                x_range = torch.linspace(-1, 1, W, device=x.device)
+                yy, xx = torch.meshgrid(y_range, x_range, indexing='ij')
+                dist = torch.sqrt(xx**2 + yy**2)
+                mask = dist * vignette
+                x[:, 0, :, :] = x[:, 0, :, :] - mask
+        elif op_type == 'dynamic_cfg':
+            cfg_state["val"] = instr['target_cfg']
+
+
+def reference_callback(script_map, cfg_state):
+    def callback(step, x):
+        if step in script_map:
+            reference_script_step(x, script_map[step], cfg_state)
+    return callback
+
+
+def compiled_callback(script_map, cfg_state):
+    """与 run_zml_sampler 中的 zml_callback 相同：首次回调时按形状/类型/设备编译，之后只执行闭包"""
+    compiled_cache = {}
+    def callback(step, x):
+        cache_key = (tuple(x.shape), x.dtype, x.device)
+        compiled = compiled_cache.get(cache_key)
+        if compiled is None:
+            compiled = compiled_cache[cache_key] = zml_ksampler_nodes.compile_script_ops(
+                script_map, x.shape, x.dtype, x.device, cfg_state)
+        for op in compiled.get(step, ()):
+            op(x)
+    return callback
+
+
+def run_steps(make_callback, instructions, seed=0):
+    script_map = {step: instructions for step in range(STEPS)}
+    cfg_state = {"val": 7.0}
+    callback = make_callback(script_map, cfg_state)
+    x = torch.randn(SHAPE, generator=torch.Generator().manual_seed(seed))
+    torch.manual_seed(seed)
+    start = time.perf_counter()
+    for step in range(STEPS):
+        callback(step, x)
+    return x, cfg_state["val"], (time.perf_counter() - start) / STEPS * 1000
+
+
+@pytest.mark.parametrize("name", list(SCRIPTS))
+def test_compiled_ops_match_reference_callback(name):
+    expected, expected_cfg, _ = run_steps(reference_callback, SCRIPTS[name])
+    actual, actual_cfg, _ = run_steps(compiled_callback, SCRIPTS[name])
+    assert torch.equal(expected, actual)
+    assert expected_cfg == actual_cfg
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name", list(SCRIPTS))
+def test_callback_overhead_per_step(name):
+    """python -m pytest tests -m benchmark -s 查看每步开销 (CPU, 1x4x128x128, 每步都执行脚本)"""
+    torch.set_num_threads(1)
+    for make_callback in (reference_callback, compiled_callback):
+        run_steps(make_callback, SCRIPTS[name])  # 预热
+    best = {}
+    for label, make_callback in (("逐步解释", reference_callback), ("编译闭包", compiled_callback)):
+        best[label] = min(run_steps(make_callback, SCRIPTS[name])[2] for _ in range(5))
+    print(f"\n{name}: " + ", ".join(f"{label} {ms:.3f} ms/步" for label, ms in best.items()))
@@ -0,0 +1,90 @@
+# XY 图表标签换行：断点预测与改动前逐字符测量换行的一致性 (含字距调整的西文和中文字体)
+import os
+import random
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont, features
+
+zml_xyz_nodes = pytest.importorskip("zml_xyz_nodes")
+
+FONT_DIR = os.path.join(zml_xyz_nodes.FONT_DIR, "可商用")
+FONT_FILES = [
+    os.path.join(FONT_DIR, "英文", "thats___.ttf"),   # 带字距调整 (如 "WA")
+    os.path.join(FONT_DIR, "中文", "爱点风雅黑长体.ttf"),
+    os.path.join(FONT_DIR, "中文", "nfdcsCN16.ttf"),
+]
+LAYOUTS = [ImageFont.Layout.BASIC] + ([ImageFont.Layout.RAQM] if features.check("raqm") else [])
+
+KERNED_TEXT = ["AVAWAY To Ty WA LT Yo P.", "WAWAWAWAWAWAWAWAWAWA", "Type: LoRA_v2.safetensors"]
+CJK_TEXT = ["中文字体测试模型提示词风格", "强度：0.85，步数：30。", "人物_风格化LoRA_第二版_最终"]
+ALPHABET = "abcdefghijklmnopqrstuvwxyzAVTWYLPo0123456789 _-.,:()[]/中文字体测试模型提示词风格，。！ｗ"
+
+
+def reference_wrap(draw, text, font, max_width):
+    """改动前的实现：逐字符累加测量，超过宽度就换行"""
+    lines = []
+    current_line = ""
+    for char in text:
+        test_line = current_line + char
+        w, h = zml_xyz_nodes.text_size(draw, test_line, font)
+        if w <= max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = char
+    if current_line:
+        lines.append(current_line)
+    return lines or [text]
+
+
+def corpus():
+    rng = random.Random(41)
+    texts = KERNED_TEXT + CJK_TEXT
+    texts += ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 80))) for _ in range(20)]
+    return texts
+
+
+@pytest.fixture(scope="module")
+def draw():
+    return ImageDraw.Draw(Image.new("RGB", (8, 8)))
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("size", [13, 32])
+@pytest.mark.parametrize("font_file", FONT_FILES, ids=os.path.basename)
+def test_wrap_matches_per_char_reference(draw, font_file, size, layout):
+    font = ImageFont.truetype(font_file, size, layout_engine=layout)
+    rng = random.Random(size)
+    for text in corpus():
+        full_width = zml_xyz_nodes.text_size(draw, text, font)[0]
+        for max_width in (1, size, rng.randint(size, size * 6), full_width - 1, full_width):
+            lines, _ = zml_xyz_nodes.get_wrapped_text(draw, text, font, max_width)
+            assert lines == reference_wrap(draw, text, font, max_width), (text, max_width)
+
+
+def test_multiline_text_uses_per_char_wrap(draw):
+    font = ImageFont.truetype(FONT_FILES[0], 20)
+    text = "AVAWAY\nTo Ty WA"
+    lines, _ = zml_xyz_nodes.get_wrapped_text(draw, text, font, 60)
+    assert lines == reference_wrap(draw, text, font, 60)
+
+
+@pytest.mark.parametrize("font_name", [os.path.join("可商用", "英文", "thats___.ttf"), os.path.join("可商用", "中文", "爱点风雅黑长体.ttf")])
+def test_label_fonts_use_predicted_breaks(draw, monkeypatch, font_name):
+    """节点实际使用的字体对象 (get_font 返回值) 走断点预测，每行只测量常数次"""
+    _, font_dir = zml_xyz_nodes.find_font_files()
+    font = zml_xyz_nodes.get_font(font_name, 24, font_dir)
+    assert font.layout_engine == ImageFont.Layout.BASIC
+
+    def per_char_wrap(*args):
+        raise AssertionError("标签换行退回了逐字符测量")
+    monkeypatch.setattr(zml_xyz_nodes, "_wrap_text_per_char", per_char_wrap)
+    measured = []
+    text_size = zml_xyz_nodes.text_size
+    monkeypatch.setattr(zml_xyz_nodes, "text_size", lambda d, t, f: measured.append(t) or text_size(d, t, f))
+
+    text = "".join(random.Random(7).choice(ALPHABET) for _ in range(400))
+    lines, _ = zml_xyz_nodes.get_wrapped_text(draw, text, font, 200)
+    assert len(lines) > 5
+    assert len(measured) <= 1 + 4 * len(lines)
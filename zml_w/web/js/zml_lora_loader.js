@@ -18,6 +18,14 @@ const ALL_LORAS_VIEW_PATH_IDENTIFIER = '__ALL_LORAS_VIEW__';
 function encodeRFC3986URIComponent(str) {
 	return encodeURIComponent(str).replace(/[!'()*]/g, (c) => `%${c.charCodeAt(0).toString(16).toUpperCase()}`);
 }
+// 预览图缩略图地址：按显示尺寸向服务器请求缓存的缩略图。v 是该预览图文件自身的版本（修改时间与大小），
+// 预览图未变时地址保持不变，浏览器可长期缓存；没有版本号时不带 v，服务器不会让浏览器长期缓存
+let loraImageVersions = {};
+function zmlLoraThumbUrl(imagePath, size) {
+	const px = Math.round(size * (window.devicePixelRatio || 1));
+	const version = loraImageVersions[imagePath];
+	return `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(imagePath)}?size=${px}` + (version ? `&v=${version}` : "");
+}
 const calculateImagePosition = (el, bodyRect) => {
 	let { top, left, right } = el.getBoundingClientRect();
 	const { width: bodyWidth, height: bodyRectHeight } = bodyRect; // Changed from bodyHeight to bodyRectHeight to avoid conflict
@@ -44,7 +52,10 @@ const loadImageList = async () => {
     try {
         console.log("[ZML] Loading lora image list...");
         // 修改API调用，添加参数以获取MP4格式视频
-        loraImages = await (await api.fetchApi(`${ZML_API_PREFIX}/images/loras?include_mp4=true`)).json();
+        const imagesResponse = await api.fetchApi(`${ZML_API_PREFIX}/images/loras?include_mp4=true&versions=1`);
+        const imagesData = await imagesResponse.json();
+        loraImages = imagesData.images || {};
+        loraImageVersions = imagesData.versions || {};
         // 提取并存储MP4预览视频路径
         if (loraImages && typeof loraImages === 'object') {
             // 清空现有MP4预览视频缓存
@@ -64,6 +75,7 @@ const loadImageList = async () => {
     } catch (e) {
         console.error("[ZML] Error loading lora images:", e);
         loraImages = {}; // 确保在加载失败时清空，避免无效缓存
+        loraImageVersions = {};
         globalThis.zmlGifPreviews = {}; // 同时清空GIF预览图缓存
     }
 };
@@ -550,8 +562,7 @@ app.registerExtension({
 				if (text && loraImages[text]) {
 					item.addEventListener("mouseover", () => {
 						const imagePath = loraImages[text]; // This is like "subdir/lora_name.png"
-						const fullViewPath = `loras/${imagePath}`; // Ensure correct path for /view API
-						this.imageHost.src = `${ZML_API_PREFIX}/view/${encodeRFC3986URIComponent(fullViewPath)}?${+new Date()}`;
+						this.imageHost.src = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
 						this.showImage(item);
 					});
 					item.addEventListener("mouseout", this.hideImage);
@@ -3105,7 +3116,7 @@ app.registerExtension({
                     const isSelected = zmlBatchLoraSelected.has(loraPath);
                     const isDeleted = zmlDeletedLoraFiles.has(loraPath);
                     // The /view API expects "loras/subdir/image.ext" from the client.
-                    const civitaiPreviewUrl = loraImages[loraPath] ? `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(loraImages[loraPath])}?${+new Date()}` : '';
+                    const civitaiPreviewUrl = loraImages[loraPath] ? zmlLoraThumbUrl(loraImages[loraPath], 256) : '';
                     // 新增：MP4预览模式处理
                     let previewUrl = civitaiPreviewUrl;
                     let isMp4Preview = false;
@@ -5406,8 +5417,7 @@ app.registerExtension({
                               if (ext) {
                                   loraSelectorBtn.addEventListener("mouseenter", () => {
                                       const imagePath = loraImages[entry.lora_name];
-                                      const fullViewPath = `loras/${imagePath}`;
-                                      ext.imageHost.src = `${ZML_API_PREFIX}/view/${encodeRFC3986URIComponent(fullViewPath)}?${+new Date()}`;
+                                      ext.imageHost.src = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
                                       ext.showImage(loraSelectorBtn);
                                   });
                                   loraSelectorBtn.addEventListener("mouseleave", () => {
@@ -6340,7 +6350,7 @@ app.registerExtension({
                             if (loraImages[file.fullpath] && imageHost && showImage && hideImage) {
                                 fileEl.addEventListener("mouseover", () => {
                                     const imagePath = loraImages[file.fullpath];
-                                    const fullViewPath = `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(imagePath)}?${+new Date()}`;
+                                    const fullViewPath = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
                                     imageHost.src = fullViewPath;
                                     showImage.call(ext, fileEl);
                                 });
@@ -6451,7 +6461,7 @@ app.registerExtension({
                             if (loraImages[file.fullpath] && imageHost && showImage && hideImage) {
                                 fileEl.addEventListener("mouseover", () => {
                                     const imagePath = loraImages[file.fullpath];
-                                    const fullViewPath = `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(imagePath)}?${+new Date()}`;
+                                    const fullViewPath = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
                                     imageHost.src = fullViewPath;
                                     showImage.call(ext, fileEl);
                                 });
@@ -6583,7 +6593,7 @@ app.registerExtension({
                                 if (loraImages[item.fullpath] && imageHost && showImage && hideImage) {
                                     fileEl.addEventListener("mouseover", () => {
                                         const imagePath = loraImages[item.fullpath];
-                                        const fullViewPath = `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(imagePath)}?${+new Date()}`;
+                                        const fullViewPath = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
                                         imageHost.src = fullViewPath;
                                         showImage.call(ext, fileEl);
                                     });
@@ -6653,7 +6663,7 @@ app.registerExtension({
                                                     if (loraImages[file.fullpath] && imageHost && showImage && hideImage) {
                                                         fileEl.addEventListener("mouseover", () => {
                                                             const imagePath = loraImages[file.fullpath];
-                                                            const fullViewPath = `${ZML_API_PREFIX}/view/loras/${encodeRFC3986URIComponent(imagePath)}?${+new Date()}`;
+                                                            const fullViewPath = zmlLoraThumbUrl(imagePath, IMAGE_WIDTH);
                                                             imageHost.src = fullViewPath;
                                                             showImage.call(ext, fileEl);
                                                         });
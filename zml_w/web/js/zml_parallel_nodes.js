@@ -0,0 +1,59 @@
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+
+// 多线程子工作流：接收后端推送的进度/ETA/节点耗时，并绘制在节点上
+const PARALLEL_NODE = "ZML_ParallelJsonContainer";
+
+function formatSeconds(sec) {
+    if (sec == null) return "--";
+    sec = Math.round(sec);
+    const h = Math.floor(sec / 3600);
+    const m = Math.floor((sec % 3600) / 60);
+    const s = sec % 60;
+    return h > 0 ? `${h}:${String(m).padStart(2, "0")}:${String(s).padStart(2, "0")}` : `${m}:${String(s).padStart(2, "0")}`;
+}
+
+api.addEventListener("zml_parallel_progress", ({ detail }) => {
+    if (!detail || detail.node == null) return;
+    const node = app.graph.getNodeById(parseInt(detail.node));
+    if (!node) return;
+
+    const done = detail.completed + detail.failed;
+    node.progress = detail.total > 0 ? done / detail.total : 0;
+
+    const lines = [
+        `✅ ${detail.completed}  ❌ ${detail.failed}  / ${detail.total}`,
+        `${detail.throughput.toFixed(2)} 个/秒  ETA ${formatSeconds(detail.eta)}`,
+    ];
+    for (const n of (detail.nodes || []).slice(0, 3)) {
+        lines.push(`${n.class_type}: ${(n.recent_share * 100).toFixed(1)}% (平均 ${(n.avg * 1000).toFixed(0)}ms)`);
+    }
+    node.zmlParallelStatus = lines;
+    if (done >= detail.total) node.progress = undefined;
+    node.setDirtyCanvas(true, false);
+});
+
+app.registerExtension({
+    name: "ZML.ParallelProgress",
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (nodeData.name !== PARALLEL_NODE) return;
+
+        const onDrawForeground = nodeType.prototype.onDrawForeground;
+        nodeType.prototype.onDrawForeground = function (ctx) {
+            const r = onDrawForeground ? onDrawForeground.apply(this, arguments) : undefined;
+            if (!this.zmlParallelStatus || this.flags?.collapsed) return r;
+
+            const lineHeight = 14;
+            ctx.save();
+            ctx.font = "11px sans-serif";
+            ctx.fillStyle = "#9ecbff";
+            ctx.textAlign = "left";
+            // 绘制在节点下方，避免遮挡控件
+            this.zmlParallelStatus.forEach((line, i) => {
+                ctx.fillText(line, 4, this.size[1] + lineHeight * (i + 1));
+            });
+            ctx.restore();
+            return r;
+        };
+    },
+});
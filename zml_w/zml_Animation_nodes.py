@@ -31,6 +31,7 @@ class ZML_ImageTransition:
     RETURN_NAMES = ("过渡批次", "遮罩批次")
     FUNCTION = "generate_transition"
     CATEGORY = "image/ZML_图像/图像"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def _tensor_to_pil(self, image_tensor: torch.Tensor) -> Image.Image:
         """Helper to convert ComfyUI IMAGE tensor to PIL Image (RGBA)."""
@@ -511,6 +512,7 @@ class ZML_MaskStroke:
     RETURN_NAMES = ("遮罩描边", "描边图像")
     FUNCTION = "generate_mask_stroke"
     CATEGORY = "image/ZML_图像/遮罩"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def _tensor_to_pil(self, tensor, is_mask=False):
         """将ComfyUI的张量转换为PIL图像"""
@@ -1358,6 +1360,7 @@ class ZML_MaskFillHoles:
     RETURN_NAMES = ("填充后遮罩",)
     FUNCTION = "fill_mask_holes"
     CATEGORY = "image/ZML_图像/遮罩"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def fill_mask_holes(self, 遮罩, 闭合强度):
         import scipy.ndimage as ndimage
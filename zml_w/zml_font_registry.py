@@ -0,0 +1,126 @@
+# 字体注册表与 FreeTypeFont 缓存 (XYZ图表与文字水印节点共用)
+# 此文件不注册任何节点；各节点模块以顶层模块名 "zml_font_registry" 导入，保证共享同一份缓存。
+
+import os
+import threading
+from collections import OrderedDict
+from PIL import ImageFont
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Font")
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+FONT_CACHE_SIZE = 64  # 缓存的 FreeTypeFont 对象数量 (按 路径, 字号, 索引)
+
+# ==========================================
+# 字体目录注册表：只扫描一次，任一子目录修改时间变化时重新扫描
+# ==========================================
+class FontRegistry:
+    def __init__(self, font_dir):
+        self.font_dir = font_dir
+        self.lock = threading.Lock()
+        self.font_files = None
+        self.dir_mtimes = {}  # 目录 -> mtime_ns，用于判断是否需要重新扫描
+
+    def _is_stale(self):
+        if self.font_files is None:
+            return True
+        for dir_path, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(dir_path).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _scan(self):
+        font_files, dir_mtimes = [], {}
+        if os.path.isdir(self.font_dir):
+            for root, dirs, files in os.walk(self.font_dir):
+                try:
+                    dir_mtimes[root] = os.stat(root).st_mtime_ns
+                except OSError:
+                    continue
+                for file in files:
+                    if file.lower().endswith(FONT_EXTENSIONS):
+                        font_files.append(os.path.relpath(os.path.join(root, file), self.font_dir))
+        else:
+            # 目录不存在时记录其父目录，创建后即可被发现
+            parent = os.path.dirname(self.font_dir)
+            try:
+                dir_mtimes[parent] = os.stat(parent).st_mtime_ns
+            except OSError:
+                pass
+        self.font_files, self.dir_mtimes = font_files, dir_mtimes
+
+    def list_fonts(self, extensions=FONT_EXTENSIONS):
+        """返回字体相对路径列表 (顺序与 os.walk 一致)"""
+        with self.lock:
+            if self._is_stale():
+                self._scan()
+                font_cache.clear()
+            font_files = self.font_files
+        return [f for f in font_files if f.lower().endswith(extensions)]
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_font_registry(font_dir=FONT_DIR):
+    key = os.path.normcase(os.path.abspath(font_dir))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = FontRegistry(font_dir)
+        return registry
+
+def list_font_files(font_dir=FONT_DIR, extensions=FONT_EXTENSIONS):
+    return get_font_registry(font_dir).list_fonts(extensions)
+
+# ==========================================
+# FreeTypeFont 对象的LRU缓存
+# ==========================================
+class _LoadError:
+    __slots__ = ("message",)
+    def __init__(self, message):
+        self.message = message
+
+class FontCache:
+    """缓存 ImageFont.truetype / load_default 的结果。加载失败也会被记住，
+    避免反复尝试不存在的系统字体；字体目录变化时整体清空。"""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> FreeTypeFont 或 _LoadError
+
+    def get(self, key, loader):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is not None:
+                self.entries.move_to_end(key)
+        if hit is None:
+            try:
+                hit = loader()
+            except OSError as e:
+                hit = _LoadError(str(e))
+            with self.lock:
+                self.entries[key] = hit
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        if isinstance(hit, _LoadError):
+            raise OSError(hit.message)
+        return hit
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+font_cache = FontCache(FONT_CACHE_SIZE)
+
+def load_truetype(font_path, size, index=0, layout_engine=None):
+    """与 ImageFont.truetype(font_path, size, index, layout_engine) 相同，但复用已加载的字体对象。返回的对象不得修改。"""
+    return font_cache.get(("truetype", font_path, size, index, layout_engine),
+                          lambda: ImageFont.truetype(font_path, size, index=index, layout_engine=layout_engine))
+
+def load_default_font(size=None):
+    """与 ImageFont.load_default(size) 相同，但复用已加载的字体对象"""
+    if size is None:
+        return font_cache.get(("default", None), ImageFont.load_default)
+    return font_cache.get(("default", size), lambda: ImageFont.load_default(size))
@@ -16,11 +16,19 @@ import io
 import struct
 import os
 import json
+import hashlib
 import re
 import folder_paths
 import comfy.utils
+import threading
+import zlib
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 import torch.nn.functional as F
+try:
+    from torchvision.io import encode_jpeg as tv_encode_jpeg
+except ImportError:
+    tv_encode_jpeg = None
 
 serv = server.PromptServer.instance
 
@@ -93,31 +101,85 @@ class Generator:
         g = philox4_32(counter, key)
         return box_muller(g[0], g[1]).reshape(shape)
 
+# Torch 向量化版本：与上面的 numpy Generator 逐位一致，
+# 用 int64 存放 uint32，乘法拆成 16 位分段避免溢出，可直接在 latent 所在设备上一次生成整块噪波
+UINT32_MASK = 0xFFFFFFFF
+box_muller_u_scale = float(two_pow32_inv[0])
+box_muller_u_bias = float(two_pow32_inv[0] / 2)
+box_muller_v_scale = float(two_pow32_inv_2pi[0])
+box_muller_v_bias = float(two_pow32_inv_2pi[0] / 2)
+
+def torch_mulhilo32(a, m):
+    a_lo = a & 0xFFFF
+    a_hi = a >> 16
+    p_lo = a_lo * m
+    t = a_hi * m + (p_lo >> 16)
+    return t >> 16, ((t & 0xFFFF) << 16) | (p_lo & 0xFFFF)
+
+def torch_philox4_32(c0, c1, c2, c3, k0, k1, rounds=10):
+    for i in range(rounds):
+        hi1, lo1 = torch_mulhilo32(c0, philox_m[0])
+        hi2, lo2 = torch_mulhilo32(c2, philox_m[1])
+        c0, c1, c2, c3 = hi2 ^ c1 ^ k0, lo2, hi1 ^ c3 ^ k1, lo1
+        if i < rounds - 1:
+            k0 = (k0 + philox_w[0]) & UINT32_MASK
+            k1 = (k1 + philox_w[1]) & UINT32_MASK
+    return c0, c1
+
+def torch_box_muller(x, y):
+    u = x.double() * box_muller_u_scale + box_muller_u_bias
+    v = y.double() * box_muller_v_scale + box_muller_v_bias
+    s = torch.sqrt(-2.0 * torch.log(u))
+    return (s * torch.sin(v)).float()
+
+class TorchGenerator:
+    def __init__(self, seed, device="cpu"):
+        self.seed = seed if seed >= 0 else seed + (1 << 64)
+        self.offset = 0
+        self.device = torch.device(device)
+        # MPS 不支持 float64，Box-Muller 只能在 CPU 上完成
+        self.compute_device = torch.device("cpu") if self.device.type == "mps" else self.device
+
+    def randn_batch(self, count, shape):
+        """一次生成 count 份噪波，等价于连续调用 count 次 Generator.randn(shape)。"""
+        n = int(np.prod(shape))
+        dev = self.compute_device
+        c0 = (torch.arange(count, device=dev, dtype=torch.int64) + self.offset).repeat_interleave(n)
+        c2 = torch.arange(n, device=dev, dtype=torch.int64).repeat(count)
+        zeros = torch.zeros_like(c0)
+        self.offset += count
+        g0, g1 = torch_philox4_32(c0, zeros, c2, zeros, self.seed & UINT32_MASK, self.seed >> 32)
+        return torch_box_muller(g0, g1).reshape([count] + list(shape)).to(self.device)
+
+    def randn(self, shape):
+        return self.randn_batch(1, shape)[0]
+
 import comfy.sample
 _original_prepare_noise = comfy.sample.prepare_noise
 def rng_rand_source(rand_source='cpu'):
     def prepare_noise(latent_image, seed, noise_inds=None):
         generator = torch.Generator("cpu").manual_seed(seed)
         if rand_source == 'nv':
-            rng = Generator(seed)
+            rng = TorchGenerator(seed, latent_image.device)
 
         if noise_inds is None:
             shape = latent_image.size()
             if rand_source == 'nv':
-                return torch.asarray(rng.randn(shape), device=latent_image.device)
+                return rng.randn(shape)
             else:
                 return torch.randn(shape, dtype=latent_image.dtype, layout=latent_image.layout,
                                    generator=generator, device="cpu").to(latent_image.device)
 
         unique_inds, inverse = np.unique(noise_inds, return_inverse=True)
+        shape = [1] + list(latent_image.size())[1:]
+        if rand_source == 'nv':
+            # 所有批次索引的噪波一次性生成，不再逐个循环
+            noises = rng.randn_batch(unique_inds[-1] + 1, shape).flatten(0, 1)
+            return noises[inverse]
         noises = []
         for i in range(unique_inds[-1] + 1):
-            shape = [1] + list(latent_image.size())[1:]
-            if rand_source == 'nv':
-                noise = torch.asarray(rng.randn(shape), device=latent_image.device)
-            else:
-                noise = torch.randn(shape, dtype=latent_image.dtype, layout=latent_image.layout,
-                                    generator=generator, device="cpu").to(latent_image.device)
+            noise = torch.randn(shape, dtype=latent_image.dtype, layout=latent_image.layout,
+                                generator=generator, device="cpu").to(latent_image.device)
             noises.append(noise)
         return torch.cat(noises)[inverse]
 
@@ -168,12 +230,90 @@ zml_rates_table = {
 
 _original_get_previewer = core_latent_preview.get_previewer
 
+# 视频预览默认参数，可由采样器节点的可选输入覆盖
+PREVIEW_MAX_EDGE = 512
+PREVIEW_FORMAT = "JPEG"
+PREVIEW_QUALITY = 95
+PREVIEW_FORMATS = ["JPEG", "WEBP"]
+
+def encode_preview_frames(imgs, fmt=PREVIEW_FORMAT, quality=PREVIEW_QUALITY):
+    # imgs: (N, H, W, C) uint8 CPU 张量，返回每帧编码后的字节
+    if fmt == "JPEG" and tv_encode_jpeg is not None:
+        try:
+            # torchvision 支持一次传入整批图像进行编码
+            encoded = tv_encode_jpeg(list(imgs.permute(0, 3, 1, 2).contiguous()), quality=quality)
+            return [t.numpy().tobytes() for t in encoded]
+        except Exception:
+            pass  # 旧版 torchvision 不支持批量编码，退回 PIL
+    frames = []
+    for img in imgs.numpy():
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            Image.fromarray(img).save(buf, format="WEBP", quality=quality, method=0)
+        else:
+            Image.fromarray(img).save(buf, format="JPEG", quality=quality)
+        frames.append(buf.getvalue())
+    return frames
+
+class ZMLPreviewWorker:
+    """每个 prompt 一个常驻预览线程，槽位只保留最新一批帧，来不及发送的旧帧直接丢弃。"""
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.cond = threading.Condition()
+        self.pending = None
+        self.stopped = False
+        self.thread = Thread(target=self._run, daemon=True, name=f"zml-preview-{prompt_id}")
+        self.thread.start()
+
+    def submit(self, job):
+        with self.cond:
+            self.pending = job
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.pending = None
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.stopped:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                job, self.pending = self.pending, None
+            try:
+                job()
+            except Exception as e:
+                print(f"[ZML] 视频预览发送失败: {e}")
+
+_preview_workers = {}
+_preview_workers_lock = threading.Lock()
+
+def get_preview_worker(prompt_id):
+    with _preview_workers_lock:
+        worker = _preview_workers.get(prompt_id)
+        if worker is None:
+            # 新的 prompt 开始，结束之前 prompt 的预览线程
+            for old in _preview_workers.values():
+                old.stop()
+            _preview_workers.clear()
+            worker = _preview_workers[prompt_id] = ZMLPreviewWorker(prompt_id)
+        return worker
+
 class ZMLWrappedPreviewer(core_latent_preview.LatentPreviewer):
-    def __init__(self, previewer, rate=8):
+    def __init__(self, previewer, rate=8, max_edge=PREVIEW_MAX_EDGE, fmt=PREVIEW_FORMAT, quality=PREVIEW_QUALITY):
         self.first_preview = True
         self.last_time = time.time()
         self.c_index = 0
         self.rate = rate
+        self.max_edge = max_edge
+        self.fmt = fmt
+        self.quality = quality
+        self.worker = get_preview_worker(getattr(serv, 'last_prompt_id', None))
         if hasattr(previewer, 'taesd'):
             self.taesd = previewer.taesd
         elif hasattr(previewer, 'latent_rgb_factors'):
@@ -211,36 +351,37 @@ class ZMLWrappedPreviewer(core_latent_preview.LatentPreviewer):
         if batch.size(0) < num_previews:
             batch = torch.cat([batch, x0[:num_previews - batch.size(0)]], dim=0)
 
-        Thread(target=self._send_frames, args=(batch, start_idx % num_images, num_images)).start()
+        # 采样器会继续原地修改 x0，这里先拷贝一份交给预览线程
+        self.worker.submit(functools.partial(self._send_frames, batch.detach().clone(), start_idx % num_images, num_images, serv.last_node_id))
 
         self.c_index = (self.c_index + num_previews) % num_images
         return None
 
-    def _send_frames(self, tensor, start_ind, total):
-        tensor = tensor.clone().detach()
-
+    def _send_frames(self, tensor, start_ind, total, node_id):
         decoded = self._decode(tensor)
-        if decoded.size(1) > 512 or decoded.size(2) > 512:
+        edge = self.max_edge
+        if decoded.size(1) > edge or decoded.size(2) > edge:
             decoded = decoded.movedim(-1, 0)
             h, w = decoded.shape[2:]
             if h < w:
-                new_h = 512 * h // w
-                decoded = F.interpolate(decoded, (new_h, 512), mode='bilinear')
+                new_h = edge * h // w
+                decoded = F.interpolate(decoded, (new_h, edge), mode='bilinear')
             else:
-                new_w = 512 * w // h
-                decoded = F.interpolate(decoded, (512, new_w), mode='bilinear')
+                new_w = edge * w // h
+                decoded = F.interpolate(decoded, (edge, new_w), mode='bilinear')
             decoded = decoded.movedim(0, -1)
 
         imgs = ((decoded + 1.0) / 2.0).clamp(0, 1).mul(255).byte().cpu()
+        frames = encode_preview_frames(imgs, self.fmt, self.quality)
 
+        header_id = struct.pack('16p', node_id.encode())
         ind = start_ind
-        for img in imgs:
-            pil = Image.fromarray(img.numpy())
+        for frame in frames:
             buf = io.BytesIO()
             buf.write(b'\x01\x00\x00\x00\x01\x00\x00\x00')
             buf.write(ind.to_bytes(4, 'big'))
-            buf.write(struct.pack('16p', serv.last_node_id.encode()))
-            pil.save(buf, format="JPEG", quality=95)
+            buf.write(header_id)
+            buf.write(frame)
             serv.send_sync(server.BinaryEventTypes.PREVIEW_IMAGE, buf.getvalue(), serv.client_id)
             ind = (ind + 1) % total
 
@@ -265,7 +406,8 @@ def zml_get_previewer(device, latent_format, *args, **kwargs):
         return previewer
     rate = zml_rates_table.get(latent_format.__class__.__name__, 8)
     if getattr(serv, 'zml_video_preview_enabled', False):
-        return ZMLWrappedPreviewer(previewer, getattr(serv, 'zml_video_preview_rate', rate))
+        options = getattr(serv, 'zml_video_preview_options', {})
+        return ZMLWrappedPreviewer(previewer, getattr(serv, 'zml_video_preview_rate', rate), **options)
     else:
         return previewer
 
@@ -283,68 +425,124 @@ def extract_text_from_conditioning(conditioning):
             if t: texts.append(t)
     return "\n".join(texts) if texts else None
 
+class PromptGraphIndex:
+    """prompt 图的节点索引 (node_id -> (class_type, inputs))，
+    并缓存 find_upstream_text / traverse_model_chain 的查询结果。每个 prompt 只构建一次。"""
+
+    def __init__(self, prompt):
+        self.nodes = {}        # node_id -> (class_type, inputs)
+        self.text_memo = {}
+        self.model_memo = {}
+
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict): continue
+            self.nodes[str(node_id)] = (node.get("class_type", ""), node.get("inputs", {}))
+
+    def _text_plan(self, node_id, input_key, depth):
+        # 返回 ("value", 结果, 是否因深度限制被截断) / ("merge", 上游节点, [输入名], 分隔符) / ("forward", 上游节点, 输入名)
+        if depth > RECURSION_DEPTH_LIMIT: return ("value", None, True)
+        node = self.nodes.get(node_id)
+        if not node: return ("value", None, False)
+        source = node[1].get(input_key)
+
+        if isinstance(source, str):
+            return ("value", source, False)
+
+        if isinstance(source, list) and len(source) == 2:
+            source_node_id = str(source[0])
+            source_node = self.nodes.get(source_node_id)
+            if not source_node: return ("value", None, False)
+            class_type, source_inputs = source_node
+
+            if any(p in class_type for p in ["Merge", "合并", "Concatenate"]):
+                delimiter = source_inputs.get("delimiter") or source_inputs.get("分隔符") or "\n"
+                if delimiter == "\\n": delimiter = "\n"
+                keys = [k for k in sorted(source_inputs.keys()) if not any(d in k for d in ["delimiter", "分隔符"])]
+                return ("merge", source_node_id, keys, delimiter)
+
+            is_target = any(p in class_type for p in TEXT_NODE_PATTERNS)
+            if is_target:
+                for key in TEXT_SEARCH_KEYS:
+                    val = source_inputs.get(key)
+                    if val and isinstance(val, str): return ("value", val, False)
+
+            if "CLIPTextEncode" in class_type:
+                return ("forward", source_node_id, "text")
+            if "Reroute" in class_type:
+                for k, v in source_inputs.items():
+                    if isinstance(v, list):
+                        return ("forward", source_node_id, k)
+        return ("value", None, False)
+
+    def upstream_text(self, node_id, input_key, depth=0):
+        return self._upstream_text(str(node_id), input_key, depth)[0]
+
+    def _upstream_text(self, node_id, input_key, depth):
+        # 返回 (文本, 是否因深度限制被截断)；递归深度受 RECURSION_DEPTH_LIMIT 限制
+        memo_key = (node_id, input_key)
+        if memo_key in self.text_memo:
+            return self.text_memo[memo_key], False
+        plan = self._text_plan(node_id, input_key, depth)
+        if plan[0] == "value":
+            value, truncated = plan[1], plan[2]
+        elif plan[0] == "merge":
+            results = [self._upstream_text(plan[1], k, depth + 1) for k in plan[2]]
+            merged_text = [v for v, _ in results if v and isinstance(v, str) and v.strip()]
+            value = plan[3].join(merged_text) if merged_text else None
+            truncated = any(t for _, t in results)
+        else:
+            value, truncated = self._upstream_text(plan[1], plan[2], depth + 1)
+        # 因深度限制提前结束的结果不缓存，避免影响从更浅处发起的查询
+        if not truncated:
+            self.text_memo[memo_key] = value
+        return value, truncated
+
+    def model_chain(self, start_node_id):
+        start_node_id = str(start_node_id)
+        if start_node_id in self.model_memo:
+            return self.model_memo[start_node_id]
+
+        ckpt_name = None
+        start_node = self.nodes.get(start_node_id)
+        if start_node:
+            first_link = start_node[1].get("模型") or start_node[1].get("model")
+            if first_link and isinstance(first_link, list):
+                current_id = str(first_link[0])
+                for _ in range(RECURSION_DEPTH_LIMIT):
+                    node = self.nodes.get(current_id)
+                    if not node: break
+                    class_type, inputs = node
+                    if "CheckpointLoader" in class_type:
+                        ckpt_name = inputs.get("ckpt_name")
+                        break
+                    next_link = inputs.get("model") or inputs.get("模型")
+                    if next_link and isinstance(next_link, list): current_id = str(next_link[0])
+                    else: break
+        self.model_memo[start_node_id] = ckpt_name
+        return ckpt_name
+
+PROMPT_INDEX_CACHE_SIZE = 8
+_prompt_index_cache = {}  # id(prompt) -> (prompt, PromptGraphIndex)
+
+def get_prompt_index(prompt):
+    key = id(prompt)
+    cached = _prompt_index_cache.get(key)
+    # 同时比较对象本身，防止旧 prompt 被回收后 id 被复用
+    if cached is not None and cached[0] is prompt:
+        return cached[1]
+    if len(_prompt_index_cache) >= PROMPT_INDEX_CACHE_SIZE:
+        _prompt_index_cache.pop(next(iter(_prompt_index_cache)))
+    index = PromptGraphIndex(prompt)
+    _prompt_index_cache[key] = (prompt, index)
+    return index
+
 def find_upstream_text(prompt, current_node_id, input_key, depth=0):
-    if depth > RECURSION_DEPTH_LIMIT: return None 
-    current_node = prompt.get(str(current_node_id))
-    if not current_node: return None
-    inputs = current_node.get("inputs", {})
-    source = inputs.get(input_key)
-
-    if isinstance(source, str):
-        return source
-
-    if isinstance(source, list) and len(source) == 2:
-        source_node_id = str(source[0])
-        source_node = prompt.get(source_node_id)
-        if not source_node: return None
-        class_type = source_node.get("class_type", "")
-        source_inputs = source_node.get("inputs", {})
-
-        if any(p in class_type for p in ["Merge", "合并", "Concatenate"]):
-            merged_text = []
-            delimiter = source_inputs.get("delimiter") or source_inputs.get("分隔符") or "\n"
-            if delimiter == "\\n": delimiter = "\n"
-            
-            sorted_keys = sorted(source_inputs.keys())
-            for key in sorted_keys:
-                if any(k in key for k in ["delimiter", "分隔符"]): continue
-                val = find_upstream_text(prompt, source_node_id, key, depth + 1)
-                if val and isinstance(val, str) and val.strip():
-                    merged_text.append(val)
-            return delimiter.join(merged_text) if merged_text else None
-
-        is_target = any(p in class_type for p in TEXT_NODE_PATTERNS)
-        if is_target:
-            for key in TEXT_SEARCH_KEYS:
-                val = source_inputs.get(key)
-                if val and isinstance(val, str): return val
-
-        if "CLIPTextEncode" in class_type:
-            return find_upstream_text(prompt, source_node_id, "text", depth + 1)
-        if "Reroute" in class_type:
-            for k, v in source_inputs.items():
-                if isinstance(v, list):
-                    return find_upstream_text(prompt, source_node_id, k, depth + 1)
-    return None
+    if not prompt: return None
+    return get_prompt_index(prompt).upstream_text(current_node_id, input_key, depth)
 
 def traverse_model_chain(prompt, start_node_id):
-    current_id = start_node_id
-    start_node = prompt.get(str(start_node_id))
-    if not start_node: return None
-    first_link = start_node.get("inputs", {}).get("模型") or start_node.get("inputs", {}).get("model")
-    if not first_link or not isinstance(first_link, list): return None
-    
-    current_id = str(first_link[0])
-    for _ in range(RECURSION_DEPTH_LIMIT):
-        node = prompt.get(current_id)
-        if not node: break
-        class_type, inputs = node.get("class_type", ""), node.get("inputs", {})
-        if "CheckpointLoader" in class_type:
-            return inputs.get("ckpt_name")
-        next_link = inputs.get("model") or inputs.get("模型")
-        if next_link and isinstance(next_link, list): current_id = str(next_link[0])
-        else: break
-    return None
+    if not prompt: return None
+    return get_prompt_index(prompt).model_chain(start_node_id)
 
 def auto_discover_metadata(prompt, unique_id, pos_cond, neg_cond):
     ckpt_name = traverse_model_chain(prompt, unique_id)
@@ -371,34 +569,104 @@ def generate_webui_metadata_base(steps, sampler_name, scheduler, cfg, seed, late
 # 图像处理辅助函数 (模糊/锐化)
 # ===============================================
 
-def apply_gaussian_blur(x, sigma):
-    # x: (B, C, H, W)
-    if sigma <= 0: return x
+def build_gaussian_kernels(sigma, channels, device, dtype):
+    # 返回 (C, 1, K, 1) 与 (C, 1, 1, K) 的分离卷积核以及填充宽度
     kernel_size = int(2 * 4.0 * sigma + 1)
     if kernel_size % 2 == 0: kernel_size += 1
     
     # 构建高斯核
-    k_range = torch.arange(kernel_size, device=x.device, dtype=x.dtype) - (kernel_size - 1) / 2
+    k_range = torch.arange(kernel_size, device=device, dtype=dtype) - (kernel_size - 1) / 2
     k = torch.exp(-0.5 * (k_range / sigma) ** 2)
     k = k / k.sum()
     
-    # 扩展为 (C, 1, K, 1) 和 (C, 1, 1, K) 进行分离卷积
+    k_x = k.view(1, 1, kernel_size, 1).repeat(channels, 1, 1, 1)
+    k_y = k.view(1, 1, 1, kernel_size).repeat(channels, 1, 1, 1)
+    return k_x, k_y, kernel_size // 2
+
+def apply_gaussian_kernels(x, kernels):
+    k_x, k_y, pad = kernels
     C = x.shape[1]
-    k_x = k.view(1, 1, kernel_size, 1).repeat(C, 1, 1, 1)
-    k_y = k.view(1, 1, 1, kernel_size).repeat(C, 1, 1, 1)
-    
-    # 填充
-    pad = kernel_size // 2
     x_pad = F.pad(x, (0, 0, pad, pad), mode='reflect')
     out = F.conv2d(x_pad, k_x, groups=C)
     out_pad = F.pad(out, (pad, pad, 0, 0), mode='reflect')
-    out = F.conv2d(out_pad, k_y, groups=C)
-    return out
+    return F.conv2d(out_pad, k_y, groups=C)
+
+def apply_gaussian_blur(x, sigma):
+    # x: (B, C, H, W)
+    if sigma <= 0: return x
+    return apply_gaussian_kernels(x, build_gaussian_kernels(sigma, x.shape[1], x.device, x.dtype))
 
 # ===============================================
 # 采样辅助函数 (支持多种脚本指令，含动态CFG)
 # ===============================================
 
+def compile_script_op(instr, shape, dtype, device, cfg_state):
+    op_type = instr.get('type', 'noise')
+
+    if op_type == 'noise':
+        strength = instr['noise']
+        if strength == 0: return None
+        def op(x):
+            x.add_(torch.randn_like(x, device=x.device) * strength)
+        return op
+
+    if op_type == 'blur_sharpen':
+        mode = instr['mode']
+        strength = instr['strength']
+        if mode == "模糊":
+            if strength <= 0: return None
+            kernels = build_gaussian_kernels(strength, shape[1], device, dtype)
+            def op(x):
+                x.copy_(apply_gaussian_kernels(x, kernels))
+            return op
+        if mode == "锐化":
+            kernels = build_gaussian_kernels(1.0, shape[1], device, dtype)
+            def op(x):
+                detail = x - apply_gaussian_kernels(x, kernels)
+                x.add_(detail * strength)
+            return op
+        return None
+
+    if op_type == 'contrast':
+        c_factor = instr['contrast']
+        b_offset = instr['brightness']
+        vignette = instr.get('vignette', 0.0)
+        mask = None
+        if vignette > 0.0:
+            H, W = shape[2], shape[3]
+            y_range = torch.linspace(-1, 1, H, device=device)
+            x_range = torch.linspace(-1, 1, W, device=device)
+            yy, xx = torch.meshgrid(y_range, x_range, indexing='ij')
+            mask = torch.sqrt(xx**2 + yy**2) * vignette
+        def op(x):
+            if c_factor != 1.0:
+                mean = x.mean(dim=(2, 3), keepdim=True)
+                x.sub_(mean).mul_(c_factor).add_(mean)
+            if b_offset != 0.0:
+                x[:, 0, :, :].add_(b_offset)
+            if mask is not None:
+                x[:, 0, :, :].sub_(mask)
+        return op
+
+    if op_type == 'dynamic_cfg':
+        target_cfg = instr['target_cfg']
+        def op(x):
+            # 更新共享状态，下一步采样时模型会自动读取
+            cfg_state["val"] = target_cfg
+        return op
+
+    return None
+
+def compile_script_ops(script_map, shape, dtype, device, cfg_state):
+    """把 {触发步: [指令]} 编译为 {触发步: [闭包]}，闭包只接收当前 latent 并原地修改。"""
+    compiled = {}
+    for step, instructions in script_map.items():
+        ops = [compile_script_op(instr, shape, dtype, device, cfg_state) for instr in instructions]
+        ops = [op for op in ops if op is not None]
+        if ops:
+            compiled[step] = ops
+    return compiled
+
 def run_zml_sampler(model, seed, steps, cfg, sampler_name, scheduler, positive, negative, latent, denoise=1.0, disable_noise=False, start_step=None, last_step=None, force_full_denoise=False, script=None):
     device = model.load_device
     latent_image = latent["samples"]
@@ -441,54 +709,19 @@ def run_zml_sampler(model, seed, steps, cfg, sampler_name, scheduler, positive,
     comfy_callback = core_latent_preview.prepare_callback(model_cloned, steps)
 
     # 4. 定义高性能复合回调
+    # 脚本在首次回调时按 latent 的形状/类型/设备编译成闭包，遮罩与卷积核只构建一次，
+    # 之后每一步只做张量运算
+    compiled_cache = {}
+
     def zml_callback(step, x0, x, total_steps):
         # A. 执行脚本逻辑
-        if step in script_map:
-            instructions = script_map[step]
-            for instr in instructions:
-                op_type = instr.get('type', 'noise') 
-                
-                if op_type == 'noise':
-                    strength = instr['noise']
-                    if strength != 0:
-                        noise = torch.randn_like(x, device=x.device) * strength
-                        x.add_(noise)
-                
-                elif op_type == 'blur_sharpen':
-                    mode = instr['mode']
-                    strength = instr['strength']
-                    if mode == "模糊":
-                        blurred = apply_gaussian_blur(x, strength)
-                        x.copy_(blurred)
-                    elif mode == "锐化":
-                        blurred = apply_gaussian_blur(x, 1.0)
-                        detail = x - blurred
-                        x.add_(detail * strength)
-                
-                elif op_type == 'contrast':
-                    c_factor = instr['contrast']
-                    b_offset = instr['brightness']
-                    vignette = instr.get('vignette', 0.0)
-                    
-                    if c_factor != 1.0:
-                        mean = x.mean(dim=(2, 3), keepdim=True)
-                        x.sub_(mean).mul_(c_factor).add_(mean)
-                    
-                    if b_offset != 0.0:
-                        x[:, 0, :, :].add_(b_offset)
-                    
-                    if vignette > 0.0:
-                        B, C, H, W = x.shape
-                        y_range = torch.linspace(-1, 1, H, device=x.device)
-                        x_range = torch.linspace(-1, 1, W, device=x.device)
-                        yy, xx = torch.meshgrid(y_range, x_range, indexing='ij')
-                        dist = torch.sqrt(xx**2 + yy**2)
-                        mask = dist * vignette
-                        x[:, 0, :, :] = x[:, 0, :, :] - mask
-                
-                elif op_type == 'dynamic_cfg':
-                    # 更新共享状态，下一步采样时模型会自动读取
-                    cfg_state["val"] = instr['target_cfg']
+        if script_map:
+            cache_key = (tuple(x.shape), x.dtype, x.device)
+            compiled = compiled_cache.get(cache_key)
+            if compiled is None:
+                compiled = compiled_cache[cache_key] = compile_script_ops(script_map, x.shape, x.dtype, x.device, cfg_state)
+            for op in compiled.get(step, ()):
+                op(x)
 
         # B. 执行原生回调
         if comfy_callback:
@@ -657,15 +890,19 @@ class ZML_KSampler:
                 "VAE": ("VAE",), 
                 "视频预览帧率": ("INT", {"default": 8, "min": 1, "max": 30}),
                 "脚本": ("ZML_SCRIPT", {"tooltip": "添加额外的参数"}),
+                "视频预览尺寸": ("INT", {"default": PREVIEW_MAX_EDGE, "min": 64, "max": 2048, "step": 64, "tooltip": "视频预览帧的最长边像素"}),
+                "视频预览格式": (PREVIEW_FORMATS, {"default": PREVIEW_FORMAT, "tooltip": "WEBP 体积更小，JPEG 编码更快"}),
+                "视频预览质量": ("INT", {"default": PREVIEW_QUALITY, "min": 1, "max": 100}),
             },
             "hidden": {"prompt": "PROMPT", "unique_id": "UNIQUE_ID"},
         }
     RETURN_TYPES, RETURN_NAMES, FUNCTION, CATEGORY = ("LATENT", "IMAGE", "STRING"), ("LATENT", "图像", "生成信息"), "sample", "image/ZML_图像/采样器相关"
 
-    def sample(self, 模型, 种子, 步数, CFG, 采样器, 调度器, 正面条件, 负面条件, Latent, 降噪, 预览方式, 噪波模式, 视频预览, VAE=None, 视频预览帧率=8, 脚本=None, prompt=None, unique_id=None):
+    def sample(self, 模型, 种子, 步数, CFG, 采样器, 调度器, 正面条件, 负面条件, Latent, 降噪, 预览方式, 噪波模式, 视频预览, VAE=None, 视频预览帧率=8, 脚本=None, 视频预览尺寸=PREVIEW_MAX_EDGE, 视频预览格式=PREVIEW_FORMAT, 视频预览质量=PREVIEW_QUALITY, prompt=None, unique_id=None):
         rng_rand_source("nv" if 噪波模式 == "gpu" else "cpu")
         video_preview_enabled = (视频预览 == "enable")
         serv.zml_video_preview_enabled, serv.zml_video_preview_rate = video_preview_enabled, 视频预览帧率
+        serv.zml_video_preview_options = {"max_edge": 视频预览尺寸, "fmt": 视频预览格式, "quality": 视频预览质量}
         
         with zml_preview(预览方式, video_preview_enabled):
             samples = run_zml_sampler(模型, 种子, 步数, CFG, 采样器, 调度器, 正面条件, 负面条件, Latent, denoise=降噪, disable_noise=False, start_step=0, last_step=步数, force_full_denoise=False, script=脚本)[0]
@@ -679,6 +916,7 @@ class ZML_KSampler:
         if not video_preview_enabled: serv.send_sync('VHS_cleanup_preview', {'id': serv.last_node_id})
         if hasattr(serv, 'zml_video_preview_enabled'): del serv.zml_video_preview_enabled
         if hasattr(serv, 'zml_video_preview_rate'): del serv.zml_video_preview_rate
+        if hasattr(serv, 'zml_video_preview_options'): del serv.zml_video_preview_options
         auto_model, auto_pos, auto_neg = auto_discover_metadata(prompt, unique_id, 正面条件, 负面条件)
         gen_info = generate_webui_metadata_base(步数, 采样器, 调度器, CFG, 种子, Latent, model_name=auto_model, positive=auto_pos, negative=auto_neg)
         return samples, image, gen_info
@@ -701,15 +939,19 @@ class ZML_KSampler_Advanced:
                 "VAE": ("VAE",), 
                 "视频预览帧率": ("INT", {"default": 8, "min": 1, "max": 30}),
                 "脚本": ("ZML_SCRIPT", {"tooltip": "添加额外噪波"}),
+                "视频预览尺寸": ("INT", {"default": PREVIEW_MAX_EDGE, "min": 64, "max": 2048, "step": 64, "tooltip": "视频预览帧的最长边像素"}),
+                "视频预览格式": (PREVIEW_FORMATS, {"default": PREVIEW_FORMAT, "tooltip": "WEBP 体积更小，JPEG 编码更快"}),
+                "视频预览质量": ("INT", {"default": PREVIEW_QUALITY, "min": 1, "max": 100}),
             },
             "hidden": {"prompt": "PROMPT", "unique_id": "UNIQUE_ID"},
         }
     RETURN_TYPES, RETURN_NAMES, FUNCTION, CATEGORY = ("LATENT", "IMAGE", "STRING"), ("LATENT", "图像", "生成信息"), "sample", "image/ZML_图像/采样器相关"
 
-    def sample(self, 模型, 添加噪波, 随机种子, 步数, CFG, 采样器, 调度器, 正面条件, 负面条件, Latent, 开始步数, 结束步数, 返回剩余噪波, 预览方式, 噪波模式, 视频预览, VAE=None, 视频预览帧率=8, 脚本=None, prompt=None, unique_id=None):
+    def sample(self, 模型, 添加噪波, 随机种子, 步数, CFG, 采样器, 调度器, 正面条件, 负面条件, Latent, 开始步数, 结束步数, 返回剩余噪波, 预览方式, 噪波模式, 视频预览, VAE=None, 视频预览帧率=8, 脚本=None, 视频预览尺寸=PREVIEW_MAX_EDGE, 视频预览格式=PREVIEW_FORMAT, 视频预览质量=PREVIEW_QUALITY, prompt=None, unique_id=None):
         rng_rand_source("nv" if 噪波模式 == "gpu" else "cpu")
         video_preview_enabled = (视频预览 == "enable")
         serv.zml_video_preview_enabled, serv.zml_video_preview_rate = video_preview_enabled, 视频预览帧率
+        serv.zml_video_preview_options = {"max_edge": 视频预览尺寸, "fmt": 视频预览格式, "quality": 视频预览质量}
         
         disable_noise = (添加噪波 == "disable")
         force_full_denoise = (返回剩余噪波 == "disable")
@@ -726,6 +968,7 @@ class ZML_KSampler_Advanced:
         if not video_preview_enabled: serv.send_sync('VHS_cleanup_preview', {'id': serv.last_node_id})
         if hasattr(serv, 'zml_video_preview_enabled'): del serv.zml_video_preview_enabled
         if hasattr(serv, 'zml_video_preview_rate'): del serv.zml_video_preview_rate
+        if hasattr(serv, 'zml_video_preview_options'): del serv.zml_video_preview_options
         auto_model, auto_pos, auto_neg = auto_discover_metadata(prompt, unique_id, 正面条件, 负面条件)
         gen_info = generate_webui_metadata_base(步数, 采样器, 调度器, CFG, 随机种子, Latent, denoise=1.0, model_name=auto_model, positive=auto_pos, negative=auto_neg)
         return samples, image, gen_info
@@ -843,6 +1086,190 @@ class ZML_SaveImageWithMetadata:
             counter += 1
         return {"ui": {"images": results}}
 
+# ===============================================
+# A1111 元数据读取与解析
+# ===============================================
+A1111_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+A1111_CACHE_LIMIT = 20000
+_a1111_info_cache = {}  # (path, mtime) -> parameters 文本
+_a1111_info_cache_lock = threading.Lock()
+
+def decode_exif_user_comment(value):
+    if not isinstance(value, bytes):
+        return value or ""
+    # piexif 写入的 UserComment 带 8 字节编码前缀
+    if value.startswith(b"UNICODE\x00"):
+        return value[8:].decode('utf-16-be', errors='ignore').replace('\x00', '')
+    if value.startswith(b"ASCII\x00\x00\x00"):
+        value = value[8:]
+    return value.decode('utf-8', errors='ignore').replace('\x00', '')
+
+def read_a1111_info_from_image(img):
+    """从已打开的 PIL 图像读取 parameters 文本，只用到头信息，不解码像素。"""
+    if "parameters" in img.info:
+        return img.info["parameters"]
+    if "exif" in img.info:
+        try:
+            exif_data = img.getexif()
+            comment = exif_data.get(0x9286)
+            if comment is None:
+                comment = exif_data.get_ifd(0x8769).get(0x9286)
+            if comment is not None:
+                return decode_exif_user_comment(comment)
+        except: pass
+    return ""
+
+def read_png_text_chunks(path, wanted_key="parameters"):
+    """只遍历 PNG 的数据块头读取文本块，IDAT 直接跳过，不解压像素。"""
+    with open(path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            return None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+                data = f.read(length)
+                f.seek(4, 1)  # CRC
+                key, _, rest = data.partition(b'\x00')
+                if key.decode('latin-1') != wanted_key:
+                    continue
+                if chunk_type == b'tEXt':
+                    return rest.decode('latin-1')
+                if chunk_type == b'zTXt':
+                    return zlib.decompress(rest[1:]).decode('latin-1')
+                compressed = rest[0] == 1
+                rest = rest[2:]
+                _, _, rest = rest.partition(b'\x00')   # language tag
+                _, _, text = rest.partition(b'\x00')   # translated keyword
+                if compressed:
+                    text = zlib.decompress(text)
+                return text.decode('utf-8', errors='ignore')
+            if chunk_type == b'IEND':
+                return None
+            f.seek(length + 4, 1)
+
+def read_a1111_info_from_file(path):
+    """读取单个文件的 parameters 文本，按 (路径, 修改时间) 缓存。"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return ""
+    key = (path, mtime)
+    with _a1111_info_cache_lock:
+        if key in _a1111_info_cache:
+            return _a1111_info_cache[key]
+
+    full_info = None
+    try:
+        if path.lower().endswith('.png'):
+            full_info = read_png_text_chunks(path)
+        if full_info is None:
+            # JPEG/WebP 的 EXIF 只需要打开文件头，Image.open 不会解码像素
+            with Image.open(path) as img:
+                full_info = read_a1111_info_from_image(img)
+    except Exception as e:
+        print(f"[ZML] 读取 A1111 数据失败 {path}: {e}")
+        full_info = ""
+
+    with _a1111_info_cache_lock:
+        if len(_a1111_info_cache) >= A1111_CACHE_LIMIT:
+            _a1111_info_cache.clear()
+        _a1111_info_cache[key] = full_info
+    return full_info
+
+def parse_a1111_info(full_info, lora_output_format):
+    if not full_info:
+        return ("", "", "", 20, 8.0, "euler", "normal", 0, "", 512, 512, "")
+
+    pos_part = ""
+    neg_part = ""
+    rest_part = ""
+
+    parts = full_info.split("Negative prompt:")
+    if len(parts) > 1:
+        pos_part = parts[0].strip()
+        remainder = parts[1]
+        last_newline = remainder.rfind("\n")
+        if last_newline != -1:
+            potential_params = remainder[last_newline+1:].strip()
+            if potential_params.startswith("Steps:"):
+                neg_part = remainder[:last_newline].strip()
+                rest_part = potential_params
+            else:
+                neg_part = remainder.strip()
+        else:
+            neg_part = remainder.strip()
+    else:
+        last_newline = full_info.rfind("\n")
+        if last_newline != -1:
+            potential_params = full_info[last_newline+1:].strip()
+            if potential_params.startswith("Steps:"):
+                pos_part = full_info[:last_newline].strip()
+                rest_part = potential_params
+            else:
+                pos_part = full_info.strip()
+        else:
+            pos_part = full_info.strip()
+
+    params = {}
+    if rest_part:
+        pairs = rest_part.split(", ")
+        for p in pairs:
+            if ": " in p:
+                k, v = p.split(": ", 1)
+                params[k] = v
+
+    steps = int(params.get("Steps", 20))
+    sampler = params.get("Sampler", "euler")
+    scheduler = params.get("Schedule type", "normal")
+    cfg = float(params.get("CFG scale", 8.0))
+    seed = int(params.get("Seed", 0))
+    model = params.get("Model", "")
+    size = params.get("Size", "512x512")
+    try: w, h = map(int, size.split("x"))
+    except: w, h = 512, 512
+
+    loras = []
+    lora_pattern = re.compile(r"<lora:([^:>]+)(?::([^:>]+))?(?::([^:>]+))?>")
+
+    found_tags = lora_pattern.findall(pos_part)
+    for name, wt, _ in found_tags:
+        weight = 1.0
+        if wt:
+            try: weight = float(wt)
+            except: pass
+        loras.append({"lora_name": name, "weight": weight})
+
+    try:
+        json_start = full_info.find('[{"lora_name"')
+        if json_start != -1:
+            json_end = full_info.find('}]', json_start) + 2
+            json_str = full_info[json_start:json_end]
+            json_data = json.loads(json_str)
+            for l in json_data:
+                if not any(existing['lora_name'] == l['lora_name'] for existing in loras):
+                    loras.append(l)
+    except: pass
+
+    pos_part = lora_pattern.sub("", pos_part)
+    pos_lines = pos_part.split('\n')
+    pos_part = "\n".join([line for line in pos_lines if not line.strip().startswith("LoRA:") and not line.strip().startswith("LoRA JSON:")])
+    pos_part = re.sub(r",\s*,", ",", pos_part).strip(" ,")
+
+    lora_out_str = ""
+    if lora_output_format == "JSON格式":
+        if loras:
+            lora_out_str = json.dumps(loras, ensure_ascii=False)
+    else: 
+        tags = []
+        for l in loras:
+            tags.append(f"<lora:{l['lora_name']}:{l['weight']}>")
+        lora_out_str = ", ".join(tags)
+
+    return (pos_part, neg_part, lora_out_str, steps, cfg, sampler, scheduler, seed, model, w, h, full_info)
+
 class ZML_LoadA1111Data:
     @classmethod
     def INPUT_TYPES(s):
@@ -865,107 +1292,81 @@ class ZML_LoadA1111Data:
         image_path = folder_paths.get_annotated_filepath(image)
         img = Image.open(image_path)
         
-        full_info = ""
-        if "parameters" in img.info:
-            full_info = img.info["parameters"]
-        elif "exif" in img.info:
-            try:
-                exif_data = img.getexif()
-                if 0x9286 in exif_data:
-                    full_info = exif_data[0x9286]
-                    if isinstance(full_info, bytes):
-                        full_info = full_info.decode('utf-8', errors='ignore').replace('\x00', '')
-            except: pass
-        
-        if not full_info:
-            return ("", "", "", 20, 8.0, "euler", "normal", 0, "", 512, 512, "")
+        full_info = read_a1111_info_from_image(img)
+        return parse_a1111_info(full_info, lora_output_format)
 
-        pos_part = ""
-        neg_part = ""
-        rest_part = ""
-        
-        parts = full_info.split("Negative prompt:")
-        if len(parts) > 1:
-            pos_part = parts[0].strip()
-            remainder = parts[1]
-            last_newline = remainder.rfind("\n")
-            if last_newline != -1:
-                potential_params = remainder[last_newline+1:].strip()
-                if potential_params.startswith("Steps:"):
-                    neg_part = remainder[:last_newline].strip()
-                    rest_part = potential_params
-                else:
-                    neg_part = remainder.strip()
-            else:
-                neg_part = remainder.strip()
-        else:
-            last_newline = full_info.rfind("\n")
-            if last_newline != -1:
-                potential_params = full_info[last_newline+1:].strip()
-                if potential_params.startswith("Steps:"):
-                    pos_part = full_info[:last_newline].strip()
-                    rest_part = potential_params
-                else:
-                    pos_part = full_info.strip()
-            else:
-                pos_part = full_info.strip()
-
-        params = {}
-        if rest_part:
-            pairs = rest_part.split(", ")
-            for p in pairs:
-                if ": " in p:
-                    k, v = p.split(": ", 1)
-                    params[k] = v
-
-        steps = int(params.get("Steps", 20))
-        sampler = params.get("Sampler", "euler")
-        scheduler = params.get("Schedule type", "normal")
-        cfg = float(params.get("CFG scale", 8.0))
-        seed = int(params.get("Seed", 0))
-        model = params.get("Model", "")
-        size = params.get("Size", "512x512")
-        try: w, h = map(int, size.split("x"))
-        except: w, h = 512, 512
-
-        loras = []
-        lora_pattern = re.compile(r"<lora:([^:>]+)(?::([^:>]+))?(?::([^:>]+))?>")
-        
-        found_tags = lora_pattern.findall(pos_part)
-        for name, wt, _ in found_tags:
-            weight = 1.0
-            if wt:
-                try: weight = float(wt)
-                except: pass
-            loras.append({"lora_name": name, "weight": weight})
-            
-        try:
-            json_start = full_info.find('[{"lora_name"')
-            if json_start != -1:
-                json_end = full_info.find('}]', json_start) + 2
-                json_str = full_info[json_start:json_end]
-                json_data = json.loads(json_str)
-                for l in json_data:
-                    if not any(existing['lora_name'] == l['lora_name'] for existing in loras):
-                        loras.append(l)
-        except: pass
+class ZML_LoadA1111DataFolder:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "文件夹路径": ("STRING", {"default": "", "placeholder": "包含 A1111 图像的文件夹"}),
+                "lora_output_format": (["JSON格式", "A1111格式 (<>)"],),
+                "包含子文件夹": ("BOOLEAN", {"default": False}),
+                "跳过无数据图像": ("BOOLEAN", {"default": True, "tooltip": "关闭时，没有 A1111 数据的图像会以默认参数输出，保证列表与文件一一对应"}),
+                "线程数": ("INT", {"default": 8, "min": 1, "max": 64, "tooltip": "并行读取元数据的线程数，只读取文件头，不解码像素"}),
+            },
+        }
 
-        pos_part = lora_pattern.sub("", pos_part)
-        pos_lines = pos_part.split('\n')
-        pos_part = "\n".join([line for line in pos_lines if not line.strip().startswith("LoRA:") and not line.strip().startswith("LoRA JSON:")])
-        pos_part = re.sub(r",\s*,", ",", pos_part).strip(" ,")
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "INT", "FLOAT", "STRING", "STRING", "INT", "STRING", "INT", "INT", "STRING")
+    RETURN_NAMES = ("正面提示词", "负面提示词", "LoRA", "步数", "CFG", "采样器", "调度器", "种子", "模型", "宽", "高", "文件路径")
+    OUTPUT_IS_LIST = (True,) * 12
+    FUNCTION = "load_folder"
+    CATEGORY = "image/ZML_图像/采样器相关"
 
-        lora_out_str = ""
-        if lora_output_format == "JSON格式":
-            if loras:
-                lora_out_str = json.dumps(loras, ensure_ascii=False)
-        else: 
-            tags = []
-            for l in loras:
-                tags.append(f"<lora:{l['lora_name']}:{l['weight']}>")
-            lora_out_str = ", ".join(tags)
+    @staticmethod
+    def list_images(folder, recursive):
+        paths = []
+        if recursive:
+            for root, _, files in os.walk(folder):
+                paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(A1111_IMAGE_EXTENSIONS))
+        else:
+            with os.scandir(folder) as it:
+                paths.extend(e.path for e in it if e.is_file() and e.name.lower().endswith(A1111_IMAGE_EXTENSIONS))
+        paths.sort()
+        return paths
 
-        return (pos_part, neg_part, lora_out_str, steps, cfg, sampler, scheduler, seed, model, w, h, full_info)
+    @classmethod
+    def IS_CHANGED(cls, 文件夹路径, 包含子文件夹, **kwargs):
+        # 文件夹内图像的 (相对路径, 修改时间, 大小) 列表与各选项的摘要：内容未变时沿用上次的结果
+        folder = 文件夹路径.strip().strip('"')
+        digest = hashlib.sha256(json.dumps([folder, 包含子文件夹, kwargs], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        if not os.path.isdir(folder):
+            return digest.hexdigest()
+        for path in cls.list_images(folder, 包含子文件夹):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, folder)}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8", "surrogateescape"))
+        return digest.hexdigest()
+
+    def load_folder(self, 文件夹路径, lora_output_format, 包含子文件夹, 跳过无数据图像, 线程数):
+        folder = 文件夹路径.strip().strip('"')
+        if not os.path.isdir(folder):
+            raise Exception(f"文件夹不存在: {folder}")
+
+        paths = self.list_images(folder, 包含子文件夹)
+
+        with ThreadPoolExecutor(max_workers=线程数) as executor:
+            infos = list(executor.map(read_a1111_info_from_file, paths))
+
+        outputs = [[] for _ in range(len(self.RETURN_TYPES))]
+        for path, full_info in zip(paths, infos):
+            if not full_info and 跳过无数据图像:
+                continue
+            try:
+                parsed = parse_a1111_info(full_info, lora_output_format)
+            except Exception as e:
+                print(f"[ZML] 解析 A1111 数据失败 {path}: {e}")
+                if 跳过无数据图像: continue
+                parsed = parse_a1111_info("", lora_output_format)
+            for i, value in enumerate(parsed[:11]):
+                outputs[i].append(value)
+            outputs[11].append(path)
+
+        print(f"[ZML] A1111 文件夹读取完成: {len(paths)} 个文件, {len(outputs[11])} 条数据")
+        return tuple(outputs)
 
 NODE_CLASS_MAPPINGS = {
     "ZML_KSampler": ZML_KSampler,
@@ -973,6 +1374,7 @@ NODE_CLASS_MAPPINGS = {
     "ZML_SaveImageWithMetadata": ZML_SaveImageWithMetadata,
     "ZML_ConditionNode": ZML_ConditionNode,
     "ZML_LoadA1111Data": ZML_LoadA1111Data,
+    "ZML_LoadA1111DataFolder": ZML_LoadA1111DataFolder,
     "ZML_NoiseScriptNode": ZML_NoiseScriptNode,
     "ZML_BlurSharpenScriptNode": ZML_BlurSharpenScriptNode,
     "ZML_ContrastScriptNode": ZML_ContrastScriptNode,
@@ -985,6 +1387,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "ZML_SaveImageWithMetadata": "ZML_保存图像(A1111)",
     "ZML_ConditionNode": "ZML_CLIP文本编码",
     "ZML_LoadA1111Data": "ZML_加载A1111数据",
+    "ZML_LoadA1111DataFolder": "ZML_批量加载A1111数据(文件夹)",
     "ZML_NoiseScriptNode": "ZML_噪波脚本",
     "ZML_BlurSharpenScriptNode": "ZML_模糊锐化脚本",
     "ZML_ContrastScriptNode": "ZML_对比度脚本",
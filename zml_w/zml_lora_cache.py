@@ -0,0 +1,93 @@
+# LoRA 权重共享缓存与逐格按需加载 (LoRA加载器与XY节点共用)
+# 此文件不注册任何节点；各节点模块以顶层模块名 "zml_lora_cache" 导入，保证共享同一份缓存。
+
+import os
+import threading
+from collections import OrderedDict
+import torch
+import comfy.utils
+import comfy.sd
+
+LORA_STATE_DICT_CACHE_BYTES = 2 * 1024 ** 3  # 已加载LoRA权重的内存上限
+LAZY_LORA_WRAPPER_KEY = "zml_lazy_lora"
+
+# ==========================================
+# 已加载LoRA权重的LRU缓存
+# ==========================================
+class LoraStateDictCache:
+    """按 (路径, 修改时间) 缓存已加载的LoRA权重，按总字节数做LRU淘汰，多个节点共享。
+    返回的字典会被多处同时引用，调用方不得修改。"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (state_dict, nbytes)
+        self.total_bytes = 0
+
+    @staticmethod
+    def _nbytes(state_dict):
+        return sum(v.numel() * v.element_size() for v in state_dict.values() if isinstance(v, torch.Tensor))
+
+    def load(self, lora_path):
+        key = (os.path.normcase(os.path.abspath(lora_path)), os.stat(lora_path).st_mtime_ns)
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is not None:
+                self.entries.move_to_end(key)
+                return hit[0]
+        state_dict = comfy.utils.load_torch_file(lora_path, safe_load=True)
+        nbytes = self._nbytes(state_dict)
+        if nbytes > self.max_bytes:
+            return state_dict
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (state_dict, nbytes)
+                self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+        return state_dict
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+lora_state_dict_cache = LoraStateDictCache(LORA_STATE_DICT_CACHE_BYTES)
+
+# ==========================================
+# 逐格按需加载：模型克隆只记录 (LoRA路径, 强度)，采样开始时才打补丁，采样结束后撤销
+# ==========================================
+def lazy_lora_supported(model):
+    """需要较新的ComfyUI (patcher_extension 包装器)"""
+    try:
+        import comfy.patcher_extension  # noqa: F401
+    except ImportError:
+        return False
+    return hasattr(model, "add_wrapper_with_key")
+
+def _lazy_lora_outer_sample(lora_path, strength):
+    def wrapper(executor, *args, **kwargs):
+        model_patcher = getattr(executor.class_obj, "model_patcher", None)
+        if model_patcher is None:
+            return executor(*args, **kwargs)
+        saved_patches, saved_uuid = model_patcher.patches, model_patcher.patches_uuid
+        lora = lora_state_dict_cache.load(lora_path)
+        patched, _ = comfy.sd.load_lora_for_models(model_patcher, None, lora, strength, 0.0)
+        model_patcher.patches, model_patcher.patches_uuid = patched.patches, patched.patches_uuid
+        del patched, lora
+        try:
+            return executor(*args, **kwargs)
+        finally:
+            # 撤销补丁，释放对LoRA权重的引用；显存中的权重会在下次加载其它克隆时按uuid自动还原
+            model_patcher.patches, model_patcher.patches_uuid = saved_patches, saved_uuid
+    return wrapper
+
+def make_lazy_lora_model(model, lora_path, strength):
+    """返回带按需LoRA的模型克隆；当前ComfyUI不支持时返回None，由调用方改为立即加载"""
+    if not lazy_lora_supported(model):
+        return None
+    import comfy.patcher_extension
+    lazy_model = model.clone()
+    lazy_model.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.OUTER_SAMPLE, LAZY_LORA_WRAPPER_KEY,
+                                    _lazy_lora_outer_sample(lora_path, strength))
+    return lazy_model
@@ -1,5 +1,6 @@
 import os
 import sys
+import asyncio
 import shutil
 import server
 import folder_paths
@@ -17,6 +18,12 @@ import urllib.error
 import urllib.parse
 import re # 导入正则表达式模块
 import copy
+import random
+import threading
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 
 try:
     from nunchaku.lora.flux import to_diffusers
@@ -26,6 +33,12 @@ except ImportError:
         print(f"警告: to_diffusers 功能缺失，无法解析 {path}")
         return {}
 
+# 已加载LoRA权重的LRU放在共享模块中，与XY节点共用
+_zml_dir = os.path.dirname(os.path.abspath(__file__))
+if _zml_dir not in sys.path:
+    sys.path.append(_zml_dir)
+from zml_lora_cache import lora_state_dict_cache
+
 ZML_API_PREFIX = "/zml/lora"
 
 # 用一个元组来表示数据结构，尽管它内部还是字符串，但这向节点图表示了更复杂的数据。
@@ -59,41 +72,291 @@ def clean_html(raw_html):
     text = re.sub(r'\n\s*\n', '\n', text).strip()
     return text
 
-def calculate_sha256(filepath):
-    """计算文件的SHA256哈希值"""
-    sha256 = hashlib.sha256()
-    # 按照ComfyUI官方哈希计算方法
-    # https://github.com/comfyanonymous/ComfyUI/blob/master/server.py#L93
-    # 官方使用分块读取，这里也采用分块读取
-    chunk_size = 4096
+# --- 缓存目录 ---
+# SHA256、Civitai、缩略图和 Nunchaku 形状缓存都放在 ComfyUI 用户目录下（旧版本没有用户目录时放在临时目录），
+# 不写入插件目录：重装插件后缓存仍然有效，插件目录只读时也能正常写入
+def _user_cache_dir():
+    get_user_directory = getattr(folder_paths, "get_user_directory", None)
+    base_dir = get_user_directory() if get_user_directory else folder_paths.get_temp_directory()
+    return os.path.join(base_dir, "zml_lora_cache")
+
+LORA_CACHE_DIR = _user_cache_dir()
+LEGACY_LORA_CACHE_DIR = os.path.join(os.path.dirname(__file__), "txt", "LoRA Cache")  # 旧版本的插件内缓存目录，仅用于清理
+
+# --- SHA256 哈希缓存 ---
+# 缓存文件按 (路径, 大小, 修改时间) 校验，文件未变时不再重新读取整个LoRA
+LORA_HASH_CACHE_FILE = os.path.join(LORA_CACHE_DIR, "sha256.json")
+HASH_READ_BUFFER_SIZE = 4 * 1024 * 1024  # 4MB，大文件读取时远快于4KB分块
+
+class JsonCacheFile:
+    """线程安全的JSON键值缓存文件，首次使用时加载，flush() 时原子写回"""
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # 串行化整个 快照-写入-替换 过程，避免多个线程同时写文件
+        self.entries = None
+        self.version = 0        # 每次修改加一
+        self.saved_version = 0  # 已成功写入文件的版本
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self.entries = data
+            except Exception as e:
+                print(f"[ZML_Parser] 读取缓存文件失败，将重新生成 {self.cache_file}: {e}")
+
+    def get_entry(self, key):
+        with self.lock:
+            self._load()
+            return self.entries.get(key)
+
+    def set_entry(self, key, value):
+        with self.lock:
+            self._load()
+            self.entries[key] = value
+            self.version += 1
+
+    def flush(self):
+        """写入唯一的临时文件后替换，避免写到一半时被中断导致缓存损坏。
+        写入失败时保留未保存状态，下次 flush 会重试"""
+        with self.write_lock:
+            with self.lock:
+                if self.entries is None or self.version == self.saved_version:
+                    return
+                data = dict(self.entries)
+                version = self.version
+            cache_dir = os.path.dirname(self.cache_file)
+            tmp_path = None
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir, suffix=".tmp", delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_file)
+            except Exception as e:
+                print(f"[ZML_Parser] 保存缓存文件失败 {self.cache_file}: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                return
+            with self.lock:
+                self.saved_version = version
+
+class LoraHashCache(JsonCacheFile):
+    """SHA256缓存，条目按 (路径, 大小, 修改时间) 校验"""
+    @staticmethod
+    def _key(filepath):
+        return os.path.normcase(os.path.abspath(filepath))
+
+    def get(self, filepath, st):
+        entry = self.get_entry(self._key(filepath))
+        if entry and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime_ns:
+            return entry.get("sha256")
+        return None
+
+    def put(self, filepath, st, digest):
+        self.set_entry(self._key(filepath), {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": digest})
+
+lora_hash_cache = LoraHashCache(LORA_HASH_CACHE_FILE)
+
+def _hash_file_sha256(filepath):
+    """以大缓冲区计算文件SHA256，结果与逐块读取完全一致"""
     with open(filepath, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256 = hashlib.sha256()
+        buf = bytearray(HASH_READ_BUFFER_SIZE)
+        view = memoryview(buf)
         while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
+            n = f.readinto(buf)
+            if not n:
                 break
-            sha256.update(chunk)
-    return sha256.hexdigest()
+            sha256.update(view[:n])
+        return sha256.hexdigest()
+
+def calculate_sha256(filepath, flush=True):
+    """计算文件的SHA256哈希值，文件大小和修改时间未变时直接使用缓存"""
+    st = os.stat(filepath)
+    digest = lora_hash_cache.get(filepath, st)
+    if digest:
+        return digest
+    digest = _hash_file_sha256(filepath)
+    lora_hash_cache.put(filepath, st, digest)
+    if flush:
+        lora_hash_cache.flush()
+    return digest
+
+# --- 后台预计算整个loras文件夹的哈希 ---
+class LoraPrehashWorker:
+    """在后台线程中依次计算所有LoRA的哈希，进度通过 /prehash_progress 查询"""
+    FLUSH_EVERY = 20
 
-def fetch_civitai_data_by_hash(hash_string):
-    """通过哈希值从Civitai API获取模型版本信息"""
-    url = f"https://civitai.com/api/v1/model-versions/by-hash/{hash_string}"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    
-    try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            if response.status == 200:
-                data = json.loads(response.read().decode('utf-8'))
-                model_url = f"https://civitai.com/api/v1/models/{data['modelId']}"
-                model_req = urllib.request.Request(model_url, headers=headers)
-                with urllib.request.urlopen(model_req) as model_response:
-                    if model_response.status == 200:
-                        data['model'] = json.loads(model_response.read().decode('utf-8'))
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.state = {"running": False, "total": 0, "done": 0, "cached": 0, "failed": 0, "current": ""}
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return False
+            self.stop_event.clear()
+            self.state = {"running": True, "total": 0, "done": 0, "cached": 0, "failed": 0, "current": ""}
+            self.thread = threading.Thread(target=self._run, name="zml-lora-prehash", daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def progress(self):
+        with self.lock:
+            return dict(self.state)
+
+    def _update(self, **kwargs):
+        with self.lock:
+            self.state.update(kwargs)
+
+    def _run(self):
+        try:
+            lora_files = []
+            for name in folder_paths.get_filename_list("loras"):
+                full_path = folder_paths.get_full_path("loras", name)
+                if full_path:
+                    lora_files.append((name, full_path))
+            self._update(total=len(lora_files))
+
+            done = cached = failed = 0
+            for i, (name, full_path) in enumerate(lora_files):
+                if self.stop_event.is_set():
+                    break
+                self._update(current=name)
+                try:
+                    st = os.stat(full_path)
+                    if lora_hash_cache.get(full_path, st):
+                        cached += 1
                     else:
-                        data['model'] = {} # No model info if that request fails
-                return data
-            else:
-                print(f"[ZML_Parser] Civitai API请求失败: 状态码 {response.status} (Hash: {hash_string})")
+                        calculate_sha256(full_path, flush=False)
+                except Exception as e:
+                    failed += 1
+                    print(f"[ZML_Parser] 预计算哈希失败 {name}: {e}")
+                done += 1
+                self._update(done=done, cached=cached, failed=failed)
+                if (i + 1) % self.FLUSH_EVERY == 0:
+                    lora_hash_cache.flush()
+        finally:
+            lora_hash_cache.flush()
+            self._update(running=False, current="")
+
+lora_prehash_worker = LoraPrehashWorker()
+
+# --- Civitai 请求：本地缓存、按主机限速、失败退避重试 ---
+CIVITAI_API_BASE = "https://civitai.com/api/v1"
+CIVITAI_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+CIVITAI_CACHE_FILE = os.path.join(LORA_CACHE_DIR, "civitai.json")
+CIVITAI_MIN_INTERVAL = 0.5        # 同一主机两次请求的最小间隔（秒）
+CIVITAI_MAX_RETRIES = 3
+CIVITAI_BACKOFF_BASE = 1.0        # 退避时间 1s, 2s, 4s ...
+CIVITAI_NOT_FOUND_TTL = 24 * 3600 # "未找到" 结果只缓存一天，之后允许重新查询
+CIVITAI_BATCH_MAX_WORKERS = 4
+
+civitai_cache = JsonCacheFile(CIVITAI_CACHE_FILE)
+
+class HostRateLimiter:
+    """按主机名限制请求频率，多线程共享"""
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_time = {}
+
+    def wait(self, url):
+        host = urllib.parse.urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time.get(host, 0.0))
+            self.next_time[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+civitai_rate_limiter = HostRateLimiter(CIVITAI_MIN_INTERVAL)
+
+def _retry_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), 60.0)
+        except ValueError:
+            pass
+    return CIVITAI_BACKOFF_BASE * (2 ** attempt) * (1 + random.random() * 0.25)
+
+def civitai_get_json(url):
+    """GET一个Civitai JSON接口。404返回None，限流(429)/服务器错误/网络错误会退避重试，最终失败时抛出异常"""
+    last_error = None
+    for attempt in range(CIVITAI_MAX_RETRIES + 1):
+        civitai_rate_limiter.wait(url)
+        try:
+            req = urllib.request.Request(url, headers=CIVITAI_HEADERS)
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            if e.code != 429 and e.code < 500:
+                raise
+            last_error = e
+            delay = _retry_delay(attempt, e.headers.get("Retry-After") if e.headers else None)
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            last_error = e
+            delay = _retry_delay(attempt)
+        if attempt < CIVITAI_MAX_RETRIES:
+            print(f"[ZML_Parser] Civitai请求失败，{delay:.1f}秒后重试 ({attempt + 1}/{CIVITAI_MAX_RETRIES}): {last_error}")
+            time.sleep(delay)
+    raise last_error
+
+def fetch_civitai_data_by_hash(hash_string, use_cache=True, flush=True):
+    """通过哈希值从Civitai API获取模型版本信息，结果按哈希缓存到本地。
+    flush=False 时只更新内存中的缓存，由调用方在批量处理结束后统一写回"""
+    cache_key = hash_string.lower()
+    if use_cache:
+        entry = civitai_cache.get_entry(cache_key)
+        if entry:
+            fresh = time.time() - entry.get("time", 0) < CIVITAI_NOT_FOUND_TTL
+            if entry.get("data") is not None:
+                # 缺少模型信息的结果和"未找到"一样只在短时间内有效
+                if fresh or not entry.get("incomplete"):
+                    return entry["data"]
+            elif fresh:
+                return None
+
+    try:
+        data = civitai_get_json(f"{CIVITAI_API_BASE}/model-versions/by-hash/{hash_string}")
+        incomplete = False
+        if data is not None:
+            try:
+                model = civitai_get_json(f"{CIVITAI_API_BASE}/models/{data['modelId']}")
+            except Exception as e:
+                print(f"[ZML_Parser] 获取Civitai模型信息失败: {e} (Hash: {hash_string})")
+                model = None
+            incomplete = model is None
+            data['model'] = model or {} # No model info if that request fails
+        else:
+            print(f"[ZML_Parser] Civitai上未找到该模型 (Hash: {hash_string})")
+        # 只缓存明确的结果，网络错误不写入缓存；模型信息获取失败时按"未找到"的有效期缓存
+        entry = {"time": time.time(), "data": data}
+        if incomplete:
+            entry["incomplete"] = True
+        civitai_cache.set_entry(cache_key, entry)
+        if flush:
+            civitai_cache.flush()
+        return data
     except urllib.error.HTTPError as e:
         print(f"[ZML_Parser] Civitai API请求失败: {e} (Hash: {hash_string})")
     except Exception as e:
@@ -104,10 +367,10 @@ def download_file(url, destination_path):
     """下载文件到指定路径，如果是视频则同时保存第一帧和视频本身"""
     import cv2
     import os
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req) as response:
+        civitai_rate_limiter.wait(url)
+        req = urllib.request.Request(url, headers=CIVITAI_HEADERS)
+        with urllib.request.urlopen(req, timeout=60) as response:
             if response.status == 200:
                 # 获取文件类型
                 content_type = response.getheader('Content-Type', '')
@@ -156,6 +419,112 @@ def download_file(url, destination_path):
         print(f"[ZML_Parser] 下载文件时出错 {url}: {e}")
     return False
 
+# --- 预览图缩略图缓存 ---
+# 缩略图放在用户目录的缓存中，文件名为 <(路径, 尺寸档位) 的哈希>_<修改时间>_<文件大小>：
+# 原图变化后生成新文件并删除同一 (路径, 档位) 的旧版本；总大小超过上限或长期未使用的缩略图定期清理
+LORA_THUMB_CACHE_DIR = os.path.join(LORA_CACHE_DIR, "thumbs")
+LORA_THUMB_LEGACY_DIR = os.path.join(LEGACY_LORA_CACHE_DIR, "thumbs")
+LORA_THUMB_BUCKETS = (128, 256, 512, 1024)
+LORA_THUMB_QUALITY = 85
+LORA_THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LORA_THUMB_MAX_AGE = 30 * 24 * 3600     # 超过该时间未被使用的缩略图会被删除（秒）
+LORA_THUMB_TOUCH_INTERVAL = 24 * 3600   # 命中缓存时最多每天更新一次修改时间，作为"最近使用"时间
+LORA_THUMB_PRUNE_INTERVAL = 600         # 两次清理的最小间隔（秒）
+lora_thumb_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="zml-lora-thumb")
+_lora_thumb_webp = None
+_lora_thumb_prune_lock = threading.Lock()
+_lora_thumb_last_prune = 0.0
+
+def _thumb_use_webp():
+    global _lora_thumb_webp
+    if _lora_thumb_webp is None:
+        from PIL import features
+        _lora_thumb_webp = bool(features.check("webp"))
+    return _lora_thumb_webp
+
+def prune_lora_thumbnails(force=False):
+    """删除过期的缩略图，并按最近使用时间从旧到新删除，直到总大小不超过上限。返回删除的文件数"""
+    global _lora_thumb_last_prune
+    now = time.time()
+    with _lora_thumb_prune_lock:
+        if not force and now - _lora_thumb_last_prune < LORA_THUMB_PRUNE_INTERVAL:
+            return 0
+        _lora_thumb_last_prune = now
+        if os.path.isdir(LORA_THUMB_LEGACY_DIR):
+            shutil.rmtree(LORA_THUMB_LEGACY_DIR, ignore_errors=True)
+        files = []
+        for dir_path, _, filenames in os.walk(LORA_THUMB_CACHE_DIR):
+            for filename in filenames:
+                path = os.path.join(dir_path, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if total <= LORA_THUMB_CACHE_MAX_BYTES and now - mtime <= LORA_THUMB_MAX_AGE:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+def get_lora_thumbnail(source_path, requested_size):
+    """返回不小于 requested_size 的最小档位缩略图路径；原图本身不大于该档位时直接返回原图"""
+    bucket = next((b for b in LORA_THUMB_BUCKETS if b >= requested_size), LORA_THUMB_BUCKETS[-1])
+    st = os.stat(source_path)
+    ext = ".webp" if _thumb_use_webp() else ".jpg"
+    key_src = f"{os.path.normcase(os.path.abspath(source_path))}|{bucket}"
+    key = hashlib.sha1(key_src.encode("utf-8")).hexdigest()
+    thumb_dir = os.path.join(LORA_THUMB_CACHE_DIR, key[:2])
+    thumb_name = f"{key}_{st.st_mtime_ns}_{st.st_size}{ext}"
+    thumb_path = os.path.join(thumb_dir, thumb_name)
+    try:
+        thumb_mtime = os.stat(thumb_path).st_mtime
+    except OSError:
+        thumb_mtime = None
+    if thumb_mtime is not None:
+        if time.time() - thumb_mtime > LORA_THUMB_TOUCH_INTERVAL:
+            try:
+                os.utime(thumb_path)
+            except OSError:
+                pass
+        return thumb_path
+
+    with Image.open(source_path) as img:
+        if max(img.size) <= bucket:
+            return source_path
+        img.draft("RGB", (bucket, bucket))  # JPEG可直接按缩小比例解码
+        img.thumbnail((bucket, bucket), Image.LANCZOS)
+        if ext == ".webp":
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+            save_kwargs = {"format": "WEBP", "quality": LORA_THUMB_QUALITY, "method": 4}
+        else:
+            img = img.convert("RGB")
+            save_kwargs = {"format": "JPEG", "quality": LORA_THUMB_QUALITY, "optimize": True}
+        os.makedirs(thumb_dir, exist_ok=True)
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, **save_kwargs)
+    os.replace(tmp_path, thumb_path)
+
+    # 删除同一 (路径, 档位) 的旧版本缩略图
+    with os.scandir(thumb_dir) as it:
+        stale = [entry.path for entry in it if entry.name.startswith(key + "_") and entry.name != thumb_name
+                 and not entry.name.endswith(".tmp")]
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    prune_lora_thumbnails()
+    return thumb_path
+
 # --- API 路由 ---
 @server.PromptServer.instance.routes.get(ZML_API_PREFIX + "/view/{name:.*}")
 async def view_lora_preview(request):
@@ -191,17 +560,33 @@ async def view_lora_preview(request):
     preview_filename_with_ext = os.path.basename(relative_path_within_type)
 
     # 查找顺序: 1. zml子文件夹 2. LoRA同级目录
-    # 1. 先在zml子文件夹中查找
     zml_target_path = os.path.join(actual_lora_dir, "zml", preview_filename_with_ext)
-    if os.path.isfile(zml_target_path):
-        return web.FileResponse(zml_target_path, headers={"Content-Disposition": f"filename=\"{os.path.basename(zml_target_path)}\""})
-
-    # 2. 如果没找到，在LoRA同级目录中查找
     sibling_target_path = os.path.join(actual_lora_dir, preview_filename_with_ext)
-    if os.path.isfile(sibling_target_path):
-        return web.FileResponse(sibling_target_path, headers={"Content-Disposition": f"filename=\"{os.path.basename(sibling_target_path)}\""})
+    target_path = None
+    for candidate_path in (zml_target_path, sibling_target_path):
+        if os.path.isfile(candidate_path):
+            target_path = candidate_path
+            break
+    if not target_path:
+        return web.Response(status=404, text=f"预览图未找到: {zml_target_path} 或 {sibling_target_path}")
+
+    # 带 size 参数时返回缓存的缩略图（视频等非图片文件仍返回原文件）
+    size_param = request.query.get("size")
+    if size_param and os.path.splitext(target_path)[1].lower() in LORA_PREVIEW_EXTENSIONS:
+        try:
+            requested_size = int(size_param)
+        except ValueError:
+            return web.Response(status=400, text=f"无效的size参数: {size_param}")
+        try:
+            thumb_path = await asyncio.get_running_loop().run_in_executor(
+                lora_thumb_executor, get_lora_thumbnail, target_path, requested_size)
+            # 前端以 v 参数区分版本，此时缩略图可长期缓存
+            cache_control = "public, max-age=31536000, immutable" if "v" in request.query else "no-cache"
+            return web.FileResponse(thumb_path, headers={"Cache-Control": cache_control})
+        except Exception as e:
+            print(f"[ZML_Parser] 生成缩略图失败，改为返回原图 {target_path}: {e}")
 
-    return web.Response(status=404, text=f"预览图未找到: {zml_target_path} 或 {sibling_target_path}")
+    return web.FileResponse(target_path, headers={"Content-Disposition": f"filename=\"{os.path.basename(target_path)}\""})
 
 
 @server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/save/{name:.*}")
@@ -244,50 +629,183 @@ async def save_preview(request):
     return web.json_response({"image": final_relative_image_path_for_frontend})
 
 
+# --- LoRA目录索引：每个目录只 scandir 一次，按目录修改时间失效 ---
+LORA_PREVIEW_EXTENSIONS = [".png", ".jpg", ".jpeg", ".webp"]
+
+class LoraDirIndex:
+    """缓存目录内容 {文件名主干: {扩展名...}}，目录修改时间变化（文件增删/改名）时重新扫描"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dirs = {}  # 目录 -> (mtime_ns, {stem: set(ext)})
+
+    @staticmethod
+    def _scan(dir_path):
+        stems = {}
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                stem, ext = os.path.splitext(os.path.normcase(entry.name))
+                stems.setdefault(stem, set()).add(ext)
+        return stems
+
+    def get(self, dir_path, mtime):
+        """返回目录的索引；mtime 为调用方取得的目录修改时间，目录不存在时传 None，返回空字典"""
+        if mtime is None:
+            with self.lock:
+                self.dirs.pop(dir_path, None)
+            return {}
+        with self.lock:
+            cached = self.dirs.get(dir_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            stems = self._scan(dir_path)
+        except OSError:
+            return {}
+        with self.lock:
+            self.dirs[dir_path] = (mtime, stems)
+        return stems
+
+lora_dir_index = LoraDirIndex()
+
+class LoraDirSnapshot:
+    """单次请求内的目录视图：每个不同的目录只 stat 一次，修改时间同时用于计算 ETag。
+    覆盖同名预览图不会改变目录修改时间，因此预览图文件本身的 (修改时间, 大小) 也按目录记录一次"""
+    def __init__(self, index):
+        self.index = index
+        self.mtimes = {}         # 目录 -> mtime_ns 或 None(不存在)
+        self.preview_stats = {}  # 目录 -> {规范化文件名: (mtime_ns, 大小)}
+
+    def mtime(self, dir_path):
+        dir_path = os.path.normpath(dir_path)
+        if dir_path not in self.mtimes:
+            try:
+                self.mtimes[dir_path] = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                self.mtimes[dir_path] = None
+        return self.mtimes[dir_path]
+
+    def get(self, dir_path):
+        dir_path = os.path.normpath(dir_path)
+        return self.index.get(dir_path, self.mtime(dir_path))
+
+    def has_file(self, dir_path, filename):
+        stem, ext = os.path.splitext(os.path.normcase(filename))
+        return ext in self.get(dir_path).get(stem, ())
+
+    def previews(self, dir_path):
+        """目录中所有预览图的 {规范化文件名: (mtime_ns, 大小)}"""
+        dir_path = os.path.normpath(dir_path)
+        stats = self.preview_stats.get(dir_path)
+        if stats is None:
+            stats = self.preview_stats[dir_path] = {}
+            for stem, exts in self.get(dir_path).items():
+                for ext in exts:
+                    if ext not in LORA_PREVIEW_EXTENSIONS:
+                        continue
+                    try:
+                        st = os.stat(os.path.join(dir_path, stem + ext))
+                    except OSError:
+                        continue
+                    stats[stem + ext] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def preview_version(self, lora_dir, preview_name):
+        """预览图的版本号 (修改时间与大小)，查找顺序与 /view 接口一致: zml子文件夹优先于LoRA同级目录"""
+        name = os.path.normcase(preview_name)
+        for dir_path in (os.path.join(lora_dir, "zml"), lora_dir):
+            stat = self.previews(dir_path).get(name)
+            if stat:
+                return f"{stat[0]:x}-{stat[1]:x}"
+        return None
+
+def resolve_lora_path_indexed(lora_filename, lora_roots, dirs):
+    """与 folder_paths.get_full_path 相同的查找顺序，但使用目录索引代替逐个 isfile"""
+    rel_path = os.path.normpath(lora_filename)
+    rel_dir, rel_name = os.path.split(rel_path)
+    for root in lora_roots:
+        dir_path = os.path.join(root, rel_dir)
+        if dirs.has_file(dir_path, rel_name):
+            return os.path.join(dir_path, rel_name)
+    return None
+
+def find_lora_preview_name(lora_dir, lora_basename_no_ext, dirs):
+    """
+    返回LoRA预览图的文件名（不含目录），没有则返回None。
+    查找顺序与旧逻辑一致: 按扩展名依次查找，同一扩展名下 zml子文件夹 优先于 LoRA同级目录
+    """
+    stem = os.path.normcase(lora_basename_no_ext)
+    zml_exts = dirs.get(os.path.join(lora_dir, "zml")).get(stem, ())
+    sibling_exts = dirs.get(lora_dir).get(stem, ())
+    for ext in LORA_PREVIEW_EXTENSIONS:
+        if ext in zml_exts or ext in sibling_exts:
+            return f"{lora_basename_no_ext}{ext}"
+    return None
+
+def lora_images_etag(lora_files, lora_roots, dirs, with_versions=False):
+    """由LoRA文件列表、所有相关目录（含zml子文件夹）的修改时间和其中预览图的 (修改时间, 大小) 计算 ETag，
+    无需先生成映射。预览图被原地覆盖（包括在插件之外修改）时 ETag 也会变化"""
+    rel_dirs = sorted({os.path.dirname(os.path.normpath(name)) for name in lora_files})
+    state = []
+    for root in lora_roots:
+        for rel_dir in rel_dirs:
+            dir_path = os.path.join(root, rel_dir)
+            zml_path = os.path.join(dir_path, "zml")
+            state.append((dir_path, dirs.mtime(dir_path), dirs.mtime(zml_path),
+                          sorted(dirs.previews(dir_path).items()), sorted(dirs.previews(zml_path).items())))
+    key = json.dumps([with_versions, list(lora_files), list(lora_roots), state], ensure_ascii=False)
+    return '"' + hashlib.md5(key.encode("utf-8")).hexdigest() + '"'
+
 @server.PromptServer.instance.routes.get(ZML_API_PREFIX + "/images/{type}")
 async def get_images(request):
     """
     获取所有LoRA文件及其对应的预览图的映射。
     查找顺序: 1. zml子文件夹 2. LoRA同级目录
+    每个目录每次请求只 stat 一次，内容按目录修改时间缓存；ETag 由目录与预览图的修改时间得出，未变时直接返回 304。
+    带 versions=1 参数时返回 {"images": 映射, "versions": {预览图路径: 版本号}}，版本号由预览图文件自身的
+    修改时间和大小得出，前端用作缩略图地址的 v 参数
     """
     file_type_str = request.match_info["type"]
     if file_type_str != "loras":
         return web.json_response({})
-
-    lora_files = folder_paths.get_filename_list(file_type_str)
-    images = {}
-
-    for lora_filename in lora_files: # lora_filename is like "subdir/mylora.safetensors"
-        lora_full_path = folder_paths.get_full_path("loras", lora_filename)
-        if not lora_full_path:
-            continue
-
-        lora_dir = os.path.dirname(lora_full_path)
-        lora_basename_no_ext = os.path.splitext(os.path.basename(lora_filename))[0]
-        lora_dir_relative = os.path.dirname(lora_filename) # e.g. "subdir"
-
-        # 查找顺序: 1. zml子文件夹 2. LoRA同级目录
-        found = False
-        for ext in [".png", ".jpg", ".jpeg", ".webp"]:
-            # 先在zml子文件夹中查找
-            zml_preview_path = os.path.join(lora_dir, "zml", f"{lora_basename_no_ext}{ext}")
-            if os.path.isfile(zml_preview_path):
-                preview_basename = os.path.basename(zml_preview_path)
-                relative_path_for_frontend = os.path.join(lora_dir_relative, preview_basename).replace("\\", "/")
-                images[lora_filename] = relative_path_for_frontend
-                found = True
-                break
-
-            # 如果没找到，在LoRA同级目录中查找
-            sibling_preview_path = os.path.join(lora_dir, f"{lora_basename_no_ext}{ext}")
-            if os.path.isfile(sibling_preview_path):
-                preview_basename = os.path.basename(sibling_preview_path)
-                relative_path_for_frontend = os.path.join(lora_dir_relative, preview_basename).replace("\\", "/")
-                images[lora_filename] = relative_path_for_frontend
-                found = True
-                break
-
-    return web.json_response(images)
+    if_none_match = request.headers.get("If-None-Match", "")
+    with_versions = request.query.get("versions") in ("1", "true")
+
+    def build_images():
+        lora_files = folder_paths.get_filename_list(file_type_str)
+        lora_roots = folder_paths.get_folder_paths(file_type_str)
+        dirs = LoraDirSnapshot(lora_dir_index)
+        etag = lora_images_etag(lora_files, lora_roots, dirs, with_versions)
+        if etag in if_none_match:
+            return etag, None
+        images = {}
+        versions = {}
+        for lora_filename in lora_files: # lora_filename is like "subdir/mylora.safetensors"
+            lora_full_path = resolve_lora_path_indexed(lora_filename, lora_roots, dirs)
+            if not lora_full_path:
+                continue
+            lora_dir = os.path.dirname(lora_full_path)
+            lora_basename_no_ext = os.path.splitext(os.path.basename(lora_filename))[0]
+            preview_basename = find_lora_preview_name(lora_dir, lora_basename_no_ext, dirs)
+            if preview_basename:
+                lora_dir_relative = os.path.dirname(lora_filename) # e.g. "subdir"
+                preview_path = os.path.join(lora_dir_relative, preview_basename).replace("\\", "/")
+                images[lora_filename] = preview_path
+                version = dirs.preview_version(lora_dir, preview_basename)
+                if version:
+                    versions[preview_path] = version
+        return etag, ({"images": images, "versions": versions} if with_versions else images)
+
+    etag, images = await asyncio.get_running_loop().run_in_executor(None, build_images)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if images is None:
+        return web.Response(status=304, headers=headers)
+    payload = json.dumps(images, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return web.Response(body=payload, content_type="application/json", headers=headers)
 
 @server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/get_lora_file")
 async def get_lora_file(request):
@@ -371,6 +889,117 @@ async def save_lora_file(request):
         return web.json_response({"status": "error", "message": f"服务器内部错误: {e}"}, status=500)
 
 
+@server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/prehash")
+async def start_lora_prehash(request):
+    """
+    启动或停止后台哈希预计算。
+    期望接收 JSON body: {"action": "start" | "stop"}
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    if body.get("action", "start") == "stop":
+        lora_prehash_worker.stop()
+        return web.json_response({"status": "success", "message": "已请求停止预计算", "progress": lora_prehash_worker.progress()})
+    started = lora_prehash_worker.start()
+    message = "已开始预计算LoRA哈希" if started else "预计算已在进行中"
+    return web.json_response({"status": "success", "message": message, "progress": lora_prehash_worker.progress()})
+
+
+@server.PromptServer.instance.routes.get(ZML_API_PREFIX + "/prehash_progress")
+async def get_lora_prehash_progress(request):
+    """返回后台哈希预计算的进度"""
+    return web.json_response({"status": "success", "progress": lora_prehash_worker.progress()})
+
+
+def fetch_and_save_civitai_metadata(lora_relative_filename, flush=True):
+    """
+    为单个LoRA从Civitai获取元数据，并在zml子文件夹中保存预览图、触发词(txt)和介绍(log)。
+    返回 (是否找到LoRA文件, 消息, 下载的预览图相对路径或None)。会阻塞，需在线程中调用。
+    flush=False 时哈希与Civitai缓存不立即写回文件，由批量调用方统一写回。
+    """
+    lora_full_path = folder_paths.get_full_path("loras", lora_relative_filename)
+    if not lora_full_path or not os.path.exists(lora_full_path):
+        return False, f"LoRA文件未找到: {lora_relative_filename}", None
+
+    lora_dir = os.path.dirname(lora_full_path)
+    lora_basename_no_ext = os.path.splitext(os.path.basename(lora_relative_filename))[0]
+    zml_dir = os.path.join(lora_dir, "zml")
+    os.makedirs(zml_dir, exist_ok=True)
+
+    lora_hash = calculate_sha256(lora_full_path, flush=flush)
+    civitai_data = fetch_civitai_data_by_hash(lora_hash, flush=flush) # 调用辅助函数
+
+    downloaded_image_path = None
+    message_parts = []
+
+    if civitai_data:
+        message_parts.append(f"已从Civitai获取到 '{civitai_data.get('model', {}).get('name', 'N/A')}' 的信息。")
+
+        # --- 保存首张图像 ---
+        if civitai_data.get('images'):
+            first_image = civitai_data['images'][0]
+            img_url = first_image.get('url')
+            img_ext = os.path.splitext(urllib.parse.urlparse(img_url).path)[1]
+            if not img_ext or not img_ext.lower() in ['.png', '.jpg', '.jpeg', '.webp']:
+                img_ext = '.jpg' # Fallback to JPG
+            img_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}{img_ext}")
+            if download_file(img_url, img_dest_path):
+                # 返回的路径应是其在LoRA根目录下的相对路径，不包含“zml/”
+                downloaded_image_path = os.path.join(os.path.dirname(lora_relative_filename), os.path.basename(img_dest_path)).replace("\\", "/")
+                message_parts.append("预览图已下载。")
+            else:
+                message_parts.append("预览图下载失败。")
+        else:
+            message_parts.append("Civitai上没有找到预览图。")
+
+        # --- 保存触发词为txt ---
+        if civitai_data.get('trainedWords'):
+            words_content = ", ".join(civitai_data['trainedWords'])
+            txt_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}.txt")
+            try:
+                with open(txt_dest_path, 'w', encoding='utf-8') as f:
+                    f.write(words_content)
+                message_parts.append("触发词已保存。")
+            except Exception as e:
+                print(f"[ZML_Parser] 保存触发词时出错: {e}")
+                message_parts.append("触发词保存失败。")
+        else:
+            message_parts.append("Civitai上没有找到触发词。")
+
+        # --- 保存介绍为log ---
+        raw_model_desc = civitai_data.get('model', {}).get('description', '')
+        raw_version_desc = civitai_data.get('description', '')
+        model_desc = clean_html(raw_model_desc)
+        version_desc = clean_html(raw_version_desc)
+        base_model = civitai_data.get('baseModel', 'N/A')
+        model_id = civitai_data.get('modelId')
+        version_id = civitai_data.get('id')
+        civitai_link = f"https://civitai.com/models/{model_id}?modelVersionId={version_id}" if model_id and version_id else "链接不可用"
+
+        log_content = (
+            f"--- 基础信息 ---\n"
+            f"基础模型: {base_model}\n"
+            f"C站链接: {civitai_link}\n\n"
+            f"--- 模型介绍 ---\n\n{model_desc if model_desc else '无模型介绍。'}\n\n"
+            f"--- 版本信息 ---\n\n{version_desc if version_desc else '无版本信息。'}\n"
+        )
+        log_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}.log")
+        try:
+            with open(log_dest_path, 'w', encoding='utf-8') as f:
+                f.write(log_content)
+            message_parts.append("介绍已保存。")
+        except Exception as e:
+            print(f"[ZML_Parser] 保存介绍时出错: {e}")
+            message_parts.append("介绍保存失败。")
+    else:
+        message_parts.append("无法从Civitai获取此LoRA的信息（可能未上传或哈希不匹配）。")
+
+
+    return True, "\n".join(message_parts), downloaded_image_path
+
+
 @server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/fetch_civitai_metadata")
 async def fetch_civitai_metadata_api(request): # 重命名函数以避免与内部辅助函数fetch_civitai_data_by_hash混淆
     """
@@ -385,91 +1014,69 @@ async def fetch_civitai_metadata_api(request): # 重命名函数以避免与内
         if not lora_relative_filename:
             return web.json_response({"status": "error", "message": "缺少 'lora_filename' 参数"}, status=400)
 
-        lora_full_path = folder_paths.get_full_path("loras", lora_relative_filename)
-        if not lora_full_path or not os.path.exists(lora_full_path):
-            return web.json_response({"status": "error", "message": f"LoRA文件未找到: {lora_relative_filename}"}, status=404)
+        # 哈希计算和网络请求都放到线程池，避免阻塞服务器事件循环
+        found, message, downloaded_image_path = await asyncio.get_running_loop().run_in_executor(
+            None, fetch_and_save_civitai_metadata, lora_relative_filename)
+        if not found:
+            return web.json_response({"status": "error", "message": message}, status=404)
+            
+        return web.json_response({
+            "status": "success", 
+            "message": message, 
+            "image_path_updated": downloaded_image_path
+        })
 
-        lora_dir = os.path.dirname(lora_full_path)
-        lora_basename_no_ext = os.path.splitext(os.path.basename(lora_relative_filename))[0]
-        zml_dir = os.path.join(lora_dir, "zml")
-        os.makedirs(zml_dir, exist_ok=True)
-        
-        lora_hash = calculate_sha256(lora_full_path)
-        civitai_data = fetch_civitai_data_by_hash(lora_hash) # 调用辅助函数
-        
-        downloaded_image_path = None
-        message_parts = []
+    except Exception as e:
+        print(f"[ZML_Parser] 处理Civitai元数据请求时出错: {e}")
+        return web.json_response({"status": "error", "message": f"服务器内部错误: {e}"}, status=500)
 
-        if civitai_data:
-            message_parts.append(f"已从Civitai获取到 '{civitai_data.get('model', {}).get('name', 'N/A')}' 的信息。")
-            
-            # --- 保存首张图像 ---
-            if civitai_data.get('images'):
-                first_image = civitai_data['images'][0]
-                img_url = first_image.get('url')
-                img_ext = os.path.splitext(urllib.parse.urlparse(img_url).path)[1]
-                if not img_ext or not img_ext.lower() in ['.png', '.jpg', '.jpeg', '.webp']:
-                    img_ext = '.jpg' # Fallback to JPG
-                img_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}{img_ext}")
-                if download_file(img_url, img_dest_path):
-                    # 返回的路径应是其在LoRA根目录下的相对路径，不包含“zml/”
-                    downloaded_image_path = os.path.join(os.path.dirname(lora_relative_filename), os.path.basename(img_dest_path)).replace("\\", "/")
-                    message_parts.append("预览图已下载。")
-                else:
-                    message_parts.append("预览图下载失败。")
-            else:
-                message_parts.append("Civitai上没有找到预览图。")
 
-            # --- 保存触发词为txt ---
-            if civitai_data.get('trainedWords'):
-                words_content = ", ".join(civitai_data['trainedWords'])
-                txt_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}.txt")
-                try:
-                    with open(txt_dest_path, 'w', encoding='utf-8') as f:
-                        f.write(words_content)
-                    message_parts.append("触发词已保存。")
-                except Exception as e:
-                    print(f"[ZML_Parser] 保存触发词时出错: {e}")
-                    message_parts.append("触发词保存失败。")
-            else:
-                message_parts.append("Civitai上没有找到触发词。")
-            
-            # --- 保存介绍为log ---
-            raw_model_desc = civitai_data.get('model', {}).get('description', '')
-            raw_version_desc = civitai_data.get('description', '')
-            model_desc = clean_html(raw_model_desc)
-            version_desc = clean_html(raw_version_desc)
-            base_model = civitai_data.get('baseModel', 'N/A')
-            model_id = civitai_data.get('modelId')
-            version_id = civitai_data.get('id')
-            civitai_link = f"https://civitai.com/models/{model_id}?modelVersionId={version_id}" if model_id and version_id else "链接不可用"
-
-            log_content = (
-                f"--- 基础信息 ---\n"
-                f"基础模型: {base_model}\n"
-                f"C站链接: {civitai_link}\n\n"
-                f"--- 模型介绍 ---\n\n{model_desc if model_desc else '无模型介绍。'}\n\n"
-                f"--- 版本信息 ---\n\n{version_desc if version_desc else '无版本信息。'}\n"
-            )
-            log_dest_path = os.path.join(zml_dir, f"{lora_basename_no_ext}.log")
+@server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/fetch_civitai_metadata_batch")
+async def fetch_civitai_metadata_batch_api(request):
+    """
+    批量获取多个LoRA的Civitai元数据，使用有上限的线程池并发请求（同一主机仍按间隔限速）。
+    期望接收 JSON body: {"lora_filenames": ["a.safetensors", "sub/b.safetensors"], "max_workers": 4}
+    返回 JSON body: {"status": "success", "results": {"a.safetensors": {"status": ..., "message": ..., "image_path_updated": ...}}}
+    """
+    try:
+        body = await request.json()
+        lora_filenames = body.get("lora_filenames")
+        if not isinstance(lora_filenames, list) or not lora_filenames:
+            return web.json_response({"status": "error", "message": "缺少 'lora_filenames' 参数"}, status=400)
+        lora_filenames = list(dict.fromkeys(str(name) for name in lora_filenames))
+        try:
+            max_workers = int(body.get("max_workers", CIVITAI_BATCH_MAX_WORKERS))
+        except (TypeError, ValueError):
+            max_workers = CIVITAI_BATCH_MAX_WORKERS
+        max_workers = max(1, min(max_workers, 8, len(lora_filenames)))
+
+        def run_one(lora_relative_filename):
             try:
-                with open(log_dest_path, 'w', encoding='utf-8') as f:
-                    f.write(log_content)
-                message_parts.append("介绍已保存。")
+                found, message, image_path = fetch_and_save_civitai_metadata(lora_relative_filename, flush=False)
+                return {"status": "success" if found else "error", "message": message, "image_path_updated": image_path}
             except Exception as e:
-                print(f"[ZML_Parser] 保存介绍时出错: {e}")
-                message_parts.append("介绍保存失败。")
-        else:
-            message_parts.append("无法从Civitai获取此LoRA的信息（可能未上传或哈希不匹配）。")
-            
+                print(f"[ZML_Parser] 批量获取Civitai元数据时出错 {lora_relative_filename}: {e}")
+                return {"status": "error", "message": f"处理失败: {e}", "image_path_updated": None}
+
+        def run_batch():
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    return dict(zip(lora_filenames, executor.map(run_one, lora_filenames)))
+            finally:
+                # 整批结束后统一写回缓存文件
+                lora_hash_cache.flush()
+                civitai_cache.flush()
+
+        results = await asyncio.get_running_loop().run_in_executor(None, run_batch)
+        succeeded = sum(1 for r in results.values() if r["status"] == "success")
         return web.json_response({
-            "status": "success", 
-            "message": "\n".join(message_parts), 
-            "image_path_updated": downloaded_image_path
+            "status": "success",
+            "message": f"已处理 {len(results)} 个LoRA，成功 {succeeded} 个",
+            "results": results,
         })
 
     except Exception as e:
-        print(f"[ZML_Parser] 处理Civitai元数据请求时出错: {e}")
+        print(f"[ZML_Parser] 处理批量Civitai元数据请求时出错: {e}")
         return web.json_response({"status": "error", "message": f"服务器内部错误: {e}"}, status=500)
 
 
@@ -679,6 +1286,184 @@ class ZmlLoraMetadataParser:
         help_content = "此节点用于解析LoRA模型文件，并从Civitai.com获取关联的元数据。\n1. 选择一个LoRA模型。\n2. 勾选需要保存的项目（图像、触发词、介绍）。\n3. 运行节点。\n4. 节点会自动计算文件哈希，访问Civitai API，并将获取到的文件保存到LoRA所在目录的 'zml' 子文件夹中。"
         return (preview_image_tensor, txt_content, log_content, parsed_info_str, help_content)
 
+# --- LoRA 叠加结果缓存 ---
+LORA_STACK_CACHE_SIZE = 16                   # 每个节点保留的叠加结果（含中间前缀）数量
+
+class LoraStackCache:
+    """
+    缓存在同一个基础模型/CLIP上依次叠加LoRA后的克隆，键为
+    (LoRA路径, 修改时间, 模型强度, CLIP强度) 的有序元组，每一级前缀都会缓存。
+    只改动最后几个LoRA时，从未变化的最长前缀继续叠加，而不是从基础模型重新开始。
+    基础模型或CLIP对象变化时清空，避免旧模型被一直引用。
+    """
+    def __init__(self, max_entries=LORA_STACK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.base_model = None
+        self.base_clip = None
+        self.entries = OrderedDict()  # tuple(step_keys) -> (model, clip)
+
+    def apply(self, model, clip, steps, log_prefix):
+        """
+        steps: [(lora_name, lora_path, 模型强度, CLIP强度), ...]
+        返回 (model, clip, 加载失败的lora_name列表)。失败的LoRA被跳过，其后的结果不写入缓存。
+        """
+        if model is None and clip is None:
+            return model, clip, []
+        if self.base_model is not model or self.base_clip is not clip:
+            self.entries.clear()
+            self.base_model, self.base_clip = model, clip
+
+        step_keys = []
+        for lora_name, lora_path, strength_model, strength_clip in steps:
+            try:
+                mtime = os.stat(lora_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            step_keys.append((os.path.normcase(os.path.abspath(lora_path)), mtime, strength_model, strength_clip))
+
+        # 查找已缓存的最长前缀
+        start = 0
+        current_model, current_clip = model, clip
+        for n in range(len(step_keys), 0, -1):
+            prefix = tuple(step_keys[:n])
+            hit = self.entries.get(prefix)
+            if hit is not None:
+                self.entries.move_to_end(prefix)
+                start = n
+                current_model, current_clip = hit
+                break
+
+        failed = []
+        for i in range(start, len(steps)):
+            lora_name, lora_path, strength_model, strength_clip = steps[i]
+            try:
+                lora = lora_state_dict_cache.load(lora_path)
+                current_model, current_clip = comfy.sd.load_lora_for_models(current_model, current_clip, lora, strength_model, strength_clip)
+            except Exception as e:
+                print(f"{log_prefix}: 处理 LoRA '{lora_name}' 时出错: {e}")
+                failed.append(lora_name)
+                continue
+            if not failed:
+                self.entries[tuple(step_keys[:i + 1])] = (current_model, current_clip)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return current_model, current_clip, failed
+
+# --- Nunchaku LoRA x_embedder 形状缓存 ---
+# 节点只需要转换结果中 x_embedder 的形状，因此只缓存形状，键为 (路径, 大小, 修改时间, 转换器版本)。
+# 缓存与其它 LoRA 缓存一样放在用户目录下，条目数量有上限。
+NUNCHAKU_SHAPE_KEY = "transformer.x_embedder.lora_A.weight"
+NUNCHAKU_SHAPE_CACHE_MAX_ENTRIES = 4096
+NUNCHAKU_LEGACY_CACHE_DIR = os.path.join(LEGACY_LORA_CACHE_DIR, "nunchaku")  # 旧版本保存完整转换结果的目录，仅用于清理
+
+NUNCHAKU_SHAPE_CACHE_FILE = os.path.join(LORA_CACHE_DIR, "nunchaku_shapes.json")
+
+def _nunchaku_converter_version():
+    try:
+        import nunchaku
+        return str(getattr(nunchaku, "__version__", "unknown"))
+    except ImportError:
+        return None
+
+class NunchakuShapeCache(JsonCacheFile):
+    """x_embedder 形状缓存，超过上限时淘汰最久未使用的条目"""
+    def __init__(self, cache_file, max_entries):
+        super().__init__(cache_file)
+        self.max_entries = max_entries
+
+    def get_shape(self, key):
+        with self.lock:
+            self._load()
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            self.entries[key] = entry  # 移到末尾，按最近使用排序（只影响淘汰顺序，不标记为修改）
+            return entry.get("shape")
+
+    def put_shape(self, key, shape):
+        with self.lock:
+            self._load()
+            self.entries.pop(key, None)
+            self.entries[key] = {"shape": shape}
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self._load()
+            removed = len(self.entries)
+            self.entries.clear()
+            self.version += 1
+        return removed
+
+nunchaku_shape_cache = NunchakuShapeCache(NUNCHAKU_SHAPE_CACHE_FILE, NUNCHAKU_SHAPE_CACHE_MAX_ENTRIES)
+
+def get_nunchaku_x_embedder_shape(lora_path):
+    """返回转换后 x_embedder lora_A 权重的形状 (列表)，LoRA中没有该权重时返回None；同一文件只转换一次"""
+    converter_version = _nunchaku_converter_version()
+    st = os.stat(lora_path)
+    key = f"{os.path.normcase(os.path.abspath(lora_path))}|{st.st_size}|{st.st_mtime_ns}|{converter_version}"
+    if converter_version is not None:
+        entry = nunchaku_shape_cache.get_shape(key)
+        if entry is not None:
+            return entry or None  # 空列表表示 "没有该权重"
+    sd = to_diffusers(lora_path)
+    shape = list(sd[NUNCHAKU_SHAPE_KEY].shape) if NUNCHAKU_SHAPE_KEY in sd else None
+    del sd
+    if converter_version is not None:
+        nunchaku_shape_cache.put_shape(key, shape or [])
+        nunchaku_shape_cache.flush()
+    return shape
+
+def nunchaku_cache_stats():
+    with nunchaku_shape_cache.lock:
+        nunchaku_shape_cache._load()
+        entries = len(nunchaku_shape_cache.entries)
+    legacy_files, legacy_bytes = 0, 0
+    if os.path.isdir(NUNCHAKU_LEGACY_CACHE_DIR):
+        with os.scandir(NUNCHAKU_LEGACY_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file():
+                    legacy_files += 1
+                    legacy_bytes += entry.stat().st_size
+    return {"entries": entries, "legacy_files": legacy_files, "legacy_bytes": legacy_bytes}
+
+def purge_nunchaku_cache():
+    """清空形状缓存，并删除旧版本留下的完整转换结果"""
+    removed = nunchaku_shape_cache.clear()
+    nunchaku_shape_cache.flush()
+    freed = 0
+    if os.path.isdir(NUNCHAKU_LEGACY_CACHE_DIR):
+        with os.scandir(NUNCHAKU_LEGACY_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    removed += 1
+                    freed += size
+                except OSError as e:
+                    print(f"[ZML_Parser] 删除Nunchaku缓存文件失败 {entry.path}: {e}")
+    return {"removed": removed, "freed_bytes": freed}
+
+@server.PromptServer.instance.routes.get(ZML_API_PREFIX + "/nunchaku_cache")
+async def get_nunchaku_cache_info(request):
+    """返回Nunchaku形状缓存的条目数量，以及旧版本转换结果的文件数量和占用空间"""
+    stats = await asyncio.get_running_loop().run_in_executor(None, nunchaku_cache_stats)
+    return web.json_response({"status": "success", "cache_file": NUNCHAKU_SHAPE_CACHE_FILE, **stats})
+
+@server.PromptServer.instance.routes.post(ZML_API_PREFIX + "/nunchaku_cache/purge")
+async def purge_nunchaku_cache_api(request):
+    """清空Nunchaku LoRA形状缓存"""
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(None, purge_nunchaku_cache)
+        return web.json_response({"status": "success", "message": f"已清除 {result['removed']} 个缓存条目/文件", **result})
+    except Exception as e:
+        print(f"[ZML_Parser] 清空Nunchaku缓存时出错: {e}")
+        return web.json_response({"status": "error", "message": f"服务器内部错误: {e}"}, status=500)
+
 # --- ZML 原始 LoraLoaderModelOnly 节点 ---
 class ZmlLoraLoaderModelOnly:
     def __init__(self):
@@ -716,7 +1501,7 @@ class ZmlLoraLoaderModelOnly:
 # --- ZML 原始 LoraLoaderFive 节点 ---
 class ZmlLoraLoaderFive:
     def __init__(self):
-        pass
+        self.stack_cache = LoraStackCache()
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -740,9 +1525,7 @@ class ZmlLoraLoaderFive:
     COLOR = "#446699" # 一个更柔和的蓝色
 
     def load_five_loras(self, 模型=None, CLIP=None, **kwargs):
-        model_out = 模型
-        clip_out = CLIP
-        all_txt_content = []
+        steps = []
 
         for i in range(1, 6):
             lora_name = kwargs.get(f"lora_{i}_名称") 
@@ -755,11 +1538,16 @@ class ZmlLoraLoaderFive:
             if not lora_path:
                 print(f"ZmlLoraLoaderFive: LoRA not found '{lora_name}'")
                 continue
+            steps.append((lora_name, lora_path, weight, weight))
 
-            try:
-                lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-                model_out, clip_out = comfy.sd.load_lora_for_models(model_out, clip_out, lora, weight, weight)
+        # 叠加结果按前缀缓存，只改动后面的LoRA时不必从头重新应用
+        model_out, clip_out, failed = self.stack_cache.apply(模型, CLIP, steps, "ZmlLoraLoaderFive")
 
+        all_txt_content = []
+        for lora_name, lora_path, _, _ in steps:
+            if lora_name in failed:
+                continue
+            try:
                 lora_basename_no_ext = os.path.splitext(os.path.basename(lora_name))[0]
                 lora_dir = os.path.dirname(lora_path)
                 txt_filepath = os.path.join(lora_dir, "zml", f"{lora_basename_no_ext}.txt")
@@ -783,6 +1571,9 @@ class ZmlPowerLoraLoader:
     允许用户通过自定义UI动态添加、删除和配置多个LoRA。
     现在增加输出一个已启用LoRA的名称和权重的列表。
     """
+
+    def __init__(self):
+        self.stack_cache = LoraStackCache()
     
     @classmethod
     def INPUT_TYPES(cls):
@@ -824,17 +1615,13 @@ class ZmlPowerLoraLoader:
             # 同时确保 lora名称列表 返回空列表
             return (model, clip, [], [torch.zeros((1, 64, 64, 3), dtype=torch.float32)], "", "") 
 
-        current_model = model
-        current_clip = clip
-        
         output_images = [] # 存储收集到的所有真实预览图
         temp_txts = [] 
         output_custom_texts = [] 
         loaded_lora_names_and_weights = [] # 存储已启用LoRA的名称和权重
 
-        # 判断是否应尝试应用LoRA权重 (只要有一个输入是有效的，就尝试应用)
-        should_attempt_apply_lora_weights = (current_model is not None) or (current_clip is not None)
-
+        # 第一遍：收集启用的LoRA及自定义文本
+        steps = []
         for entry in entries:
             # 过滤掉文件夹条目，只处理lora条目
             if entry.get("item_type") != "lora":
@@ -857,66 +1644,64 @@ class ZmlPowerLoraLoader:
                     error_msg = f"ZML_PowerLoraLoader: 错误: LoRA文件 '{lora_name}' 未找到或不存在，请检查文件路径是否正确，或重新选择一次LoRA来刷新索引路径。"
                     print(error_msg, file=sys.stderr) 
                     raise ValueError(error_msg) 
-                
+
                 try:
-                    lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-                    
                     weight = float(entry.get("weight", 1.0)) # 获取当前LoRA的权重
-                    
-                    # 收集已启用的LoRA名称和权重，无论模型是否为None
-                    loaded_lora_names_and_weights.append({"lora_name": lora_name, "weight": weight})
-
-                    # 只有当 `should_attempt_apply_lora_weights` 为 True 时，才尝试应用 LoRA 权重
-                    if should_attempt_apply_lora_weights:
-                        current_model, current_clip = comfy.sd.load_lora_for_models(
-                            current_model, 
-                            current_clip, 
-                            lora, 
-                            weight, 
-                            weight
-                        )
-                    # else:
-                        # print(f"ZML_PowerLoraLoader: 模型或CLIP未提供，跳过 '{lora_name}' 的权重应用。")
-
-
-                    # 尝试收集 LoRA 预览图
-                    found_image_tensor = None # 为每个 LoRA 重置
-                    lora_basename_no_ext = os.path.splitext(os.path.basename(lora_name))[0]
-                    lora_dir = os.path.dirname(lora_path)
-                    zml_dir = os.path.join(lora_dir, "zml")
-                    
-                    for ext in ['.png', '.jpg', '.jpeg', '.webp']:
-                        # Corrected path construction for preview_path (absolute path)
-                        preview_path = os.path.join(zml_dir, f"{lora_basename_no_ext}{ext}")
-                        if os.path.isfile(preview_path):
-                            try:
-                                img = Image.open(preview_path).convert("RGB")
-                                img_array = np.array(img).astype(np.float32) / 255.0
-                                found_image_tensor = torch.from_numpy(img_array).unsqueeze(0)
-                                break
-                            except Exception as e:
-                                # 文件损坏或读取出错的错误信息保留（因为它实际的异常）
-                                print(f"ZML_PowerLoraLoader: 读取预览图 '{preview_path}' 时出错: {e}")
-                    
-                    # 只有找到实际的预览图，才将其添加到 output_images 列表中
-                    if found_image_tensor is not None:
-                        output_images.append(found_image_tensor)
-                    
-                    # 尝试收集 LoRA 触发词 (txt 文件)
-                    txt_filepath = os.path.join(zml_dir, f"{lora_basename_no_ext}.txt")
-                    if os.path.isfile(txt_filepath):
+                except (TypeError, ValueError) as e:
+                    print(f"ZML_PowerLoraLoader: 处理 LoRA '{lora_name}' 时发生意外错误: {e}")
+                    continue
+                steps.append((lora_name, lora_path, weight, weight))
+
+        # 应用LoRA权重 (模型和CLIP都未提供时跳过)。叠加结果按前缀缓存，
+        # 只改动后面的LoRA时从未变化的前缀继续叠加，不必从基础模型重新开始
+        current_model, current_clip, failed = self.stack_cache.apply(model, clip, steps, "ZML_PowerLoraLoader")
+
+        # 第二遍：收集已启用LoRA的名称、预览图和触发词
+        for lora_name, lora_path, weight, _ in steps:
+            if lora_name in failed:
+                continue
+            try:
+                # 收集已启用的LoRA名称和权重，无论模型是否为None
+                loaded_lora_names_and_weights.append({"lora_name": lora_name, "weight": weight})
+
+                # 尝试收集 LoRA 预览图
+                found_image_tensor = None # 为每个 LoRA 重置
+                lora_basename_no_ext = os.path.splitext(os.path.basename(lora_name))[0]
+                lora_dir = os.path.dirname(lora_path)
+                zml_dir = os.path.join(lora_dir, "zml")
+                
+                for ext in ['.png', '.jpg', '.jpeg', '.webp']:
+                    # Corrected path construction for preview_path (absolute path)
+                    preview_path = os.path.join(zml_dir, f"{lora_basename_no_ext}{ext}")
+                    if os.path.isfile(preview_path):
                         try:
-                            with open(txt_filepath, 'r', encoding='utf-8') as f:
-                                content = f.read().strip()
-                                if content: 
-                                    temp_txts.append(content)
+                            img = Image.open(preview_path).convert("RGB")
+                            img_array = np.array(img).astype(np.float32) / 255.0
+                            found_image_tensor = torch.from_numpy(img_array).unsqueeze(0)
+                            break
                         except Exception as e:
                             # 文件损坏或读取出错的错误信息保留（因为它实际的异常）
-                            print(f"ZML_PowerLoraLoader: 读取txt文件 '{txt_filepath}' 时出错: {e}")
-                    
-                except Exception as e:
-                    # 任何其他 LoRA 处理中的意外错误也保留
-                    print(f"ZML_PowerLoraLoader: 处理 LoRA '{lora_name}' 时发生意外错误: {e}")
+                            print(f"ZML_PowerLoraLoader: 读取预览图 '{preview_path}' 时出错: {e}")
+                
+                # 只有找到实际的预览图，才将其添加到 output_images 列表中
+                if found_image_tensor is not None:
+                    output_images.append(found_image_tensor)
+                
+                # 尝试收集 LoRA 触发词 (txt 文件)
+                txt_filepath = os.path.join(zml_dir, f"{lora_basename_no_ext}.txt")
+                if os.path.isfile(txt_filepath):
+                    try:
+                        with open(txt_filepath, 'r', encoding='utf-8') as f:
+                            content = f.read().strip()
+                            if content: 
+                                temp_txts.append(content)
+                    except Exception as e:
+                        # 文件损坏或读取出错的错误信息保留（因为它实际的异常）
+                        print(f"ZML_PowerLoraLoader: 读取txt文件 '{txt_filepath}' 时出错: {e}")
+                
+            except Exception as e:
+                # 任何其他 LoRA 处理中的意外错误也保留
+                print(f"ZML_PowerLoraLoader: 处理 LoRA '{lora_name}' 时发生意外错误: {e}")
         
         final_txt_output = ", ".join(temp_txts)
         final_custom_text_output = ", ".join(output_custom_texts) 
@@ -1051,12 +1836,7 @@ class ZmlNunchakuNameLoraLoader:
             return (model,)
 
         # 采用 Nunchaku 的高效内存复制策略：只复制一次外壳
-        # 注意：这里的 copy 和 to_diffusers 的 import 语句需要保留在文件顶部
         import copy
-        try:
-            from nunchaku.lora.flux import to_diffusers
-        except ImportError:
-            def to_diffusers(path): return {}
 
         transformer = model_wrapper.model
         model_wrapper.model = None
@@ -1083,9 +1863,10 @@ class ZmlNunchakuNameLoraLoader:
 
             ret_model_wrapper.loras.append((lora_path, lora_strength))
 
-            sd = to_diffusers(lora_path)
-            if "transformer.x_embedder.lora_A.weight" in sd:
-                new_in_channels = sd["transformer.x_embedder.lora_A.weight"].shape[1]
+            # 只需要 x_embedder 的形状：按文件缓存，不必每次重新转换
+            x_embedder_shape = get_nunchaku_x_embedder_shape(lora_path)
+            if x_embedder_shape is not None:
+                new_in_channels = x_embedder_shape[1]
                 if new_in_channels % 4 == 0:
                     new_in_channels = new_in_channels // 4
                     old_in_channels = ret_model.model.model_config.unet_config.get("in_channels", 0)
@@ -2,15 +2,27 @@ import concurrent.futures
 import nodes
 import json
 import copy
-import random
 import traceback
 import os
 import glob
 import torch
-import inspect
 import sys
 import gc
+import time
+import threading
+from collections import deque
+import multiprocessing
 import comfy.model_management
+from server import PromptServer
+
+# 执行引擎放在独立模块中，以顶层模块名导入，保证 spawn 子进程可以找到任务函数
+_worker_dir = os.path.dirname(os.path.abspath(__file__))
+if _worker_dir not in sys.path:
+    sys.path.append(_worker_dir)
+from zml_parallel_worker import (
+    build_vars_map, execute_subflow, describe_node_sources, is_process_shippable,
+    init_process_worker, run_process_task, tensor_from_shared,
+)
 
 # ==========================================
 # AnyType HACK - 允许连接任何类型
@@ -21,6 +33,100 @@ class AlwaysEqualProxy(str):
 
 any_type = AlwaysEqualProxy("*")
 
+# ==========================================
+# 运行进度与节点耗时统计
+# ==========================================
+PROGRESS_EVENT = "zml_parallel_progress"
+PROGRESS_PUSH_INTERVAL = 1.0   # 两次推送之间的最小间隔(秒)
+NODE_TIMING_WINDOW = 512       # 滚动窗口内保留的节点耗时记录数
+NODE_TIMING_TOP_N = 10         # 推送与汇总中展示的节点类型数量
+
+class ParallelProgressTracker:
+    """统计子工作流的完成/失败数、吞吐量、预计剩余时间以及按节点类型的耗时分布。
+    节点耗时由各工作线程写入，推送只在收集结果的主线程中进行。"""
+
+    def __init__(self, total, node_id=None):
+        self.total = total
+        self.node_id = node_id
+        self.completed = 0
+        self.failed = 0
+        self.start_time = time.time()
+        self.last_push = 0.0
+        self.lock = threading.Lock()
+        self.node_totals = {}  # class_type -> [总耗时, 次数]
+        self.recent = deque(maxlen=NODE_TIMING_WINDOW)
+
+    def record_node(self, class_type, elapsed):
+        with self.lock:
+            entry = self.node_totals.setdefault(class_type, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+            self.recent.append((class_type, elapsed))
+
+    def record_task(self, success):
+        if success: self.completed += 1
+        else: self.failed += 1
+
+    def snapshot(self):
+        elapsed = time.time() - self.start_time
+        done = self.completed + self.failed
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / throughput if throughput > 0 else None
+
+        with self.lock:
+            totals = {k: tuple(v) for k, v in self.node_totals.items()}
+            recent = list(self.recent)
+
+        all_time = sum(t for t, _ in totals.values())
+        recent_time = {}
+        for ctype, t in recent:
+            recent_time[ctype] = recent_time.get(ctype, 0.0) + t
+        recent_sum = sum(recent_time.values())
+
+        node_stats = []
+        for ctype, (t, count) in sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)[:NODE_TIMING_TOP_N]:
+            node_stats.append({
+                "class_type": ctype,
+                "total": round(t, 3),
+                "count": count,
+                "avg": round(t / count, 4) if count else 0.0,
+                "share": round(t / all_time, 4) if all_time > 0 else 0.0,
+                "recent_share": round(recent_time.get(ctype, 0.0) / recent_sum, 4) if recent_sum > 0 else 0.0,
+            })
+
+        return {
+            "node": self.node_id,
+            "completed": self.completed,
+            "failed": self.failed,
+            "total": self.total,
+            "elapsed": round(elapsed, 2),
+            "throughput": round(throughput, 4),
+            "eta": round(eta, 1) if eta is not None else None,
+            "nodes": node_stats,
+        }
+
+    def push(self, force=False):
+        now = time.time()
+        if not force and now - self.last_push < PROGRESS_PUSH_INTERVAL:
+            return
+        self.last_push = now
+        try:
+            PromptServer.instance.send_sync(PROGRESS_EVENT, self.snapshot())
+        except Exception as e:
+            print(f"[ZML] 推送进度失败: {e}", flush=True)
+
+    def summary(self):
+        snap = self.snapshot()
+        lines = [
+            f"总数: {snap['total']}  成功: {snap['completed']}  失败: {snap['failed']}",
+            f"总耗时: {snap['elapsed']:.2f}s  吞吐量: {snap['throughput']:.3f} 个/秒",
+        ]
+        if snap["nodes"]:
+            lines.append("节点耗时排行:")
+            for n in snap["nodes"]:
+                lines.append(f"  {n['class_type']}: {n['total']:.2f}s ({n['share']*100:.1f}%)  {n['count']}次  平均 {n['avg']*1000:.1f}ms")
+        return "\n".join(lines)
+
 # ==========================================
 # 核心容器节点
 # ==========================================
@@ -37,137 +143,35 @@ class ZML_ParallelJsonContainer:
                 "返回图像": (["开启", "关闭"], {"default": "开启"}),
                 "控制台日志": (["开启", "关闭"], {"default": "开启"}),
             },
-            "optional": { "变量包": ("VAR_BUNDLE",), }
+            "optional": {
+                "变量包": ("VAR_BUNDLE",),
+                "执行模式": (["线程池", "进程池"], {"default": "线程池", "tooltip": "进程池使用独立的 spawn 子进程，可绕过 GIL 加速 CPU 密集的子工作流。仅当所有节点都声明为进程安全且变量包不含张量时生效，否则自动回退到线程池。并行线程数即为进程数。"}),
+            },
+            "hidden": {"unique_id": "UNIQUE_ID"},
         }
 
-    RETURN_TYPES = ("IMAGE", "STRING", "STRING") 
-    RETURN_NAMES = ("图像列表", "任意数据列表", "执行状态")
+    RETURN_TYPES = ("IMAGE", "STRING", "STRING", "STRING") 
+    RETURN_NAMES = ("图像列表", "任意数据列表", "执行状态", "运行统计")
     
     # 注意：这里保持 True，我们会根据情况返回 [BatchTensor] 或 [Img1, Img2...]
-    OUTPUT_IS_LIST = (True, True, False)
+    OUTPUT_IS_LIST = (True, True, False, False)
     
     FUNCTION = "run_container"
     CATEGORY = "image/ZML_图像/子工作流"
 
-    def run_container(self, JSON工作流, 执行次数, 并行线程数, 执行完成后清理缓存, 返回图像, 控制台日志, 变量包=None):
+    def run_container(self, JSON工作流, 执行次数, 并行线程数, 执行完成后清理缓存, 返回图像, 控制台日志, 变量包=None, 执行模式="线程池", unique_id=None):
         try:
             workflow_template = json.loads(JSON工作流)
         except Exception as e:
-            return ([], [], f"JSON 格式错误: {e}")
-
-        # --- 变量解析内部函数 ---
-        def resolve_variable(key, var_config, index):
-            v_type = var_config["type"]
-            if v_type == "list":
-                values = var_config["values"]
-                return values[index % len(values)] if values else ""
-            elif v_type == "math_int":
-                return int(var_config["start"] + index * var_config["step"])
-            elif v_type == "math_float":
-                return float(var_config["start"] + index * var_config["step"])
-            elif v_type == "seed":
-                mode = var_config["mode"]
-                if mode == "固定": return var_config["start"]
-                elif mode == "递增": return var_config["start"] + index
-                else: return random.randint(1, 0xffffffffffffffff)
-            return ""
-
-        def smart_replace(obj, current_vars):
-            if isinstance(obj, dict):
-                return {k: smart_replace(v, current_vars) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [smart_replace(elem, current_vars) for elem in obj]
-            elif isinstance(obj, str):
-                new_str = obj
-                for key, val in current_vars.items():
-                    placeholder = f"{{{{{key}}}}}"
-                    if placeholder in new_str:
-                        if new_str.strip() == placeholder: return val
-                        new_str = new_str.replace(placeholder, str(val))
-                return new_str
-            return obj
-
-        # --- 单个任务执行引擎 ---
-        def execute_single_workflow(index):
-            try:
-                current_vars_map = {}
-                if 变量包:
-                    for k, v_conf in 变量包.items():
-                        current_vars_map[k] = resolve_variable(k, v_conf, index)
-                
-                current_flow = smart_replace(copy.deepcopy(workflow_template), current_vars_map)
-                result_cache = {}
+            return ([], [], f"JSON 格式错误: {e}", "")
 
-                def get_node_result(node_id):
-                    try:
-                        if node_id in result_cache: return result_cache[node_id]
-                        node_data = current_flow[node_id]
-                        class_type = node_data["class_type"].split('|')[0]
-
-                        if class_type not in nodes.NODE_CLASS_MAPPINGS:
-                            raise Exception(f"缺失节点: {class_type}")
-                        
-                        NodeClass = nodes.NODE_CLASS_MAPPINGS[class_type]
-                        node_instance = NodeClass()
-                        raw_inputs = node_data.get("inputs", {})
-                        resolved_inputs = {}
-                        for k, v in raw_inputs.items():
-                            if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str): 
-                                res = get_node_result(v[0])
-                                resolved_inputs[k] = res[v[1]] if isinstance(res, tuple) else res
-                            else:
-                                resolved_inputs[k] = v
-
-                        # 参数过滤与补全逻辑
-                        func_name = getattr(node_instance, "FUNCTION")
-                        func = getattr(node_instance, func_name)
-                        sig = inspect.signature(func)
-                        
-                        final_kwargs = {}
-                        for param_name, param in sig.parameters.items():
-                            if param_name in resolved_inputs:
-                                final_kwargs[param_name] = resolved_inputs[param_name]
-                            elif param_name == "unique_id":
-                                final_kwargs[param_name] = node_id
-                            elif param_name == "prompt":
-                                final_kwargs[param_name] = current_flow
-                            elif param_name == "extra_pnginfo":
-                                final_kwargs[param_name] = {}
-                            
-                            if param.kind == inspect.Parameter.VAR_KEYWORD:
-                                for k, v in resolved_inputs.items():
-                                    if k not in final_kwargs: final_kwargs[k] = v
-
-                        output = func(**final_kwargs)
-                        result_cache[node_id] = output
-                        return output
-                    except Exception as e:
-                         raise Exception(f"节点 {node_id} ({class_type}) 执行失败: {str(e)}") from e
-
-                exp_img, exp_any = None, None
-                found = False
-                for nid, ninfo in current_flow.items():
-                    ctype = ninfo["class_type"]
-                    if ctype == "ZML_SubflowExportImage":
-                        found = True
-                        link = ninfo["inputs"].get("图像")
-                        if link:
-                            res = get_node_result(link[0])
-                            exp_img = res[link[1]] if isinstance(res, tuple) else res
-                    elif ctype == "ZML_SubflowExportAny":
-                        found = True
-                        link = ninfo["inputs"].get("任意数据")
-                        if link:
-                            res = get_node_result(link[0])
-                            exp_any = res[link[1]] if isinstance(res, tuple) else res
-                
-                if not found: return (None, None, "未找到导出节点")
-                
-                # 任务完成前清空节点缓存，释放内存
-                result_cache.clear()
-                
-                return (exp_img, exp_any, "成功")
+        progress = ParallelProgressTracker(执行次数, unique_id)
 
+        # --- 单个任务执行引擎 (线程池) ---
+        def execute_single_workflow(index):
+            try:
+                current_vars_map = build_vars_map(变量包, index)
+                return execute_subflow(workflow_template, current_vars_map, nodes.NODE_CLASS_MAPPINGS, on_node_time=progress.record_node)
             except Exception as e:
                 return (None, None, f"任务 {index+1} 执行失败: {str(e)}")
 
@@ -175,14 +179,42 @@ class ZML_ParallelJsonContainer:
         temp_images = [] if 返回图像 == "开启" else None
         final_anys = []
         status_lines = []
-        
-        # 使用队列按顺序处理结果
-        from queue import Queue
-        result_queue = Queue()
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=并行线程数) as executor:
+        fallback_notice = None  # 回退提示单独保存，不占用任务状态的行数
+
+        # --- 进程池模式：检查节点是否全部声明为进程安全，变量值是否可跨进程传递 ---
+        use_process = False
+        if 执行模式 == "进程池":
+            node_sources, reason = describe_node_sources(workflow_template, nodes.NODE_CLASS_MAPPINGS)
+            vars_per_task = None
+            if node_sources is not None:
+                vars_per_task = [build_vars_map(变量包, i) for i in range(执行次数)]
+                if not all(is_process_shippable(v) for v in vars_per_task):
+                    reason = "变量包中包含张量等无法跨进程传递的数据"
+            if reason:
+                fallback_notice = f"⚠️ 无法使用进程池，已回退到线程池: {reason}"
+                if 控制台日志 == "开启":
+                    print(f"[ZML] 无法使用进程池，已回退到线程池: {reason}", flush=True)
+            else:
+                use_process = True
+
+        if use_process:
+            # spawn 子进程只继承 sys.path，初始化时导入一次节点模块
+            threads_per_worker = max(1, (os.cpu_count() or 1) // 并行线程数)
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=并行线程数,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_process_worker,
+                initargs=(list(sys.path), node_sources, workflow_template, threads_per_worker),
+            )
+            want_image = temp_images is not None
+            submit = lambda i: executor.submit(run_process_task, i, vars_per_task[i], want_image)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=并行线程数)
+            submit = lambda i: executor.submit(execute_single_workflow, i)
+
+        with executor:
             # 提交所有任务
-            futures = {executor.submit(execute_single_workflow, i): i for i in range(执行次数)}
+            futures = {submit(i): i for i in range(执行次数)}
             
             # 按原始顺序收集结果（等待特定索引完成）
             completed_futures = {}
@@ -191,7 +223,14 @@ class ZML_ParallelJsonContainer:
             for future in concurrent.futures.as_completed(futures):
                 idx = futures[future]
                 try:
-                    img, val, msg = future.result()
+                    if use_process:
+                        # 进程池返回共享内存描述，立即取回并释放共享内存
+                        img_desc, val, msg, timings = future.result()
+                        for ctype, t in timings:
+                            progress.record_node(ctype, t)
+                        img = tensor_from_shared(img_desc) if img_desc is not None else None
+                    else:
+                        img, val, msg = future.result()
                 except Exception as e:
                     img, val, msg = None, None, f"崩溃: {str(e)}"
                 
@@ -201,6 +240,8 @@ class ZML_ParallelJsonContainer:
                 while next_expected in completed_futures:
                     r_img, r_val, r_msg = completed_futures.pop(next_expected)
                     
+                    progress.record_task(r_msg == "成功")
+
                     # 立即处理并释放
                     if r_msg == "成功":
                         status_lines.append(f"任务 {next_expected+1}: ✅")
@@ -223,7 +264,14 @@ class ZML_ParallelJsonContainer:
                             sys.stdout.flush()
                     
                     next_expected += 1
+
+                progress.push()
         
+        progress.push(force=True)
+        run_summary = progress.summary()
+        if 控制台日志 == "开启":
+            print(f"[ZML] 运行统计:\n{run_summary}", flush=True)
+
         # 处理可能遗漏的（理论上不会有）
         while len(status_lines) < 执行次数:
             status_lines.append(f"任务 {len(status_lines)+1}: ❌ 丢失")
@@ -266,7 +314,9 @@ class ZML_ParallelJsonContainer:
             if 控制台日志 == "开启":
                 print(f"[ZML] 未返回图像，输出单张1*1占位符", flush=True)
 
-        return (final_output_images, final_anys, "\n".join(status_lines))
+        if fallback_notice:
+            status_lines.insert(0, fallback_notice)
+        return (final_output_images, final_anys, "\n".join(status_lines), run_summary)
 
 class ZML_ParallelVariableBase:
     def merge_bundle(self, prev_bundle, key, data):
@@ -356,6 +406,7 @@ class ZML_SubflowLoadImage:
     RETURN_TYPES = ("IMAGE", "MASK")
     FUNCTION = "load_image"
     CATEGORY = "image/ZML_图像/子工作流"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def load_image(self, 图像):
         # --- 核心逻辑：如果是已经加载好的张量，直接返回 ---
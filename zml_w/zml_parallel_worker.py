@@ -0,0 +1,235 @@
+# 子工作流执行引擎 (线程池与进程池共用)
+# 此文件不注册任何节点；进程池模式下它会以顶层模块名 "zml_parallel_worker" 导入，
+# 这样 spawn 出来的子进程才能反序列化这里的任务函数。
+
+import copy
+import random
+import inspect
+import importlib
+import importlib.util
+import sys
+import time
+import numpy as np
+import torch
+from multiprocessing import shared_memory
+
+EXPORT_NODE_TYPES = ("ZML_SubflowExportImage", "ZML_SubflowExportAny")
+
+# ==========================================
+# 变量解析与占位符替换
+# ==========================================
+def resolve_variable(var_config, index):
+    v_type = var_config["type"]
+    if v_type == "list":
+        values = var_config["values"]
+        return values[index % len(values)] if values else ""
+    elif v_type == "math_int":
+        return int(var_config["start"] + index * var_config["step"])
+    elif v_type == "math_float":
+        return float(var_config["start"] + index * var_config["step"])
+    elif v_type == "seed":
+        mode = var_config["mode"]
+        if mode == "固定": return var_config["start"]
+        elif mode == "递增": return var_config["start"] + index
+        else: return random.randint(1, 0xffffffffffffffff)
+    return ""
+
+def build_vars_map(var_bundle, index):
+    current_vars_map = {}
+    if var_bundle:
+        for k, v_conf in var_bundle.items():
+            current_vars_map[k] = resolve_variable(v_conf, index)
+    return current_vars_map
+
+def smart_replace(obj, current_vars):
+    if isinstance(obj, dict):
+        return {k: smart_replace(v, current_vars) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [smart_replace(elem, current_vars) for elem in obj]
+    elif isinstance(obj, str):
+        new_str = obj
+        for key, val in current_vars.items():
+            placeholder = f"{{{{{key}}}}}"
+            if placeholder in new_str:
+                if new_str.strip() == placeholder: return val
+                new_str = new_str.replace(placeholder, str(val))
+        return new_str
+    return obj
+
+# ==========================================
+# 单个任务执行引擎
+# ==========================================
+def execute_subflow(workflow_template, current_vars_map, node_mappings, on_node_time=None):
+    """按导出节点反向执行一次子工作流，返回 (导出图像, 导出数据, 状态)。
+    on_node_time(class_type, 秒) 用于统计每个节点自身的耗时。"""
+    current_flow = smart_replace(copy.deepcopy(workflow_template), current_vars_map)
+    result_cache = {}
+
+    def get_node_result(node_id):
+        class_type = None
+        try:
+            if node_id in result_cache: return result_cache[node_id]
+            node_data = current_flow[node_id]
+            class_type = node_data["class_type"].split('|')[0]
+
+            if class_type not in node_mappings:
+                raise Exception(f"缺失节点: {class_type}")
+
+            NodeClass = node_mappings[class_type]
+            node_instance = NodeClass()
+            raw_inputs = node_data.get("inputs", {})
+            resolved_inputs = {}
+            for k, v in raw_inputs.items():
+                if isinstance(v, list) and len(v) == 2 and isinstance(v[0], str):
+                    res = get_node_result(v[0])
+                    resolved_inputs[k] = res[v[1]] if isinstance(res, tuple) else res
+                else:
+                    resolved_inputs[k] = v
+
+            # 参数过滤与补全逻辑
+            func_name = getattr(node_instance, "FUNCTION")
+            func = getattr(node_instance, func_name)
+            sig = inspect.signature(func)
+
+            final_kwargs = {}
+            for param_name, param in sig.parameters.items():
+                if param_name in resolved_inputs:
+                    final_kwargs[param_name] = resolved_inputs[param_name]
+                elif param_name == "unique_id":
+                    final_kwargs[param_name] = node_id
+                elif param_name == "prompt":
+                    final_kwargs[param_name] = current_flow
+                elif param_name == "extra_pnginfo":
+                    final_kwargs[param_name] = {}
+
+                if param.kind == inspect.Parameter.VAR_KEYWORD:
+                    for k, v in resolved_inputs.items():
+                        if k not in final_kwargs: final_kwargs[k] = v
+
+            # 只统计节点自身耗时，上游节点已在上面解析完毕
+            t0 = time.perf_counter()
+            output = func(**final_kwargs)
+            if on_node_time: on_node_time(class_type, time.perf_counter() - t0)
+            result_cache[node_id] = output
+            return output
+        except Exception as e:
+            raise Exception(f"节点 {node_id} ({class_type}) 执行失败: {str(e)}") from e
+
+    exp_img, exp_any = None, None
+    found = False
+    for nid, ninfo in current_flow.items():
+        ctype = ninfo["class_type"]
+        if ctype == "ZML_SubflowExportImage":
+            found = True
+            link = ninfo["inputs"].get("图像")
+            if link:
+                res = get_node_result(link[0])
+                exp_img = res[link[1]] if isinstance(res, tuple) else res
+        elif ctype == "ZML_SubflowExportAny":
+            found = True
+            link = ninfo["inputs"].get("任意数据")
+            if link:
+                res = get_node_result(link[0])
+                exp_any = res[link[1]] if isinstance(res, tuple) else res
+
+    if not found: return (None, None, "未找到导出节点")
+
+    # 任务完成前清空节点缓存，释放内存
+    result_cache.clear()
+
+    return (exp_img, exp_any, "成功")
+
+# ==========================================
+# 进程池模式
+# ==========================================
+_worker_state = {}
+
+def tensor_to_shared(tensor):
+    """把张量写入共享内存，只返回 (名称, 形状, dtype) 描述，避免大图被 pickle。"""
+    arr = tensor.detach().cpu().contiguous().numpy()
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    desc = (shm.name, arr.shape, arr.dtype.str)
+    shm.close()
+    return desc
+
+def tensor_from_shared(desc):
+    """读取并释放子进程写入的共享内存块。"""
+    name, shape, dtype = desc
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return torch.from_numpy(arr)
+
+def describe_node_sources(workflow_template, node_mappings):
+    """收集模板中需要执行的节点类来源 {class_type: (模块名, 文件路径, 类名)}。
+    只有声明了 PROCESS_SAFE = True 的节点类才允许进入子进程，否则返回 (None, 原因)。"""
+    sources = {}
+    for node_id, node_data in workflow_template.items():
+        class_type = node_data.get("class_type", "").split('|')[0]
+        if class_type in EXPORT_NODE_TYPES or class_type in sources:
+            continue
+        NodeClass = node_mappings.get(class_type)
+        if NodeClass is None:
+            return None, f"缺失节点: {class_type}"
+        if not getattr(NodeClass, "PROCESS_SAFE", False):
+            return None, f"节点 {class_type} 未声明可在子进程中运行"
+        try:
+            module_file = inspect.getfile(NodeClass)
+        except TypeError:
+            return None, f"无法定位节点 {class_type} 的源文件"
+        sources[class_type] = (NodeClass.__module__, module_file, NodeClass.__name__)
+    return sources, None
+
+def is_process_shippable(value):
+    """进程池只传递变量值，不传递张量等大对象。"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_process_shippable(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and is_process_shippable(v) for k, v in value.items())
+    return False
+
+def init_process_worker(sys_path, node_sources, workflow_template, num_threads):
+    """子进程初始化：只导入一次所需节点模块，并缓存模板。"""
+    for p in sys_path:
+        if p not in sys.path:
+            sys.path.append(p)
+    torch.set_num_threads(max(1, num_threads))
+
+    loaded_modules = {}
+    mappings = {}
+    for class_type, (module_name, module_file, class_name) in node_sources.items():
+        module = loaded_modules.get(module_file)
+        if module is None:
+            module = sys.modules.get(module_name)
+            if module is None or getattr(module, "__file__", None) != module_file:
+                spec = importlib.util.spec_from_file_location(module_name, module_file)
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[module_name] = module
+                spec.loader.exec_module(module)
+            loaded_modules[module_file] = module
+        mappings[class_type] = getattr(module, class_name)
+
+    _worker_state["mappings"] = mappings
+    _worker_state["template"] = workflow_template
+
+def run_process_task(index, current_vars_map, want_image=True):
+    """子进程中执行单个任务，图像经共享内存返回，同时回传节点耗时。"""
+    timings = []
+    try:
+        img, val, msg = execute_subflow(_worker_state["template"], current_vars_map, _worker_state["mappings"],
+                                        on_node_time=lambda c, t: timings.append((c, t)))
+        img_desc = None
+        if isinstance(img, torch.Tensor):
+            if want_image:
+                img_desc = tensor_to_shared(img)
+        elif img is not None:
+            return (None, None, f"任务 {index+1} 执行失败: 进程池模式只支持导出 IMAGE 张量", timings)
+        return (img_desc, str(val) if val is not None else None, msg, timings)
+    except Exception as e:
+        return (None, None, f"任务 {index+1} 执行失败: {str(e)}", timings)
@@ -16,7 +16,36 @@ except ImportError:
     griddata = None # 确保在cv2无法导入时，griddata也为None
 
 # --- ZML_ImageDeform 节点 ---
+DEFORM_MAP_STEP = 4  # 形变映射先在每隔多少像素的粗网格上插值，再放大到全分辨率
+
+def build_deform_maps(dst_points, src_points, w, h, step=DEFORM_MAP_STEP):
+    """计算 cv2.remap 用的 (map_x, map_y)：只在粗网格节点上做 cubic griddata，再用 cv2.resize 线性放大。
+    控制点凸包外的像素映射为0 (cubic 与 linear 插值的凸包相同，与原先先 cubic、再 linear 补 NaN、最后置0的结果一致)；
+    凸包边缘附近受凸包外节点影响的像素改为逐像素精确插值，保持边界清晰。"""
+    cw, ch = w // step + 3, h // step + 3
+    # cv2.resize 放大 step 倍后第 j 个节点位于像素 (j+0.5)*step-0.5；裁掉最前面 step 个像素，使图像边缘两侧都有节点
+    node_x = (np.arange(cw) - 0.5) * step - 0.5
+    node_y = (np.arange(ch) - 0.5) * step - 0.5
+    grid_x, grid_y = np.meshgrid(node_x, node_y)
+    coarse = griddata(dst_points, src_points, (grid_x, grid_y), method='cubic').astype(np.float32)  # (ch, cw, 2)
+    outside = np.isnan(coarse).any(axis=-1)
+    coarse[outside] = 0
+
+    full_size = (cw * step, ch * step)
+    full = cv2.resize(coarse, full_size, interpolation=cv2.INTER_LINEAR)[step:step + h, step:step + w]
+    map_x, map_y = np.ascontiguousarray(full[..., 0]), np.ascontiguousarray(full[..., 1])
+    if outside.any():
+        touched = cv2.resize(outside.astype(np.float32), full_size, interpolation=cv2.INTER_LINEAR)[step:step + h, step:step + w] > 0
+        ys, xs = np.nonzero(touched)
+        exact = np.nan_to_num(griddata(dst_points, src_points, (xs, ys), method='cubic')).astype(np.float32)
+        map_x[ys, xs] = exact[:, 0]
+        map_y[ys, xs] = exact[:, 1]
+    return map_x, map_y
+
 class ZML_ImageDeform:
+    def __init__(self):
+        self.map_cache = {"key": None, "maps": None}  # 上一次的 (形变数据, 宽, 高) 与对应的形变映射
+
     @classmethod
     def INPUT_TYPES(cls):
         return {
@@ -30,6 +59,7 @@ class ZML_ImageDeform:
     RETURN_NAMES = ("图像",)
     FUNCTION = "deform_image"
     CATEGORY = "image/ZML_图像/高级图像工具"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def tensor_to_pil(self, tensor):
         if tensor.dim() == 4:
@@ -39,15 +69,29 @@ class ZML_ImageDeform:
     def pil_to_tensor(self, pil_image):
         return torch.from_numpy(np.array(pil_image).astype(np.float32) / 255.0).unsqueeze(0)
 
+    def _get_warp_maps(self, deformation_data, data, w, h):
+        key = (deformation_data, w, h)
+        if self.map_cache["key"] != key:
+            points = np.array(data["points"])
+            grid_size = data["gridSize"]
+            
+            # 原始点：均匀分布在图像上
+            src_points = np.meshgrid(np.linspace(0, w-1, grid_size), np.linspace(0, h-1, grid_size))
+            src_points = np.stack([src_points[0].ravel(), src_points[1].ravel()], axis=-1)
+            
+            dst_points = points # 目标点：来自JS前端的变形点
+            
+            # 计算每个目标像素在原图中的对应位置
+            self.map_cache["maps"] = build_deform_maps(dst_points, src_points, w, h)
+            self.map_cache["key"] = key
+        return self.map_cache["maps"]
+
     def deform_image(self, 图像, deformation_data):
         if not cv2 or not griddata:
             print("错误: OpenCV或SciPy未安装，无法执行形变。")
             return (图像,)
 
-        # 确保输入图像是RGBA格式，因为形变可能引入透明区域
-        image_pil = self.tensor_to_pil(图像).convert("RGBA")
-        image_cv = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGBA2BGRA)
-        h, w = image_cv.shape[:2]
+        h, w = 图像.shape[1], 图像.shape[2]
 
         try:
             data = json.loads(deformation_data)
@@ -57,40 +101,20 @@ class ZML_ImageDeform:
                 # 如果未编辑或模式无效，直接返回原图张量
                 return (图像,)
 
-            deformed_image_cv = None
+            if mode != "warp":
+                return (图像,) # 如果没有形变，返回原始输入图像（张量）
 
-            if mode == "warp":
-                points = np.array(data["points"])
-                grid_size = data["gridSize"]
-                
-                # 原始点：均匀分布在图像上
-                src_points = np.meshgrid(np.linspace(0, w-1, grid_size), np.linspace(0, h-1, grid_size))
-                src_points = np.stack([src_points[0].ravel(), src_points[1].ravel()], axis=-1)
-                
-                dst_points = points # 目标点：来自JS前端的变形点
-                
-                grid_y, grid_x = np.mgrid[0:h, 0:w] # 生成目标图像的每个像素的坐标
-                
-                # 使用griddata进行插值，计算每个目标像素在原图中的对应位置
-                map_y = griddata(dst_points, src_points[:, 1], (grid_x, grid_y), method='cubic').astype(np.float32)
-                map_x = griddata(dst_points, src_points[:, 0], (grid_x, grid_y), method='cubic').astype(np.float32)
-
-                # 处理可能出现的NaN值
-                nan_mask = np.isnan(map_x)
-                if np.any(nan_mask):
-                    # 对NaN区域使用线性插值或填充，确保remap能处理有效数据
-                    map_x_linear = griddata(dst_points, src_points[:, 0], (grid_x[nan_mask], grid_y[nan_mask]), method='linear')
-                    map_y_linear = griddata(dst_points, src_points[:, 1], (grid_x[nan_mask], grid_y[nan_mask]), method='linear')
-                    map_x[nan_mask] = np.nan_to_num(map_x_linear) # 填充线性结果
-                    map_y[nan_mask] = np.nan_to_num(map_y_linear) # 填充线性结果
-                
-                deformed_image_cv = cv2.remap(image_cv, np.nan_to_num(map_x), np.nan_to_num(map_y), cv2.INTER_CUBIC, borderMode=cv2.BORDER_TRANSPARENT)
+            # 同一形变数据与图像尺寸只计算一次映射，整批图像共用
+            map_x, map_y = self._get_warp_maps(deformation_data, data, w, h)
 
-            if deformed_image_cv is not None:
-                deformed_pil = Image.fromarray(cv2.cvtColor(deformed_image_cv, cv2.COLOR_BGRA2RGBA))
-                return (self.pil_to_tensor(deformed_pil),)
-            else:
-                return (图像,) # 如果没有形变，返回原始输入图像（张量）
+            deformed_frames = []
+            for img_tensor in 图像:
+                # 确保输入图像是RGBA格式，因为形变可能引入透明区域
+                image_rgba = np.array(self.tensor_to_pil(img_tensor).convert("RGBA"))
+                deformed = np.zeros_like(image_rgba) # 映射到图像外的像素保持透明
+                cv2.remap(image_rgba, map_x, map_y, cv2.INTER_CUBIC, dst=deformed, borderMode=cv2.BORDER_TRANSPARENT)
+                deformed_frames.append(deformed)
+            return (torch.from_numpy(np.stack(deformed_frames).astype(np.float32) / 255.0),)
 
         except Exception as e:
             import traceback
@@ -117,6 +141,7 @@ class ZML_CylindricalProjection:
     RETURN_NAMES = ("全景图像",)
     FUNCTION = "project_to_cylinder"
     CATEGORY = "image/ZML_图像/图像"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def tensor_to_pil(self, tensor):
         if tensor.dim() == 4:
@@ -237,6 +262,14 @@ class ZML_PanoViewer:
         return (全景图像,)
 
 # --- ZML_ImageColorAdjust 节点 (图像颜色调整) ---
+def point_ops_lut(ops):
+    """逐像素、逐通道的 OpenCV 运算与像素位置无关，把它们依次作用在 0~255 的渐变上，
+    得到等价的 (1, 256, 3) 查找表，之后每帧只需一次 cv2.LUT"""
+    lut = np.repeat(np.arange(256, dtype=np.uint8).reshape(1, 256, 1), 3, axis=2)
+    for op in ops:
+        lut = op(lut)
+    return lut
+
 class ZML_ImageColorAdjust:
     @classmethod
     def INPUT_TYPES(cls):
@@ -253,6 +286,7 @@ class ZML_ImageColorAdjust:
     RETURN_NAMES = ("调整后图像",)
     FUNCTION = "adjust_color"
     CATEGORY = "image/ZML_图像/高级图像工具"
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def tensor_to_pil(self, tensor):
         if tensor.dim() == 4:
@@ -293,103 +327,62 @@ class ZML_ImageColorAdjust:
             print("错误: OpenCV未安装，无法执行颜色调整。")
             return (图像,)
 
-        # 将张量转换为PIL图像，再转换为OpenCV格式
-        image_pil = self.tensor_to_pil(图像)
-        # 检查图像是否有透明度通道
-        if image_pil.mode == 'RGBA':
-            # 分离RGB和Alpha通道
-            rgb = image_pil.convert('RGB')
-            alpha = np.array(image_pil.split()[-1])
-            image_cv = cv2.cvtColor(np.array(rgb), cv2.COLOR_RGB2BGR)
-        else:
-            image_cv = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
-            alpha = None
-
         # 亮度调整 - 保持与前端相同的处理方式
-        if brightness != 0:
-            image_cv = cv2.add(image_cv, brightness)
+        def adjust_brightness(img):
+            return cv2.add(img, brightness)
 
         # 对比度调整 - 使用与前端相同的公式
-        if contrast != 0:
+        def adjust_contrast(img):
             factor = (259 * (contrast + 255)) / (255 * (259 - contrast))
-            image_cv = cv2.convertScaleAbs(image_cv, alpha=1.0)
-            image_cv = cv2.subtract(image_cv, 128)
-            image_cv = cv2.convertScaleAbs(image_cv, alpha=factor)
-            image_cv = cv2.add(image_cv, 128)
+            img = cv2.convertScaleAbs(img, alpha=1.0)
+            img = cv2.subtract(img, 128)
+            img = cv2.convertScaleAbs(img, alpha=factor)
+            return cv2.add(img, 128)
+
+        # 伽马调整
+        def adjust_gamma(img):
+            # 伽马查找表
+            gamma_table = np.array([((i / 255.0) ** (1.0 / gamma)) * 255 for i in np.arange(0, 256)]).astype(np.uint8)
+            return cv2.LUT(img, gamma_table)
+
+        # 曝光调整 - 使用乘法因子而不是加法，避免全白问题
+        def adjust_exposure(img):
+            # 使用与前端相似的曝光调整方法
+            exposure_factor = 1.0 + (exposure / 100.0)
+            return cv2.convertScaleAbs(img, alpha=exposure_factor)
+
+        # ---- 以下查找表与蒙版只计算一次，整批图像共用 ----
+        pre_hsv_ops = [op for op, enabled in ((adjust_brightness, brightness != 0), (adjust_contrast, contrast != 0)) if enabled]
+        pre_hsv_lut = point_ops_lut(pre_hsv_ops) if pre_hsv_ops else None
 
-        # 转换到HSV色彩空间进行色相和饱和度调整
-        hsv = cv2.cvtColor(image_cv, cv2.COLOR_BGR2HSV).astype(np.float32)
+        # 色相与饱和度调整在HSV空间中只作用于H、S各自的通道，同样可以查表
+        hsv_lut = np.repeat(np.arange(256, dtype=np.float32).reshape(1, 256, 1), 3, axis=2)
 
         # 色相调整 - 转换到OpenCV的H通道范围(0-180)
         if hue != 0:
             # 前端色相范围是-180到180，需要转换到OpenCV的HSV范围
             # OpenCV的H通道范围是0-180（对应0-360度）
             hue_adjust = (hue / 2.0) % 180  # 将-180到180转换为-90到90，再取模到0-180
-            hsv[:, :, 0] = (hsv[:, :, 0] + hue_adjust) % 180
+            hsv_lut[:, :, 0] = (hsv_lut[:, :, 0] + hue_adjust) % 180
 
         # 饱和度调整
         if saturation != 0:
             # 饱和度调整，1.0 + saturation因子
-            hsv[:, :, 1] = np.clip(hsv[:, :, 1] * (1.0 + saturation / 100.0), 0, 255)
+            hsv_lut[:, :, 1] = np.clip(hsv_lut[:, :, 1] * (1.0 + saturation / 100.0), 0, 255)
+        hsv_lut = hsv_lut.astype(np.uint8) if (hue != 0 or saturation != 0) else None
 
-        # 转换回BGR色彩空间
-        image_cv = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-
-        # 伽马调整
-        if gamma != 1.0:
-            # 伽马查找表
-            gamma_table = np.array([((i / 255.0) ** (1.0 / gamma)) * 255 for i in np.arange(0, 256)]).astype(np.uint8)
-            image_cv = cv2.LUT(image_cv, gamma_table)
-
-        # 锐化调整 - 使用与前端相似的锐化算法，保持卷积核平衡
+        # 没有锐化时伽马与曝光相邻，合并成一张查找表；有锐化时分别在锐化前后查表
         if sharpen > 0:
-            # 计算锐化强度因子，使用更合理的缩放方式
-            sharpen_factor = min(sharpen / 50.0, 3.0)  # 限制最大强度为3，与前端保持一致
-            
-            # 使用平衡的锐化核
-            kernel = np.array([[0, -1, 0],
-                              [-1, 5, -1],
-                              [0, -1, 0]])
-            
-            # 先应用标准锐化核
-            sharpened = cv2.filter2D(image_cv, -1, kernel)
-            
-            # 使用混合方式应用锐化效果，避免亮度失衡
-            # 锐化结果 = 原图 + (锐化结果 - 原图) * 锐化因子
-            image_cv = cv2.addWeighted(image_cv, 1.0, cv2.subtract(sharpened, image_cv), sharpen_factor, 0)
-        
-        # 曝光调整 - 使用乘法因子而不是加法，避免全白问题
-        if exposure != 0:
-            # 使用与前端相似的曝光调整方法
-            exposure_factor = 1.0 + (exposure / 100.0)
-            image_cv = cv2.convertScaleAbs(image_cv, alpha=exposure_factor)
-        
-        # 模糊调整
-        if blur > 0:
-            # 前端模糊滑块范围是0-20，我们直接使用这个值来计算模糊程度
-            # 根据前端输入范围(0-20)调整模糊强度
-            # 从前端范围映射到合理的核大小：3-21的奇数
-            # 调整模糊计算方式，确保即使是较小的值也能产生明显效果
-            kernel_size = int(blur * 0.5) * 2 + 1  # 确保是奇数
-            kernel_size = min(max(3, kernel_size), 21)  # 限制在3-21之间
-            # 使用固定的sigma值来增强模糊效果
-            sigma = blur * 0.5  # 根据模糊值计算sigma
-            # 调试信息：输出实际使用的核大小
-            # print(f"使用的模糊核大小: {kernel_size}, sigma: {sigma}")
-            image_cv = cv2.GaussianBlur(image_cv, (kernel_size, kernel_size), sigma)
-        
-        # 噪点调整
-        if noise > 0:
-            # 添加高斯噪声 - 与前端保持一致，先除以100再乘以255
-            mean = 0
-            std_dev = (noise / 100.0) * 255.0  # 修复：先除以100再乘以255
-            noise_array = np.random.normal(mean, std_dev, image_cv.shape).astype(np.float32)
-            image_cv = np.clip(image_cv + noise_array, 0, 255).astype(np.uint8)
-        
-        # 暗角调整
+            gamma_lut = point_ops_lut([adjust_gamma]) if gamma != 1.0 else None
+            exposure_lut = point_ops_lut([adjust_exposure]) if exposure != 0 else None
+        else:
+            post_ops = [op for op, enabled in ((adjust_gamma, gamma != 1.0), (adjust_exposure, exposure != 0)) if enabled]
+            gamma_lut, exposure_lut = (point_ops_lut(post_ops) if post_ops else None), None
+
+        batch, rows, cols, channels = 图像.shape
+        vignette_mask = None
         if vignette != 0:
             # 创建暗角效果
-            rows, cols = image_cv.shape[:2]
             # 计算图像中心
             center_x, center_y = cols // 2, rows // 2
             # 计算到中心的最大距离
@@ -408,29 +401,87 @@ class ZML_ImageColorAdjust:
             # 与前端使用相同的计算公式：1.0 - (dist_norm) * vignette_strength
             vignette_mask = 1.0 - (dist_norm) * vignette_strength
             # 确保蒙版值在0-1之间
-            vignette_mask = np.clip(vignette_mask, 0, 1)
-            # 将蒙版应用到每个通道
-            if len(image_cv.shape) == 3:
-                # 彩色图像
-                for c in range(3):
-                    image_cv[:, :, c] = np.clip(image_cv[:, :, c] * vignette_mask, 0, 255).astype(np.uint8)
-            else:
-                # 灰度图像
+            vignette_mask = np.clip(vignette_mask, 0, 1)[:, :, None]
+
+        # 逐帧套用同一组查找表 (逐帧处理使中间数据留在缓存中，整批一次性转换反而受内存带宽限制)
+        output = torch.empty((batch, rows, cols, channels), dtype=torch.float32)
+        for i, img_tensor in enumerate(图像):
+            # 与 tensor_to_pil 相同的方式转为 uint8
+            image = np.clip(255. * img_tensor.cpu().numpy(), 0, 255).astype(np.uint8)
+            # 检查图像是否有透明度通道
+            alpha = image[..., 3] if channels == 4 else None
+            image_cv = cv2.cvtColor(image[..., :3], cv2.COLOR_RGB2BGR)
+
+            if pre_hsv_lut is not None:
+                image_cv = cv2.LUT(image_cv, pre_hsv_lut)
+
+            # 转换到HSV色彩空间进行色相和饱和度调整
+            hsv = cv2.cvtColor(image_cv, cv2.COLOR_BGR2HSV)
+            if hsv_lut is not None:
+                hsv = cv2.LUT(hsv, hsv_lut)
+
+            # 转换回BGR色彩空间
+            image_cv = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+            if gamma_lut is not None:
+                image_cv = cv2.LUT(image_cv, gamma_lut)
+
+            # 锐化调整 - 使用与前端相似的锐化算法，保持卷积核平衡
+            if sharpen > 0:
+                # 计算锐化强度因子，使用更合理的缩放方式
+                sharpen_factor = min(sharpen / 50.0, 3.0)  # 限制最大强度为3，与前端保持一致
+                
+                # 使用平衡的锐化核
+                kernel = np.array([[0, -1, 0],
+                                  [-1, 5, -1],
+                                  [0, -1, 0]])
+                
+                # 先应用标准锐化核
+                sharpened = cv2.filter2D(image_cv, -1, kernel)
+                
+                # 使用混合方式应用锐化效果，避免亮度失衡
+                # 锐化结果 = 原图 + (锐化结果 - 原图) * 锐化因子
+                image_cv = cv2.addWeighted(image_cv, 1.0, cv2.subtract(sharpened, image_cv), sharpen_factor, 0)
+
+            if exposure_lut is not None:
+                image_cv = cv2.LUT(image_cv, exposure_lut)
+            
+            # 模糊调整
+            if blur > 0:
+                # 前端模糊滑块范围是0-20，我们直接使用这个值来计算模糊程度
+                # 根据前端输入范围(0-20)调整模糊强度
+                # 从前端范围映射到合理的核大小：3-21的奇数
+                # 调整模糊计算方式，确保即使是较小的值也能产生明显效果
+                kernel_size = int(blur * 0.5) * 2 + 1  # 确保是奇数
+                kernel_size = min(max(3, kernel_size), 21)  # 限制在3-21之间
+                # 使用固定的sigma值来增强模糊效果
+                sigma = blur * 0.5  # 根据模糊值计算sigma
+                # 调试信息：输出实际使用的核大小
+                # print(f"使用的模糊核大小: {kernel_size}, sigma: {sigma}")
+                image_cv = cv2.GaussianBlur(image_cv, (kernel_size, kernel_size), sigma)
+            
+            # 噪点调整
+            if noise > 0:
+                # 添加高斯噪声 - 与前端保持一致，先除以100再乘以255
+                mean = 0
+                std_dev = (noise / 100.0) * 255.0  # 修复：先除以100再乘以255
+                noise_array = np.random.normal(mean, std_dev, image_cv.shape).astype(np.float32)
+                image_cv = np.clip(image_cv + noise_array, 0, 255).astype(np.uint8)
+            
+            # 暗角调整
+            if vignette_mask is not None:
+                # 将蒙版应用到每个通道
                 image_cv = np.clip(image_cv * vignette_mask, 0, 255).astype(np.uint8)
 
-        # 将OpenCV图像转换回PIL Image
-        if image_pil.mode == 'RGBA' and alpha is not None:
-            # 转换回RGB，然后合并Alpha通道
-            rgb_pil = Image.fromarray(cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB))
-            rgba_pil = Image.new('RGBA', rgb_pil.size)
-            rgba_pil.paste(rgb_pil)
-            rgba_pil.putalpha(Image.fromarray(alpha))
-            adjusted_image = rgba_pil
-        else:
-            adjusted_image = Image.fromarray(cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB))
+            # 转换回RGB，有透明度通道时合并Alpha通道
+            frame = output[i].numpy()
+            frame[..., :3] = cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB)
+            if alpha is not None:
+                frame[..., 3] = alpha
+            frame /= 255.0
 
-        # 转换回张量并返回
-        return (self.pil_to_tensor(adjusted_image),)
+        # 返回整批调整后的图像
+        return (output,)
 
 # --- 节点映射 ---
 NODE_CLASS_MAPPINGS = {
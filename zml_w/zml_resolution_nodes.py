@@ -7,16 +7,16 @@ import numpy as np
 import torch
 import random
 import json
-from collections import deque
 import base64
 from io import BytesIO
 
 try:
-    from scipy.ndimage import binary_dilation
+    from scipy.ndimage import binary_dilation, label
 except ImportError:
     print("ZML_CropPureColorBackground/ZML_AddSolidColorBackground: scipy not found. '不规则形状' and '无固定形状' features will be disabled.")
     print("Please install it by running: pip install scipy")
     binary_dilation = None
+    label = None
 
 # ============================== 限制分辨率格式节点 ==============================
 class ZML_LimitResolution:
@@ -39,6 +39,13 @@ class ZML_LimitResolution:
         return (self._calculate(数值_A, 倍数, 模式), self._calculate(数值_B, 倍数, 模式))
 
 # ============================== 限制纯色背景大小节点 ==============================
+def border_connected_mask(bg_mask):
+    """返回与图像边缘四连通的背景区域 (等价于从所有边缘背景像素出发的洪水填充)"""
+    labels, _ = label(bg_mask)
+    border_labels = np.unique(np.concatenate((labels[0], labels[-1], labels[:, 0], labels[:, -1])))
+    border_labels = border_labels[border_labels > 0]
+    return np.isin(labels, border_labels)
+
 class ZML_CropPureColorBackground:
     @classmethod
     def INPUT_TYPES(cls):
@@ -86,14 +93,6 @@ class ZML_CropPureColorBackground:
                         print(f"ZML_CropPureColorBackground: 无效的自定义颜色代码'{自定义背景颜色}'，将使用黑色作为默认背景。错误: {e}")
                         target_rgb = np.array([0, 0, 0], dtype=np.float32)
 
-            def is_background(y, x):
-                pixel = np_image[y, x]
-                if 背景颜色 == "透明": 
-                    return pixel[3] == 0
-                else: 
-                    if target_rgb is None: return False
-                    return np.sum(np.abs(pixel[:3].astype(np.float32) - target_rgb)) <= 阈值
-
             final_pil = None
             if 处理模式 == "矩形":
                 if 背景颜色 == "透明": 
@@ -113,20 +112,14 @@ class ZML_CropPureColorBackground:
                     print("ZML_CropPureColorBackground: Scipy not installed. '不规则形状' mode is disabled.")
                     final_pil = pil_image
                 else:
-                    border_bg_mask = np.zeros((h, w), dtype=bool); q = deque()
-                    for c in range(w):
-                        if is_background(0, c) and not border_bg_mask[0, c]: q.append((0, c)); border_bg_mask[0, c] = True
-                        if is_background(h-1, c) and not border_bg_mask[h-1, c]: q.append((h-1, c)); border_bg_mask[h-1, c] = True
-                    for r in range(1, h-1):
-                        if is_background(r, 0) and not border_bg_mask[r, 0]: q.append((r, 0)); border_bg_mask[r, 0] = True
-                        if is_background(r, w-1) and not border_bg_mask[r, w-1]: q.append((r, w-1)); border_bg_mask[r, w-1] = True
-                    
-                    while q:
-                        y, x = q.popleft()
-                        for dy, dx in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                            ny, nx = y + dy, x + dx
-                            if 0 <= ny < h and 0 <= nx < w and not border_bg_mask[ny, nx] and is_background(ny, nx): 
-                                border_bg_mask[ny, nx] = True; q.append((ny, nx))
+                    # 整幅图像一次性判断背景像素，再取与边缘连通的部分
+                    if 背景颜色 == "透明":
+                        bg_mask = np_image[:, :, 3] == 0
+                    elif target_rgb is None:
+                        bg_mask = np.zeros((h, w), dtype=bool)
+                    else:
+                        bg_mask = np.sum(np.abs(np_image[..., :3].astype(np.float32) - target_rgb), axis=-1) <= 阈值
+                    border_bg_mask = border_connected_mask(bg_mask)
                     
                     final_alpha_mask = None
                     if 不规则形状保留像素 > 0:
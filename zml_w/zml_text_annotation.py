@@ -1,6 +1,10 @@
 # custom_nodes/ComfyUI-ZML-Image/zml_w/zml_text_annotation.py
 
 import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import torch
@@ -8,18 +12,165 @@ import random
 import math
 import re # 导入正则表达式模块
 
-# 递归查找字体文件的辅助函数
+# 字体注册表与 FreeTypeFont 缓存放在共享模块中，与XYZ图表节点共用
+_zml_dir = os.path.dirname(os.path.abspath(__file__))
+if _zml_dir not in sys.path:
+    sys.path.append(_zml_dir)
+from zml_font_registry import list_font_files, load_truetype, load_default_font
+
+# 递归查找字体文件的辅助函数 (目录只扫描一次，字体目录变化时自动重新扫描)
 def find_font_files(directory):
-    font_files = []
-    # 遍历目录及其所有子目录
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            # 检查文件是否为字体文件
-            if file.lower().endswith(('.ttf', '.otf')):
-                # 计算相对路径作为字体标识，以便后续加载
-                rel_path = os.path.relpath(os.path.join(root, file), directory)
-                font_files.append(rel_path)
-    return font_files
+    # 返回相对路径作为字体标识，以便后续加载
+    return list_font_files(directory, ('.ttf', '.otf'))
+
+# ==========================================
+# 字形缓存 (文字水印与文本图像节点共用)
+# 单字尺寸按 (字体文件, 字号) 缓存，字形遮罩按 (字体文件, 字号, 描边宽度) 预先栅格化；
+# 逐字排版只需查表，绘制时直接用遮罩把颜色贴到图层上，混合方式与 ImageDraw.text 相同
+# ==========================================
+GLYPH_CACHE_FONTS = 32  # 同时保留字形的 (字体, 字号) 数量
+
+def _measure_char(char, font):
+    try:
+        bbox = font.getbbox(char)
+        width = max(1, bbox[2] - bbox[0])
+        height = max(1, bbox[3] - bbox[1])
+        return width, height
+    except Exception:
+        w, h = font.getsize(char)
+        return max(1, w), max(1, h)
+
+class GlyphCache:
+    def __init__(self, max_fonts):
+        self.max_fonts = max_fonts
+        self.lock = threading.Lock()
+        self.fonts = OrderedDict()  # (字体文件, 字号, 索引) -> ({字符: (宽, 高)}, {(字符, 描边宽度): (遮罩, 偏移)})
+
+    def _tables(self, font):
+        # 只缓存 FreeType 字体；内置默认字体从内存加载，没有文件路径
+        if not isinstance(font, ImageFont.FreeTypeFont):
+            return None
+        key = (font.path if isinstance(font.path, str) else "<default>", font.size, font.index)
+        with self.lock:
+            tables = self.fonts.get(key)
+            if tables is None:
+                tables = self.fonts[key] = ({}, {})
+                while len(self.fonts) > self.max_fonts:
+                    self.fonts.popitem(last=False)
+            else:
+                self.fonts.move_to_end(key)
+        return tables
+
+    def char_size(self, char, font):
+        tables = self._tables(font)
+        if tables is None:
+            return _measure_char(char, font)
+        size = tables[0].get(char)
+        if size is None:
+            size = tables[0][char] = _measure_char(char, font)
+        return size
+
+    def glyph_mask(self, char, font, stroke_width):
+        """返回 (L模式遮罩或None, (x偏移, y偏移))，偏移相对于 draw.text 的坐标；不支持的字体返回 None"""
+        tables = self._tables(font)
+        if tables is None:
+            return None
+        key = (char, stroke_width)
+        glyph = tables[1].get(key)
+        if glyph is None:
+            left, top, right, bottom = font.getbbox(char, stroke_width=stroke_width)
+            mask = None
+            if right > left and bottom > top:
+                mask = Image.new("L", (right - left, bottom - top), 0)
+                ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255, stroke_width=stroke_width, stroke_fill=255)
+            glyph = tables[1][key] = (mask, (left, top))
+        return glyph
+
+glyph_cache = GlyphCache(GLYPH_CACHE_FONTS)
+
+def draw_glyph(image, draw, xy, char, font, fill, stroke_width, stroke_fill):
+    """效果与 draw.text(xy, char, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill) 相同：
+    先贴描边遮罩，填充色与描边色不同时再贴填充遮罩"""
+    fill_glyph = glyph_cache.glyph_mask(char, font, 0)
+    if fill_glyph is None:
+        draw.text(xy, char, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+        return
+    x, y = xy
+    if stroke_width:
+        mask, (ox, oy) = glyph_cache.glyph_mask(char, font, stroke_width)
+        if mask is not None:
+            image.paste(stroke_fill, (x + ox, y + oy), mask)
+        if fill == stroke_fill:
+            return
+    mask, (ox, oy) = fill_glyph
+    if mask is not None:
+        image.paste(fill, (x + ox, y + oy), mask)
+
+# ==========================================
+# 全屏水印图层 (文字水印与图像水印节点共用)
+# 水印块按交错网格贴到一张与画布同尺寸的透明图层上，只生成一次，整批图像再用一次张量运算混合。
+# 图层以预乘形式保存 (只保留有水印的矩形区域)：premult 为各水印块依次贴到透明底上的结果，coverage 为累计遮挡度 (0~255)，
+# 原图 * (1 - coverage) + premult 与逐块 paste 到原图上等价 (只差逐次取整的误差)
+# ==========================================
+WATERMARK_LAYER_CACHE_SIZE = 4  # 每个节点保留的水印图层数量
+
+def staggered_tile_positions(tile_w, tile_h, img_width, img_height, sx, sy):
+    """全屏水印的交错网格坐标 (奇数行右移半个间距)，顺序与逐块贴图时相同"""
+    offset, row_idx = sx // 2, 0
+    for y in range(-tile_h, img_height, sy):
+        start_x = -tile_w + (offset if (row_idx % 2) != 0 else 0)
+        for x in range(start_x, img_width, sx):
+            yield x, y
+        row_idx += 1
+
+def build_watermark_layer(img_width, img_height, tiles):
+    """tiles 为 [(RGBA水印块, (x, y)), ...]，按顺序贴到透明图层上。
+    返回 (x0, y0, premult, coverage)，两个 uint8 数组只保留有水印的矩形区域；完全没有水印时返回 None"""
+    premult = Image.new("RGBA", (img_width, img_height), (0, 0, 0, 0))
+    coverage = Image.new("L", (img_width, img_height), 0)
+    for tile, xy in tiles:
+        alpha = tile.getchannel("A")
+        premult.paste(tile, xy, alpha)
+        coverage.paste(255, xy, alpha)
+    bbox = coverage.getbbox()
+    if bbox is None:
+        return None
+    return bbox[0], bbox[1], np.array(premult.crop(bbox)), np.array(coverage.crop(bbox))
+
+def images_to_rgba255(images):
+    """IMAGE 批次 -> [B,H,W,4] 的 0~255 浮点张量，取整方式与 tensor_to_pil(...).convert("RGBA") 相同"""
+    images = images.detach().cpu()
+    channels = images.shape[-1]
+    out = torch.empty((*images.shape[:-1], 4), dtype=torch.float32)
+    out[..., :3] = images[..., :1] if channels in (1, 2) else images[..., :3]  # L / LA 复制为灰度 RGB
+    out[..., 3] = images[..., -1] if channels in (2, 4) else 1.0
+    return out.mul_(255).clamp_(0, 255).floor_()
+
+def blend_watermark_layer(images, layer):
+    """把 build_watermark_layer 的图层一次性混合到整批图像上 (只处理有水印的区域)，返回 RGBA 的 IMAGE 张量；
+    layer 为 None 时只转换格式"""
+    out = images_to_rgba255(images)
+    if layer is not None:
+        x0, y0, premult, coverage = layer
+        region = out[:, y0:y0 + coverage.shape[0], x0:x0 + coverage.shape[1]]
+        keep = torch.from_numpy(coverage).float().div_(-255).add_(1).unsqueeze(-1)
+        region.mul_(keep).add_(torch.from_numpy(premult).float()).round_()
+    return out.div_(255)
+
+class WatermarkLayerCache:
+    """节点持有的水印图层LRU缓存，键为影响图层内容的全部参数与画布尺寸"""
+    def __init__(self, max_entries=WATERMARK_LAYER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # 键 -> build_watermark_layer 的结果或 None (没有可绘制的内容)
+
+    def get(self, key, build):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        layer = self.entries[key] = build()
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return layer
 
 # ============================== ZML_AddTextWatermark 节点==============================
 class ZML_AddTextWatermark:
@@ -31,6 +182,7 @@ class ZML_AddTextWatermark:
         self.counter_file = os.path.join(self.counter_dir, "Watermark.txt")
         os.makedirs(self.font_dir, exist_ok=True)
         self.ensure_counter_file()
+        self.layer_cache = WatermarkLayerCache()
         self.chinese_punctuation = '，。！？；：'"'（）《》【】{}[]()"'。；：！？,.'
 
     def ensure_counter_file(self):
@@ -94,6 +246,7 @@ class ZML_AddTextWatermark:
     RETURN_NAMES = ("图像", "Help")
     FUNCTION = "add_watermark"
     CATEGORY = "image/ZML_图像/工具" 
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def hex_to_rgba(self, hex_color, opacity):
         hex_color = hex_color.lstrip('#')
@@ -111,14 +264,7 @@ class ZML_AddTextWatermark:
         return torch.from_numpy(np.array(pil_image).astype(np.float32) / 255.0).unsqueeze(0)
 
     def _get_char_size(self, char, font):
-        try:
-            bbox = font.getbbox(char)
-            width = max(1, bbox[2] - bbox[0])
-            height = max(1, bbox[3] - bbox[1])
-            return width, height
-        except Exception:
-            w, h = font.getsize(char)
-            return max(1, w), max(1, h)
+        return glyph_cache.char_size(char, font)
 
     def _prepare_lines(self, text, font, char_spacing, orientation, max_dim=None):
         # 首先按用户手动换行符分割文本
@@ -324,7 +470,8 @@ class ZML_AddTextWatermark:
             return max(1, total_w), max(1, max_h)
 
 
-    def _draw_text_manually(self, draw, lines, start_x, start_y, font, fill_color_param, stroke_width, stroke_fill_color_param, opacity, char_spacing, line_spacing, orientation):
+    def _draw_text_manually(self, image, lines, start_x, start_y, font, fill_color_param, stroke_width, stroke_fill_color_param, opacity, char_spacing, line_spacing, orientation):
+        draw = ImageDraw.Draw(image)
         cursor_x, cursor_y = start_x, start_y
 
         def get_char_color(base_color_param, current_opacity):
@@ -353,10 +500,8 @@ class ZML_AddTextWatermark:
                     char_fill_color = get_char_color(fill_color_param, opacity)
                     char_stroke_color = get_char_color(stroke_fill_color_param, opacity)
 
-                    draw.text((cursor_x, cursor_y + y_offset), char, font=font,
-                              fill=char_fill_color,
-                              stroke_width=stroke_width,
-                              stroke_fill=char_stroke_color)
+                    draw_glyph(image, draw, (cursor_x, cursor_y + y_offset), char, font,
+                               char_fill_color, stroke_width, char_stroke_color)
                      
                     cursor_x += self._get_char_size(char, font)[0] + char_spacing
                 cursor_x = start_x
@@ -378,25 +523,63 @@ class ZML_AddTextWatermark:
                     char_fill_color = get_char_color(fill_color_param, opacity)
                     char_stroke_color = get_char_color(stroke_fill_color_param, opacity)
 
-                    draw.text((cursor_x, cursor_y + y_offset), char, font=font,
-                              fill=char_fill_color,
-                              stroke_width=stroke_width,
-                              stroke_fill=char_stroke_color)
+                    draw_glyph(image, draw, (cursor_x, cursor_y + y_offset), char, font,
+                               char_fill_color, stroke_width, char_stroke_color)
                     
                     cursor_y += self._get_char_size(char, font)[1] + char_spacing
                 cursor_y = start_y
                 cursor_x += line_w + line_spacing
 
+    def _render_fullscreen_tile(self, 文本, 字体, 字体大小, font, fill_color, stroke_width, stroke_fill_color, 不透明度, 书写方向, 字符间距, 行间距, 旋转角度):
+        """绘制并旋转一个全屏水印块，文本为空时返回 None"""
+        lines = 文本.split('\n')
+        try:
+            current_font_for_sizing = load_truetype(os.path.join(self.font_dir, 字体), 字体大小) if 字体 != "Default" else load_default_font()
+        except Exception:
+            current_font_for_sizing = load_default_font()
+        
+        tw, th = self._get_text_block_size(lines, current_font_for_sizing, 字符间距, 行间距, 书写方向)
+        
+        if tw == 0 or th == 0:
+            return None
+        
+        # 为字形边缘和旋转抗锯齿预留额外空间，避免字符被截断（如 L 的底边丢失）
+        safe_padding = max(8, int(字体大小 * 0.35), stroke_width * 4)
+        tile_w = tw + (2 * stroke_width) + (2 * safe_padding)
+        tile_h = th + (2 * stroke_width) + (2 * safe_padding)
+        
+        text_img = Image.new('RGBA', (max(1, tile_w), max(1, tile_h))) 
+        
+        self._draw_text_manually(text_img, lines, stroke_width + safe_padding, stroke_width + safe_padding, font,
+                                fill_color, stroke_width, stroke_fill_color,
+                                不透明度, 字符间距, 行间距, 书写方向)
+
+        # 绘制后按非透明区域裁剪，既避免边缘截断，又减少后续旋转开销
+        content_bbox = text_img.getbbox()
+        if content_bbox is not None:
+            text_img = text_img.crop(content_bbox)
+        
+        return text_img.rotate(旋转角度, expand=True, resample=Image.Resampling.BICUBIC)
+
+    def _build_fullscreen_layer(self, rot_img, img_width, img_height, 水平边距, 垂直边距, 全屏水印密度):
+        r_width, r_height = rot_img.size
+        sx, sy = int((r_width + 水平边距) / 全屏水印密度), int((r_height + 垂直边距) / 全屏水印密度)
+        sx = max(1, sx); sy = max(1, sy) 
+        # 只贴左上角落在画布内的水印块
+        tiles = [(rot_img, (x, y)) for x, y in staggered_tile_positions(r_width, r_height, img_width, img_height, sx, sy)
+                 if 0 <= x < img_width and 0 <= y < img_height]
+        return build_watermark_layer(img_width, img_height, tiles)
+
     def add_watermark(self, 图像, 文本, 字体, 字体大小, 颜色, 不透明度, 书写方向, 位置, 水平边距, 垂直边距, 字符间距, 行间距, 描边宽度, 描边颜色, 全屏水印旋转角度, 全屏水印密度):
         count = self.increment_counter()
         help_text = f"你好，欢迎使用ZML节点~到目前为止，你通过此节点总共添加了{count}次水印！！\n颜色代码那里留空则代表使用透明，输入‘ZML’代表随机颜色，你可以在文字颜色那里留空，描边颜色保持默认，这样就可以生成透明描边字体了！\n在这里提供一些常用颜色代码：\n黑色: #000000\n白色: #FFFFFF\n红色: #FF0000\n蓝色: #0000FF\n黄色: #FFFF00\n绿色: #008000\n祝你天天开心~"
 
-        font = ImageFont.load_default()
+        font = load_default_font()
         if 字体 != "Default":
             try:
                 # 字体路径已经包含了相对路径信息
                 font_path = os.path.join(self.font_dir, 字体)
-                font = ImageFont.truetype(font_path, 字体大小)
+                font = load_truetype(font_path, 字体大小)
             except Exception as e:
                 print(f"字体加载失败: {e}，将使用默认字体。")
 
@@ -418,72 +601,49 @@ class ZML_AddTextWatermark:
         else: 
             stroke_fill_color_for_draw = self.hex_to_rgba(描边颜色, 不透明度)
 
+        if 位置 == "全屏":
+            img_height, img_width = 图像.shape[1], 图像.shape[2]
+            def build_layer():
+                rot_img = self._render_fullscreen_tile(文本, 字体, 字体大小, font, fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw,
+                                                       不透明度, 书写方向, 字符间距, 行间距, 全屏水印旋转角度)
+                if rot_img is None:
+                    return None
+                return self._build_fullscreen_layer(rot_img, img_width, img_height, 水平边距, 垂直边距, 全屏水印密度)
+
+            if fill_color_for_draw is None or stroke_fill_color_for_draw is None:
+                # 随机颜色：与原来一样每张图像各自生成水印，不缓存
+                output = torch.cat([blend_watermark_layer(img_tensor.unsqueeze(0), build_layer()) for img_tensor in 图像], dim=0)
+            else:
+                # 同一组参数与画布尺寸只生成一次图层，整批图像 (如视频帧) 一次混合
+                layer_key = (文本, 字体, 字体大小, fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw, 不透明度,
+                             书写方向, 字符间距, 行间距, 全屏水印旋转角度, 全屏水印密度, 水平边距, 垂直边距, img_width, img_height)
+                output = blend_watermark_layer(图像, self.layer_cache.get(layer_key, build_layer))
+            return (output, help_text)
+
         processed_images = []
         for img_tensor in 图像:
             pil_image = self.tensor_to_pil(img_tensor).convert("RGBA")
             img_width, img_height = pil_image.size
 
-            if 位置 == "全屏":
-                lines = 文本.split('\n')
-                try:
-                    current_font_for_sizing = ImageFont.truetype(os.path.join(self.font_dir, 字体), 字体大小) if 字体 != "Default" else ImageFont.load_default()
-                except Exception:
-                    current_font_for_sizing = ImageFont.load_default()
-                
-                tw, th = self._get_text_block_size(lines, current_font_for_sizing, 字符间距, 行间距, 书写方向)
-                
-                if tw == 0 or th == 0:
-                    processed_images.append(self.pil_to_tensor(pil_image)); continue
-                
-                # 为字形边缘和旋转抗锯齿预留额外空间，避免字符被截断（如 L 的底边丢失）
-                safe_padding = max(8, int(字体大小 * 0.35), stroke_width_for_draw * 4)
-                tile_w = tw + (2 * stroke_width_for_draw) + (2 * safe_padding)
-                tile_h = th + (2 * stroke_width_for_draw) + (2 * safe_padding)
-                
-                text_img = Image.new('RGBA', (max(1, tile_w), max(1, tile_h))) 
-                text_draw = ImageDraw.Draw(text_img)
-                
-                self._draw_text_manually(text_draw, lines, stroke_width_for_draw + safe_padding, stroke_width_for_draw + safe_padding, font,
-                                        fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw,
-                                        不透明度, 字符间距, 行间距, 书写方向)
+            text_layer = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 0))
 
-                # 绘制后按非透明区域裁剪，既避免边缘截断，又减少后续旋转开销
-                content_bbox = text_img.getbbox()
-                if content_bbox is not None:
-                    text_img = text_img.crop(content_bbox)
-                
-                rot_img = text_img.rotate(全屏水印旋转角度, expand=True, resample=Image.Resampling.BICUBIC)
-                r_width, r_height = rot_img.size
-                sx, sy = int((r_width + 水平边距) / 全屏水印密度), int((r_height + 垂直边距) / 全屏水印密度)
-                sx = max(1, sx); sy = max(1, sy) 
-                offset, row_idx = sx // 2, 0
-                for y in range(-r_height, img_height, sy):
-                    start_x = -r_width + (offset if (row_idx % 2) != 0 else 0)
-                    for x in range(start_x, img_width, sx):
-                        if 0 <= x < img_width and 0 <= y < img_height: 
-                            pil_image.paste(rot_img, (x, y), rot_img)
-                    row_idx += 1
-            else:
-                text_layer = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(text_layer)
-
-                max_dim = (img_width - (水平边距 * 2) - (stroke_width_for_draw * 2)) if 书写方向 == "横排" else (img_height - (垂直边距 * 2) - (stroke_width_for_draw * 2))
-                max_dim = max(1, max_dim) 
+            max_dim = (img_width - (水平边距 * 2) - (stroke_width_for_draw * 2)) if 书写方向 == "横排" else (img_height - (垂直边距 * 2) - (stroke_width_for_draw * 2))
+            max_dim = max(1, max_dim) 
 
-                lines = self._prepare_lines(文本, font, 字符间距, 书写方向, max_dim=max_dim)
-                tw, th = self._get_text_block_size(lines, font, 字符间距, 行间距, 书写方向)
+            lines = self._prepare_lines(文本, font, 字符间距, 书写方向, max_dim=max_dim)
+            tw, th = self._get_text_block_size(lines, font, 字符间距, 行间距, 书写方向)
                 
-                x_pos = 水平边距 if "左" in 位置 else (img_width - tw - 水平边距 if "右" in 位置 else (img_width - tw) // 2)
-                y_pos = 垂直边距 if "上" in 位置 else (img_height - th - 垂直边距 if "下" in 位置 else (img_height - th) // 2)
+            x_pos = 水平边距 if "左" in 位置 else (img_width - tw - 水平边距 if "右" in 位置 else (img_width - tw) // 2)
+            y_pos = 垂直边距 if "上" in 位置 else (img_height - th - 垂直边距 if "下" in 位置 else (img_height - th) // 2)
 
-                x_pos = max(0, min(x_pos, img_width - 1))
-                y_pos = max(0, min(y_pos, img_height - 1))
+            x_pos = max(0, min(x_pos, img_width - 1))
+            y_pos = max(0, min(y_pos, img_height - 1))
                 
-                self._draw_text_manually(draw, lines, x_pos, y_pos, font,
-                                        fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw,
-                                        不透明度, 字符间距, 行间距, 书写方向)
+            self._draw_text_manually(text_layer, lines, x_pos, y_pos, font,
+                                    fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw,
+                                    不透明度, 字符间距, 行间距, 书写方向)
                 
-                pil_image = Image.alpha_composite(pil_image, text_layer)
+            pil_image = Image.alpha_composite(pil_image, text_layer)
             
             processed_images.append(self.pil_to_tensor(pil_image))
         return (torch.cat(processed_images, dim=0), help_text)
@@ -493,6 +653,9 @@ class ZML_AddTextWatermark:
 class ZML_TextToImage:
     # 文本内容在文本图像区域内的缩放比例，提高到0.95以使用更多可用空间
     TEXT_CONTENT_SCALE_PERCENTAGE = 0.95 
+    AUTO_FONT_REFERENCE_SIZE = 128  # 自动字号：在此字号下测量一次字符尺寸，用于预测合适的字号
+    AUTO_FONT_PREDICT_TOLERANCE = 0.04  # 预测结果与 ±4% (至少±2号) 处的预测一致时才直接采用，否则实际排版
+    AUTO_FONT_MIN_PREDICT_SIZE = 16  # 小字号的字形受 hinting 影响，与线性缩放偏差较大，始终实际排版
     NAME_SEPARATOR = "#-#"  # 多图名称分隔符
 
     def __init__(self):
@@ -572,6 +735,7 @@ class ZML_TextToImage:
     RETURN_NAMES = ("图像", "Help")
     FUNCTION = "generate_text_image"
     CATEGORY = "image/ZML_图像/工具" 
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def hex_to_rgba(self, hex_color, opacity):
         hex_color = hex_color.lstrip('#')
@@ -583,14 +747,7 @@ class ZML_TextToImage:
         return (r, g, b, int(opacity * 255))
 
     def _get_char_size(self, char, font):
-        try:
-            bbox = font.getbbox(char)
-            width = max(1, bbox[2] - bbox[0])
-            height = max(1, bbox[3] - bbox[1])
-            return width, height
-        except Exception:
-            w, h = font.getsize(char)
-            return max(1, w), max(1, h)
+        return glyph_cache.char_size(char, font)
 
     def _get_font_line_height(self, font):
         try:
@@ -604,7 +761,10 @@ class ZML_TextToImage:
                 # Final fallback to font size
                 return font.size
 
-    def _prepare_lines(self, text, font, char_spacing, orientation, max_dim=None):
+    def _prepare_lines(self, text, font, char_spacing, orientation, max_dim=None, char_size=None):
+        # char_size(字符) -> (宽, 高)；默认按 font 实际测量，自动字号预测时传入按比例缩放的尺寸
+        if char_size is None:
+            char_size = lambda c: self._get_char_size(c, font)
         manual_lines = text.split('\n')
         
         if max_dim is None or max_dim <= 0:
@@ -644,7 +804,7 @@ class ZML_TextToImage:
                             break
 
                 for item in tokens:
-                    item_width = sum(self._get_char_size(c, font)[0] for c in item) + (max(0, len(item) - 1) * char_spacing)
+                    item_width = sum(char_size(c)[0] for c in item) + (max(0, len(item) - 1) * char_spacing)
                     
                     spacing_to_add = char_spacing if current_line and not item.isspace() else 0
                     
@@ -661,7 +821,7 @@ class ZML_TextToImage:
                             temp_char_line = ''
                             temp_char_width = 0
                             for char in item:
-                                char_w = self._get_char_size(char, font)[0]
+                                char_w = char_size(char)[0]
                                 char_spacing_to_add = char_spacing if temp_char_line else 0
                                 
                                 if temp_char_width + char_spacing_to_add + char_w > effective_max_dim and temp_char_line:
@@ -691,7 +851,7 @@ class ZML_TextToImage:
                 if current_line:
                     result_lines.append(current_line)
             else:  # 竖排
-                char_height = self._get_char_size('一', font)[1]
+                char_height = char_size('一')[1]
                 if char_height == 0: char_height = font.size
                 
                 if char_height + char_spacing > 0:
@@ -706,7 +866,7 @@ class ZML_TextToImage:
                     j = i
                     while j < len(manual_line):
                         char = manual_line[j]
-                        char_h = self._get_char_size(char, font)[1]
+                        char_h = char_size(char)[1]
                         
                         test_height = current_line_height + char_h + (char_spacing if current_line_chars else 0)
                         
@@ -726,7 +886,9 @@ class ZML_TextToImage:
         
         return result_lines
 
-    def _get_text_block_size(self, lines, font, char_spacing, line_spacing, orientation):
+    def _get_text_block_size(self, lines, font, char_spacing, line_spacing, orientation, char_size=None):
+        if char_size is None:
+            char_size = lambda c: self._get_char_size(c, font)
         if not lines:
             return 0, 0
 
@@ -735,17 +897,14 @@ class ZML_TextToImage:
             for i, line in enumerate(lines):
                 line_w = 0
                 if line:
-                    line_w = sum(self._get_char_size(c, font)[0] for c in line) + (max(0, len(line) - 1) * char_spacing)
+                    line_w = sum(char_size(c)[0] for c in line) + (max(0, len(line) - 1) * char_spacing)
                 max_w = max(max_w, line_w)
                 
                 line_height_for_this_line = 0
                 if line:
-                    line_height_for_this_line = max([self._get_char_size(c, font)[1] for c in line])
+                    line_height_for_this_line = max([char_size(c)[1] for c in line])
                 else: 
-                    try:
-                        line_height_for_this_line = max(1, font.getbbox("A")[3] - font.getbbox("A")[1])
-                    except Exception:
-                        line_height_for_this_line = max(1, font.getsize("A")[1] if font.getsize("A") else 1)
+                    line_height_for_this_line = char_size("A")[1]
                 
                 total_h += line_height_for_this_line
                 if i < len(lines) - 1:
@@ -756,17 +915,14 @@ class ZML_TextToImage:
             for i, line in enumerate(lines):
                 line_h = 0
                 if line:
-                    line_h = sum(self._get_char_size(c, font)[1] for c in line) + (max(0, len(line) - 1) * char_spacing)
+                    line_h = sum(char_size(c)[1] for c in line) + (max(0, len(line) - 1) * char_spacing)
                 max_h = max(max_h, line_h)
 
                 line_w = 0
                 if line:
-                    line_w = max([self._get_char_size(c, font)[0] for c in line])
+                    line_w = max([char_size(c)[0] for c in line])
                 else: 
-                    try:
-                        line_w = max(1, font.getbbox("A")[2] - font.getbbox("A")[0])
-                    except Exception:
-                        line_w = max(1, font.getsize("A")[0] if font.getsize("A") else 1)
+                    line_w = char_size("A")[0]
                     
                 total_w += line_w
                 if i < len(lines) - 1:
@@ -774,7 +930,8 @@ class ZML_TextToImage:
             return max(1, total_w), max(1, max_h)
 
 
-    def _draw_text_manually(self, draw, lines, start_x, start_y, font, fill_color_param, stroke_width, stroke_fill_color_param, opacity, char_spacing, line_spacing, orientation):
+    def _draw_text_manually(self, image, lines, start_x, start_y, font, fill_color_param, stroke_width, stroke_fill_color_param, opacity, char_spacing, line_spacing, orientation):
+        draw = ImageDraw.Draw(image)
         cursor_x, cursor_y = start_x, start_y
 
         def get_char_color(base_color_param, current_opacity):
@@ -800,10 +957,8 @@ class ZML_TextToImage:
                     char_fill_color = get_char_color(fill_color_param, opacity)
                     char_stroke_color = get_char_color(stroke_fill_color_param, opacity)
 
-                    draw.text((cursor_x, cursor_y), char, font=font,
-                              fill=char_fill_color,
-                              stroke_width=stroke_width,
-                              stroke_fill=char_stroke_color)
+                    draw_glyph(image, draw, (cursor_x, cursor_y), char, font,
+                               char_fill_color, stroke_width, char_stroke_color)
                     
                     cursor_x += self._get_char_size(char, font)[0] + char_spacing
                 cursor_x = start_x
@@ -823,10 +978,8 @@ class ZML_TextToImage:
                     char_fill_color = get_char_color(fill_color_param, opacity)
                     char_stroke_color = get_char_color(stroke_fill_color_param, opacity)
 
-                    draw.text((cursor_x, cursor_y), char, font=font,
-                              fill=char_fill_color,
-                              stroke_width=stroke_width,
-                              stroke_fill=char_stroke_color)
+                    draw_glyph(image, draw, (cursor_x, cursor_y), char, font,
+                               char_fill_color, stroke_width, char_stroke_color)
                     
                     cursor_y += self._get_char_size(char, font)[1] + char_spacing
                 cursor_y = start_y
@@ -881,6 +1034,16 @@ class ZML_TextToImage:
         total = max(chinese_count + english_count, 1)
         return chinese_count / total, english_count / total
 
+    def _scaled_char_size(self, text, ref_font, ref_size):
+        """在参考字号下测量一次文本用到的字符，返回 fs -> char_size 函数：字符尺寸按字号线性缩放 (四舍五入，至少为1)"""
+        ref_sizes = {c: self._get_char_size(c, ref_font) for c in set(text) | {"A", "一"}}
+
+        def char_size_at(fs):
+            scale = fs / ref_size
+            scaled = {c: (max(1, round(w * scale)), max(1, round(h * scale))) for c, (w, h) in ref_sizes.items()}
+            return scaled.__getitem__
+        return char_size_at
+
     def _auto_adjust_font_size(self, text, user_initial_font_size, target_width, target_height, char_spacing, line_spacing, orientation, stroke_width, font_dir, font_name):
         if not text.strip(): return 1 
 
@@ -890,36 +1053,73 @@ class ZML_TextToImage:
         target_height = max(1, target_height)
         
         base_safety_margin = int(target_height * 0.02) # 2% of target height as base safety
+        max_line_dim = target_width if orientation == "横排" else target_height
         
-        def check_fit(fs):
-            if fs <= 0: return False
+        def load_font(fs):
             try:
-                test_font = ImageFont.truetype(font_path, fs) if font_path else ImageFont.load_default(fs)
+                return load_truetype(font_path, fs) if font_path else load_default_font(fs)
             except Exception:
-                test_font = ImageFont.load_default(max(1,fs)) 
-
-            max_line_dim = target_width if orientation == "横排" else target_height
-            lines = self._prepare_lines(text, test_font, char_spacing, orientation, max_dim=max_line_dim)
-            actual_w, actual_h = self._get_text_block_size(lines, test_font, char_spacing, line_spacing, orientation)
+                return load_default_font(max(1,fs)) 
 
+        def fits(lines, font, char_size=None):
+            actual_w, actual_h = self._get_text_block_size(lines, font, char_spacing, line_spacing, orientation, char_size=char_size)
             return (actual_w + 2 * stroke_width <= target_width) and \
                    (actual_h + 2 * stroke_width + base_safety_margin <= target_height)
 
-        low = 1
-        high = min(4096, max(user_initial_font_size * 2, target_width, target_height, 500)) 
-        
-        best_fit_font_size = 1 
+        def check_fit(fs):
+            if fs <= 0: return False
+            test_font = load_font(fs)
+            lines = self._prepare_lines(text, test_font, char_spacing, orientation, max_dim=max_line_dim)
+            return fits(lines, test_font)
+
+        # 只在参考字号下实际测量一次，二分时用线性缩放后的字符尺寸排版 (不加载字体、不测量字形)
+        ref_size = self.AUTO_FONT_REFERENCE_SIZE
+        ref_font = load_font(ref_size)
+        char_size_at = self._scaled_char_size(text, ref_font, ref_size)
+
+        predicted = {}
+        def predict_fit(fs):
+            if fs not in predicted:
+                char_size = char_size_at(fs)
+                lines = self._prepare_lines(text, ref_font, char_spacing, orientation, max_dim=max_line_dim, char_size=char_size)
+                predicted[fs] = fits(lines, ref_font, char_size)
+            return predicted[fs]
+
+        # 缩放后的字符尺寸与实际字形有舍入误差，"能否放下"的边界 (以及换行造成的反复) 可能偏移一两号。
+        # 预测在附近字号都一致时直接采用；附近有变化时说明处于边界上，改用实际排版
+        def probe_fit(fs):
+            if fs <= self.AUTO_FONT_MIN_PREDICT_SIZE:
+                return check_fit(fs)
+            delta = max(2, math.ceil(fs * self.AUTO_FONT_PREDICT_TOLERANCE))
+            fit = predict_fit(fs)
+            if predict_fit(max(1, fs - delta)) == fit == predict_fit(fs + delta):
+                return fit
+            return check_fit(fs)
+
+        # 换行会让"能否放下"随字号出现反复，二分的结果取决于探测顺序，因此保持原有的二分顺序，只把远离边界的探测换成预测。
+        # "能否放下"随字号单调时，结果与逐字号实际排版的二分相差不超过1号；出现反复时二分本身可能停在任意一段可放下的字号上，
+        # 此时不保证与原结果一致，但结果一定能实际放下 (见 tests/test_auto_font_size.py)
+        def search(fit_fn):
+            low = 1
+            high = min(4096, max(user_initial_font_size * 2, target_width, target_height, 500)) 
+            best = 1
+            while low <= high:
+                mid = (low + high) // 2
+                if fit_fn(mid):
+                    best = mid
+                    low = mid + 1 
+                else:
+                    high = mid - 1 
+            return best
 
-        while low <= high:
-            mid = (low + high) // 2
-            if mid == 0: 
-                low = 1
-                continue
-            if check_fit(mid):
-                best_fit_font_size = mid
-                low = mid + 1 
+        best_fit_font_size = search(probe_fit)
+        
+        # 用实际排版校验结果；仍不符合时退回逐字号实际排版的二分
+        if best_fit_font_size > 1 and not check_fit(best_fit_font_size):
+            if check_fit(best_fit_font_size - 1):
+                best_fit_font_size -= 1
             else:
-                high = mid - 1 
+                best_fit_font_size = search(check_fit)
         
         for i in range(1, 3):
             if check_fit(best_fit_font_size + i):
@@ -1080,8 +1280,8 @@ class ZML_TextToImage:
                 if 图像大小模式 == "根据字体大小决定图像尺寸":
                     final_font_size_iter = 字体大小
                     try:
-                        font_for_sizing = ImageFont.truetype(font_path_base, final_font_size_iter) if font_path_base else ImageFont.load_default(final_font_size_iter)
-                    except Exception: font_for_sizing = ImageFont.load_default(final_font_size_iter)
+                        font_for_sizing = load_truetype(font_path_base, final_font_size_iter) if font_path_base else load_default_font(final_font_size_iter)
+                    except Exception: font_for_sizing = load_default_font(final_font_size_iter)
 
                     lines_for_sizing = self._prepare_lines(current_text_to_draw, font_for_sizing, adjusted_char_spacing, 书写方向)
                     text_block_width, text_block_height = self._get_text_block_size(lines_for_sizing, font_for_sizing, 字符间距, 行间距, 书写方向)
@@ -1106,13 +1306,12 @@ class ZML_TextToImage:
                     final_img_height_iter = 图像高
 
             try:
-                final_font_instance = ImageFont.truetype(font_path_base, final_font_size_iter) if font_path_base else ImageFont.load_default(final_font_size_iter)
+                final_font_instance = load_truetype(font_path_base, final_font_size_iter) if font_path_base else load_default_font(final_font_size_iter)
             except Exception:
                 print(f"ZML_TextToImage: Final font size {final_font_size_iter} could not be loaded for '{字体}'. Falling back to default font.", exc_info=True)
-                final_font_instance = ImageFont.load_default(max(1, final_font_size_iter) if final_font_size_iter > 0 else 10) 
+                final_font_instance = load_default_font(max(1, final_font_size_iter) if final_font_size_iter > 0 else 10) 
 
             text_image_panel = Image.new('RGBA', (max(1, final_img_width_iter), max(1, final_img_height_iter)), current_bg_color_rgba)
-            draw = ImageDraw.Draw(text_image_panel)
 
             # The max_dim for _prepare_lines should be the drawable_area_width/height
             if 书写方向 == "横排":
@@ -1132,7 +1331,7 @@ class ZML_TextToImage:
 
             # 只有当字体颜色不为空或有描边时才绘制文本
             if 颜色.strip() or (文字描边颜色.strip() and stroke_width_for_draw > 0):
-                self._draw_text_manually(draw, final_lines_for_drawing, start_x, start_y, final_font_instance,
+                self._draw_text_manually(text_image_panel, final_lines_for_drawing, start_x, start_y, final_font_instance,
                                         fill_color_for_draw, stroke_width_for_draw, stroke_fill_color_for_draw,
                                         default_opacity, adjusted_char_spacing, adjusted_line_spacing, 书写方向)
             
@@ -1227,6 +1426,7 @@ class ZML_AddImageWatermark:
         os.makedirs(self.counter_dir, exist_ok=True)
         self.counter_file = os.path.join(self.counter_dir, "ImageWatermark.txt")
         self.ensure_counter_file()
+        self.layer_cache = WatermarkLayerCache()
 
     def ensure_counter_file(self):
         try:
@@ -1279,6 +1479,7 @@ class ZML_AddImageWatermark:
     RETURN_NAMES = ("图像", "Help")
     FUNCTION = "add_watermark"
     CATEGORY = "image/ZML_图像/工具" 
+    PROCESS_SAFE = True  # 可在多线程子工作流的进程池模式中运行
 
     def tensor_to_pil(self, tensor):
         return Image.fromarray(np.clip(255. * tensor.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
@@ -1286,89 +1487,85 @@ class ZML_AddImageWatermark:
     def pil_to_tensor(self, pil_image):
         return torch.from_numpy(np.array(pil_image).astype(np.float32) / 255.0).unsqueeze(0)
 
-    def add_watermark(self, 图像, 水印大小比例=0.25, 不透明度=0.7, 位置="右下", 水平边距=20, 垂直边距=20, 全屏水印旋转角度=-30, 全屏水印密度=1.0, 全屏水印间距=10, 水印图像=None):
-        count = self.increment_counter()
-        help_text = (f"你好，欢迎使用ZML图像水印节点~到目前为止，你通过此节点总共添加了{count}次图像水印！！\n祝你使用愉快~")
-
-        # 加载水印图像
-        watermark_img = None
+    def _load_watermark(self, 水印图像):
         if 水印图像 is not None:
             try:
                 # 从输入的图像张量创建水印图像
-                watermark_pil = self.tensor_to_pil(水印图像[0]).convert("RGBA")
-
-                watermark_img = watermark_pil
+                return self.tensor_to_pil(水印图像[0]).convert("RGBA")
             except Exception as e:
                 print(f"水印图像处理失败: {e}")
-                # 如果水印图像处理失败，创建默认水印
-                watermark_img = Image.new('RGBA', (100, 100), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(watermark_img)
-                draw.rectangle([0, 0, 100, 100], fill=(0, 0, 0, 100))
-                draw.text((20, 40), "Watermark", fill=(255, 255, 255, 200))
+        # 如果没有提供水印图像或处理失败，创建一个默认的简单水印
+        watermark_img = Image.new('RGBA', (100, 100), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(watermark_img)
+        draw.rectangle([0, 0, 100, 100], fill=(0, 0, 0, 100))
+        draw.text((20, 40), "Watermark", fill=(255, 255, 255, 200))
+        return watermark_img
+
+    def _prepare_watermark_layer(self, watermark_img, img_width, img_height, 水印大小比例, 不透明度, 位置, 水平边距, 垂直边距, 全屏水印旋转角度, 全屏水印密度):
+        """缩放、调整透明度、旋转并平铺水印，返回 build_watermark_layer 的图层"""
+        # 基于输入图像的大小计算水印尺寸（等比缩放）
+        base_size = min(img_width, img_height)
+        target_size = int(base_size * 水印大小比例)
+        wm_width, wm_height = watermark_img.size
+        
+        # 计算等比缩放的新尺寸
+        ratio = min(target_size / wm_width, target_size / wm_height)
+        new_width = int(wm_width * ratio)
+        new_height = int(wm_height * ratio)
+        resized_watermark = watermark_img.resize((max(1, new_width), max(1, new_height)), Image.Resampling.LANCZOS)
+        wm_width, wm_height = resized_watermark.size
+        
+        # 调整水印透明度
+        if 不透明度 < 1.0:
+            r, g, b, a = resized_watermark.split()
+            a = a.point(lambda p: p * 不透明度)
+            resized_watermark = Image.merge('RGBA', (r, g, b, a))
+
+        # 根据位置添加水印
+        tiles = []
+        if 位置 == "全屏":
+            # 全屏平铺水印
+            try:
+                # 旋转水印图像
+                rot_img = resized_watermark.rotate(全屏水印旋转角度, expand=True, resample=Image.Resampling.BICUBIC)
+                r_width, r_height = rot_img.size
+                # 计算间距
+                sx, sy = int((r_width + 水平边距) / 全屏水印密度), int((r_height + 垂直边距) / 全屏水印密度)
+                sx = max(1, sx); sy = max(1, sy) 
+                # 交错排列水印，与画布有交集的都贴上
+                tiles = [(rot_img, (x, y)) for x, y in staggered_tile_positions(r_width, r_height, img_width, img_height, sx, sy)
+                         if 0 <= x + r_width and 0 <= y + r_height]
+            except Exception as e:
+                print(f"全屏水印处理失败: {e}")
         else:
-            # 如果没有提供水印图像，创建一个默认的简单水印
-            watermark_img = Image.new('RGBA', (100, 100), (0, 0, 0, 0))
-            draw = ImageDraw.Draw(watermark_img)
-            draw.rectangle([0, 0, 100, 100], fill=(0, 0, 0, 100))
-            draw.text((20, 40), "Watermark", fill=(255, 255, 255, 200))
+            # 在指定位置添加水印
+            x_pos = 水平边距 if "左" in 位置 else (img_width - wm_width - 水平边距 if "右" in 位置 else (img_width - wm_width) // 2)
+            y_pos = 垂直边距 if "上" in 位置 else (img_height - wm_height - 垂直边距 if "下" in 位置 else (img_height - wm_height) // 2)
 
-        processed_images = []
-        for img_tensor in 图像:
-            pil_image = self.tensor_to_pil(img_tensor).convert("RGBA")
-            img_width, img_height = pil_image.size
-            
-            # 基于输入图像的大小计算水印尺寸（等比缩放）
-            base_size = min(img_width, img_height)
-            target_size = int(base_size * 水印大小比例)
-            wm_width, wm_height = watermark_img.size
-            
-            # 计算等比缩放的新尺寸
-            ratio = min(target_size / wm_width, target_size / wm_height)
-            new_width = int(wm_width * ratio)
-            new_height = int(wm_height * ratio)
-            resized_watermark = watermark_img.resize((max(1, new_width), max(1, new_height)), Image.Resampling.LANCZOS)
-            wm_width, wm_height = resized_watermark.size
-            
-            # 调整水印透明度
-            if 不透明度 < 1.0:
-                r, g, b, a = resized_watermark.split()
-                a = a.point(lambda p: p * 不透明度)
-                resized_watermark = Image.merge('RGBA', (r, g, b, a))
-
-            # 根据位置添加水印
-            if 位置 == "全屏":
-                # 全屏平铺水印
-                try:
-                    # 旋转水印图像
-                    rot_img = resized_watermark.rotate(全屏水印旋转角度, expand=True, resample=Image.Resampling.BICUBIC)
-                    r_width, r_height = rot_img.size
-                    # 计算间距
-                    sx, sy = int((r_width + 水平边距) / 全屏水印密度), int((r_height + 垂直边距) / 全屏水印密度)
-                    sx = max(1, sx); sy = max(1, sy) 
-                    # 交错排列水印
-                    offset, row_idx = sx // 2, 0
-                    for y in range(-r_height, img_height, sy):
-                        start_x = -r_width + (offset if (row_idx % 2) != 0 else 0)
-                        for x in range(start_x, img_width, sx):
-                            if 0 <= x + r_width and 0 <= y + r_height:
-                                pil_image.paste(rot_img, (x, y), rot_img)
-                        row_idx += 1
-                except Exception as e:
-                    print(f"全屏水印处理失败: {e}")
-            else:
-                # 在指定位置添加水印
-                x_pos = 水平边距 if "左" in 位置 else (img_width - wm_width - 水平边距 if "右" in 位置 else (img_width - wm_width) // 2)
-                y_pos = 垂直边距 if "上" in 位置 else (img_height - wm_height - 垂直边距 if "下" in 位置 else (img_height - wm_height) // 2)
+            # 确保水印在图像范围内
+            x_pos = max(0, min(x_pos, img_width - 1))
+            y_pos = max(0, min(y_pos, img_height - 1))
+            tiles = [(resized_watermark, (x_pos, y_pos))]
+        return build_watermark_layer(img_width, img_height, tiles)
 
-                # 确保水印在图像范围内
-                x_pos = max(0, min(x_pos, img_width - 1))
-                y_pos = max(0, min(y_pos, img_height - 1))
-                
-                # 添加水印到图像
-                pil_image.paste(resized_watermark, (x_pos, y_pos), resized_watermark)
-            
-            processed_images.append(self.pil_to_tensor(pil_image))
-        return (torch.cat(processed_images, dim=0), help_text)
+    def add_watermark(self, 图像, 水印大小比例=0.25, 不透明度=0.7, 位置="右下", 水平边距=20, 垂直边距=20, 全屏水印旋转角度=-30, 全屏水印密度=1.0, 全屏水印间距=10, 水印图像=None):
+        count = self.increment_counter()
+        help_text = (f"你好，欢迎使用ZML图像水印节点~到目前为止，你通过此节点总共添加了{count}次图像水印！！\n祝你使用愉快~")
+
+        # 水印内容按像素摘要区分，同一水印、参数与画布尺寸的图层直接复用，不再重新缩放、旋转、平铺
+        if 水印图像 is not None:
+            wm_array = np.ascontiguousarray(水印图像[0].detach().cpu().numpy())
+            watermark_key = ("image", wm_array.shape, wm_array.dtype.str, hashlib.sha1(wm_array.tobytes()).hexdigest())
+        else:
+            watermark_key = ("default",)
+
+        img_height, img_width = 图像.shape[1], 图像.shape[2]
+        layer_key = (watermark_key, img_width, img_height, 水印大小比例, 不透明度, 位置, 水平边距, 垂直边距, 全屏水印旋转角度, 全屏水印密度)
+        layer = self.layer_cache.get(layer_key, lambda: self._prepare_watermark_layer(
+            self._load_watermark(水印图像), img_width, img_height, 水印大小比例, 不透明度, 位置, 水平边距, 垂直边距, 全屏水印旋转角度, 全屏水印密度))
+
+        # 整批图像一次混合
+        return (blend_watermark_layer(图像, layer), help_text)
 
 # ============================== 节点注册 ==============================
 NODE_CLASS_MAPPINGS = {
@@ -1,48 +1,56 @@
 import torch
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, ImageColor
 import math
 import os
 import re
+import time
 import folder_paths
 import comfy.sd
 import comfy.utils
 import random
+import sys
+import bisect
+import weakref
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 已加载LoRA权重的LRU与按需加载、字体注册表放在共享模块中，与其它节点模块共用
+_zml_dir = os.path.dirname(os.path.abspath(__file__))
+if _zml_dir not in sys.path:
+    sys.path.append(_zml_dir)
+from zml_lora_cache import lora_state_dict_cache, make_lazy_lora_model
+from zml_font_registry import FONT_DIR, list_font_files, load_truetype, load_default_font
 
 # ==========================================
 # 工具函数
 # ==========================================
 
-# 1. 递归查找字体文件
+# 1. 递归查找字体文件 (结果由共享字体注册表缓存，字体目录变化时自动重新扫描)
 def find_font_files():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    font_dir = os.path.join(current_dir, "Font")
-    
-    font_files = []
-    
-    if os.path.exists(font_dir):
-        for root, dirs, files in os.walk(font_dir):
-            for file in files:
-                if file.lower().endswith(('.ttf', '.otf', '.ttc')):
-                    rel_path = os.path.relpath(os.path.join(root, file), font_dir)
-                    font_files.append(rel_path)
+    font_dir = FONT_DIR
+    font_files = list_font_files(font_dir)
     
     if not font_files:
         font_files = ["arial.ttf", "simhei.ttf", "msyh.ttf"]
     
     return font_files, font_dir
 
-# 2. 字体加载
+# 2. 字体加载 (FreeTypeFont 对象按 路径+字号 缓存复用，加载失败的路径也会被记住)
+# 图表标签不需要复杂文字排版，统一使用基础排版：不依赖 Raqm，且文本宽度随字符数单调不减，换行可以预测断点
+_BASIC_LAYOUT = ImageFont.Layout.BASIC if hasattr(ImageFont, "Layout") else ImageFont.LAYOUT_BASIC
+
 def get_font(font_name, size, font_dir):
     if font_dir:
         try:
             font_path = os.path.join(font_dir, font_name)
             if os.path.exists(font_path):
-                return ImageFont.truetype(font_path, size)
+                return load_truetype(font_path, size, layout_engine=_BASIC_LAYOUT)
         except: pass
 
     try:
-        return ImageFont.truetype(font_name, size)
+        return load_truetype(font_name, size, layout_engine=_BASIC_LAYOUT)
     except: pass
 
     system_fonts = [
@@ -53,11 +61,11 @@ def get_font(font_name, size, font_dir):
     ]
     for path in system_fonts:
         try:
-            return ImageFont.truetype(path, size)
+            return load_truetype(path, size, layout_engine=_BASIC_LAYOUT)
         except: continue
             
     try:
-        return ImageFont.load_default()
+        return load_default_font()
     except:
         return None
 
@@ -68,6 +76,30 @@ def text_size(draw, text, font):
     else:
         return draw.textsize(text, font=font)
 
+# 每个字体对象的字符宽度表 {字符: 前进宽度}，字体对象由字体缓存共享，因此这里按对象弱引用缓存
+_glyph_advance_tables = weakref.WeakKeyDictionary()
+
+def _glyph_prefix_widths(text, font):
+    """返回前缀宽度和 prefix[i] = text[:i] 各字符前进宽度之和；字体不支持 getlength 时返回 None"""
+    try:
+        table = _glyph_advance_tables.get(font)
+        if table is None:
+            table = _glyph_advance_tables[font] = {}
+    except TypeError:
+        table = {}
+    prefix = [0.0]
+    total = 0.0
+    for char in text:
+        advance = table.get(char)
+        if advance is None:
+            try:
+                advance = table[char] = font.getlength(char)
+            except Exception:
+                return None
+        total += advance
+        prefix.append(total)
+    return prefix
+
 # 新增：文本自动换行计算函数
 def get_wrapped_text(draw, text, font, max_width):
     if not text:
@@ -76,10 +108,41 @@ def get_wrapped_text(draw, text, font, max_width):
     # 估算单行高度
     _, line_height = text_size(draw, "Wg", font)
     
-    lines = []
+    # 逐字符换行（对没有空格的中文和长文件名同样适用）：每行尽量多放字符，放不下的字符移到下一行，
+    # 单个字符超宽时独占一行。先用字符宽度的前缀和二分预测断点，再用实际排版宽度校正一两次，
+    # 行宽单调时结果与逐字符测量完全一致，但每行只需测量常数次而不是每个字符测量一次。
+    # 基础排版下追加字符不会移动前面的字形 (字距只作用于新字符)，行宽单调；Raqm 排版会做连字和上下文字形替换，
+    # 前缀宽度可能不单调，这类字体 (例如调用方自行加载的字体) 仍逐字符测量
+    prefix = None
+    if "\n" not in text and getattr(font, "layout_engine", None) == _BASIC_LAYOUT:
+        prefix = _glyph_prefix_widths(text, font)
+    if prefix is None:
+        lines = _wrap_text_per_char(draw, text, font, max_width)
+    else:
+        lines = []
+        n = len(text)
+        start = 0
+        while start < n:
+            end = bisect.bisect_right(prefix, prefix[start] + max_width, start + 1) - 1
+            end = min(max(end, start + 1), n)
+            while end < n and text_size(draw, text[start:end + 1], font)[0] <= max_width:
+                end += 1
+            while end > start + 1 and text_size(draw, text[start:end], font)[0] > max_width:
+                end -= 1
+            lines.append(text[start:end])
+            start = end
+    
+    if not lines: lines = [text]
+    
+    # 计算总高度 (行高 + 行间距)
+    line_spacing = int(line_height * 0.1) # 10% 行间距
+    total_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
     
-    # 简单的分词策略：优先按空格分，长文件名可能没空格，需要按字符分
-    # 这里采用一种混合策略，逐字符累加，超过宽度就换行
+    return lines, total_height
+
+def _wrap_text_per_char(draw, text, font, max_width):
+    """逐字符累加测量的换行方式，用于包含换行符、Raqm 排版或字体无法测量单字宽度的情况"""
+    lines = []
     current_line = ""
     for char in text:
         test_line = current_line + char
@@ -92,14 +155,7 @@ def get_wrapped_text(draw, text, font, max_width):
             current_line = char
     if current_line:
         lines.append(current_line)
-    
-    if not lines: lines = [text]
-    
-    # 计算总高度 (行高 + 行间距)
-    line_spacing = int(line_height * 0.1) # 10% 行间距
-    total_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
-    
-    return lines, total_height
+    return lines
 
 COLOR_MAP = {
     "白色": "white", "黑色": "black", "红色": "red", 
@@ -107,6 +163,28 @@ COLOR_MAP = {
     "灰色": "gray", "透明": (0, 0, 0, 0)
 }
 
+# XY LoRA加载器的加载方式：
+# 全部预先加载 - 每格立即生成打好补丁的模型克隆（旧行为）
+# 逐格按需加载 - 每格只输出记录 (LoRA, 强度) 的轻量克隆，采样该格时才打补丁、采样结束即撤销，
+#                显存/内存占用与格子数量无关；不支持的旧版ComfyUI会自动改为预先加载
+XY_LORA_LOAD_MODES = ["全部预先加载", "逐格按需加载(省内存)"]
+_lazy_fallback_warned = False
+
+def xy_lora_patch(model, clip, lora_path, weight, lazy=False):
+    """返回某一格的 (模型, CLIP)。LoRA权重来自共享LRU缓存，多个格子/多次运行之间复用"""
+    global _lazy_fallback_warned
+    if lazy and model is not None:
+        lazy_model = make_lazy_lora_model(model, lora_path, weight)
+        if lazy_model is not None:
+            # CLIP 用于立即编码提示词，仍然立即打补丁
+            if clip is not None:
+                _, clip = comfy.sd.load_lora_for_models(None, clip, lora_state_dict_cache.load(lora_path), 0.0, weight)
+            return lazy_model, clip
+        if not _lazy_fallback_warned:
+            print("ZML_XY_LoRA加载器: 当前ComfyUI不支持逐格按需加载，已改为全部预先加载。")
+            _lazy_fallback_warned = True
+    return comfy.sd.load_lora_for_models(model, clip, lora_state_dict_cache.load(lora_path), weight, weight)
+
 # ==========================================
 # 节点 1: ZML_XY_LoRA加载器
 # ==========================================
@@ -126,6 +204,7 @@ class ZML_XY_LoRA_Loader:
             },
             "optional": {
                 "CLIP": ("CLIP",),
+                "加载方式": (XY_LORA_LOAD_MODES, {"default": XY_LORA_LOAD_MODES[0], "tooltip": "逐格按需加载：采样到某一格时才给模型打LoRA补丁，结束后立即撤销，格子很多时可大幅降低内存占用。"}),
             }
         }
 
@@ -135,7 +214,8 @@ class ZML_XY_LoRA_Loader:
     FUNCTION = "load_batch_loras"
     CATEGORY = "image/ZML_图像/XYZ"
 
-    def load_batch_loras(self, 模型, LoRA文件夹路径, LoRA数量, LoRA权重数量, 权重起始值, 权重结束值, 无LoRA对比, XY互换, CLIP=None):
+    def load_batch_loras(self, 模型, LoRA文件夹路径, LoRA数量, LoRA权重数量, 权重起始值, 权重结束值, 无LoRA对比, XY互换, CLIP=None, 加载方式="全部预先加载"):
+        lazy = 加载方式 == XY_LORA_LOAD_MODES[1]
         folder_path = LoRA文件夹路径.strip().strip('"')
         found_loras = []
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
@@ -198,7 +278,6 @@ class ZML_XY_LoRA_Loader:
         out_clips = []
         cell_image_counts = [] # 这个列表记录每个格子跑几张图。1=正常采样，0=不采样直接复用
         base_model_added = False # 标记原始模型是否已经进过采样队列
-        loaded_cache = {}
 
         for outer_item in outer_loop:
             for inner_item in inner_loop:
@@ -218,26 +297,15 @@ class ZML_XY_LoRA_Loader:
                     continue
                 
                 try:
-                    if current_lora not in loaded_cache:
-                        loaded_cache[current_lora] = comfy.utils.load_torch_file(current_lora)
-                    lora_data = loaded_cache[current_lora]
-                    
-                    if CLIP is not None:
-                        m, c = comfy.sd.load_lora_for_models(模型, CLIP, lora_data, current_weight, current_weight)
-                        out_models.append(m)
-                        out_clips.append(c)
-                    else:
-                        new_model = 模型.clone()
-                        new_model.patch_model_lora(lora_data, current_weight)
-                        out_models.append(new_model)
-                        out_clips.append(None)
+                    m, c = xy_lora_patch(模型, CLIP, current_lora, current_weight, lazy)
+                    out_models.append(m)
+                    out_clips.append(c)
                     cell_image_counts.append(1)
-                except:
+                except Exception as e:
+                    print(f"Error loading LoRA {current_lora}: {e}")
                     out_models.append(模型)
                     out_clips.append(CLIP)
                     cell_image_counts.append(1)
-                    
-        del loaded_cache
 
         grid_info = {
             "x_labels": x_labels,
@@ -349,6 +417,264 @@ class ZML_XY_Prompt_Loader:
         return (out_conds, grid_info)
 
 
+# ==========================================
+# 大图拼接工具：uint8 画布 + 切片赋值，按内容键增量重绘，超大图表写出 Deep Zoom (DZI) 瓦片
+# ==========================================
+XY_GRID_TILE_SIZE = 512
+XY_GRID_TILE_FORMAT = "jpg"
+
+XY_LABEL_STRIP_CACHE_BYTES = 64 * 1024 * 1024  # 已渲染文字条缓存的总字节上限 (按 宽×高×3 计)
+XY_CANVAS_CACHE_MAX_PIXELS = 16_000_000  # 不超过该像素数的图表才在节点上保留常驻画布用于增量重绘
+
+def color_to_rgb(color):
+    """COLOR_MAP 中的颜色名或元组 -> (r, g, b)；透明色在RGB画布上与原先一样按黑色处理"""
+    if isinstance(color, tuple):
+        return tuple(color[:3])
+    return ImageColor.getrgb(color)[:3]
+
+# 图像内容摘要：同一张量对象且未被原地修改时直接复用，上游重新生成但内容相同的图片也能识别为未变化
+_frame_digest_cache = {}  # id(张量) -> (弱引用, 版本号, 形状, [每帧摘要])
+_frame_digest_lock = threading.Lock()
+
+def tensor_frame_digests(tensor):
+    """按帧返回 IMAGE 张量的内容摘要 (sha256)"""
+    key = id(tensor)
+    with _frame_digest_lock:
+        hit = _frame_digest_cache.get(key)
+    if hit is not None and hit[0]() is tensor and hit[1] == tensor._version and hit[2] == tuple(tensor.shape):
+        return hit[3]
+    batch = tensor.unsqueeze(0) if tensor.dim() == 3 else tensor
+    digests = []
+    for frame in batch:
+        arr = np.ascontiguousarray(frame.detach().cpu().float().numpy())
+        h = hashlib.sha256(str(arr.shape).encode())
+        h.update(arr.data)
+        digests.append(h.hexdigest())
+
+    def _drop(_ref, key=key):
+        with _frame_digest_lock:
+            _frame_digest_cache.pop(key, None)
+    with _frame_digest_lock:
+        _frame_digest_cache[key] = (weakref.ref(tensor, _drop), tensor._version, tuple(tensor.shape), digests)
+    return digests
+
+def flatten_image_frames(images, with_digests=False):
+    """展开图像列表为 [(帧张量 (H, W, C), 内容摘要)]；摘要只在需要增量重绘时计算，否则为 None"""
+    frames = []
+    for img_tensor in images:
+        if not isinstance(img_tensor, torch.Tensor) or img_tensor.dim() not in (3, 4):
+            continue
+        if with_digests:
+            digests = tensor_frame_digests(img_tensor)
+        else:
+            digests = [None] * (1 if img_tensor.dim() == 3 else img_tensor.shape[0])
+        if img_tensor.dim() == 3:
+            frames.append((img_tensor, digests[0]))
+        else:
+            frames.extend((img_tensor[i], digests[i]) for i in range(img_tensor.shape[0]))
+    return frames
+
+def scaled_frame_size(frame, scale=1.0):
+    """返回帧按比例缩小后的 (高, 宽)，与 frame_to_uint8 的输出一致"""
+    h, w = frame.shape[0], frame.shape[1]
+    if scale < 1.0:
+        return max(1, round(h * scale)), max(1, round(w * scale))
+    return h, w
+
+def frame_to_uint8(frame, scale=1.0):
+    """单帧转换为 uint8 (H, W, 3) 数组，可按比例缩小，不经过PIL；临时的浮点副本只有一帧大小"""
+    frame = frame.detach().cpu().float()
+    if frame.shape[-1] == 1:
+        frame = frame.expand(-1, -1, 3)
+    frame = frame[..., :3]
+    if scale < 1.0:
+        size = scaled_frame_size(frame, scale)
+        frame = torch.nn.functional.interpolate(frame.permute(2, 0, 1).unsqueeze(0), size=size, mode="area")[0].permute(1, 2, 0)
+    return frame.mul(255).clamp_(0, 255).to(torch.uint8).numpy()
+
+# ==========================================
+# 已渲染文字条缓存：只改动一行标签时，其余标签直接复用
+# ==========================================
+class LabelStripCache:
+    """按总字节数限制的 LRU：Y 轴文字条与行高相同，单条可达数MB，按条数限制会长期占住大量内存"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # 键 -> 只读 uint8 数组
+
+    def get(self, key, render):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is not None:
+                self.entries.move_to_end(key)
+                return hit
+        strip = render()
+        strip.flags.writeable = False
+        if strip.nbytes > self.max_bytes:
+            return strip
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.nbytes
+            self.entries[key] = strip
+            self.total_bytes += strip.nbytes
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+        return strip
+
+label_strip_cache = LabelStripCache(XY_LABEL_STRIP_CACHE_BYTES)
+
+def get_label_strip(font, font_key, width, height, text_items, bg_col, txt_col):
+    """返回 (缓存键, (height, width, 3) 的文字条)，text_items 为 ((x, y, 文本), ...)，坐标相对于文字条左上角。
+    缓存键为 (文本与位置, 字体, 字号, 宽高, 颜色)，同时用作画布图层的内容键。"""
+    key = ("label", font_key, width, height, tuple(text_items), str(bg_col), str(txt_col))
+    def render():
+        strip = Image.new("RGB", (width, height), bg_col)
+        draw = ImageDraw.Draw(strip)
+        for x, y, text in text_items:
+            draw.text((x, y), text, fill=txt_col, font=font)
+        return np.array(strip)
+    return key, label_strip_cache.get(key, render)
+
+class GridComposer:
+    """记录图表的背景色与各图层 (x, y, 宽, 高, 内容键, 数组或生成数组的函数)，按需渲染任意矩形区域。
+    图层按绘制顺序排列 (先文字条，后图片)，生成函数只在图层第一次被渲染到时调用。
+    整图输出时可借助 GridCanvasCache 只重绘内容变化的图层；分块输出时逐行渲染，内存只与一行瓦片有关。"""
+    def __init__(self, width, height, bg_rgb):
+        self.width, self.height = width, height
+        self.bg_rgb = np.array(bg_rgb, dtype=np.uint8)
+        self.layers = []
+
+    def add(self, x, y, array, key=None):
+        if array is not None and array.size:
+            self.layers.append([x, y, array.shape[1], array.shape[0], key, array])
+
+    def add_lazy(self, x, y, width, height, key, source):
+        if width > 0 and height > 0:
+            self.layers.append([x, y, width, height, key, source])
+
+    def layout_key(self):
+        return (self.width, self.height, tuple(self.bg_rgb.tolist()), tuple(tuple(layer[:4]) for layer in self.layers))
+
+    def layer_keys(self):
+        return [layer[4] for layer in self.layers]
+
+    def render(self, x0, y0, x1, y1):
+        region = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        region[...] = self.bg_rgb
+        for layer in self.layers:
+            x, y, w, h = layer[:4]
+            ix0, iy0 = max(x, x0), max(y, y0)
+            ix1, iy1 = min(x + w, x1), min(y + h, y1)
+            if ix0 < ix1 and iy0 < iy1:
+                if callable(layer[5]):
+                    layer[5] = layer[5]()
+                region[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = layer[5][iy0 - y:iy1 - y, ix0 - x:ix1 - x]
+        return region
+
+class GridCanvasCache:
+    """节点持有的常驻画布：布局 (画布尺寸、背景色、各图层位置) 不变时，只重绘内容键变化的图层区域"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.layout_key = None
+        self.layer_keys = None
+        self.canvas = None
+
+    def render(self, composer, keep=True):
+        if not keep:
+            # 不保留常驻画布 (图表过大)：直接整张渲染，并释放上次的画布
+            self.clear()
+            return composer.render(0, 0, composer.width, composer.height)
+        layout_key, layer_keys = composer.layout_key(), composer.layer_keys()
+        if self.canvas is None or layout_key != self.layout_key or len(layer_keys) != len(self.layer_keys):
+            self.canvas = composer.render(0, 0, composer.width, composer.height)
+        else:
+            for layer, key, old_key in zip(composer.layers, layer_keys, self.layer_keys):
+                if key is not None and key == old_key:
+                    continue
+                x0, y0 = max(layer[0], 0), max(layer[1], 0)
+                x1, y1 = min(layer[0] + layer[2], composer.width), min(layer[1] + layer[3], composer.height)
+                if x0 < x1 and y0 < y1:
+                    self.canvas[y0:y1, x0:x1] = composer.render(x0, y0, x1, y1)
+        self.layout_key, self.layer_keys = layout_key, layer_keys
+        return self.canvas
+
+class DziPyramidWriter:
+    """逐行接收最高层级的图像条，写出该层瓦片并逐级缩小生成上层，每一层最多缓存两行瓦片。
+    同时把 preview_level 层拼成预览图返回。"""
+    def __init__(self, files_dir, width, height, preview_level, tile_size=XY_GRID_TILE_SIZE, fmt=XY_GRID_TILE_FORMAT):
+        self.files_dir = files_dir
+        self.width, self.height = width, height
+        self.tile_size, self.fmt = tile_size, fmt
+        self.max_level = max(0, math.ceil(math.log2(max(width, height, 1))))
+        self.preview_level = preview_level
+        pw, ph = self.level_size(preview_level)
+        self.preview = np.empty((ph, pw, 3), dtype=np.uint8)
+        self.pending = {}
+
+    def level_size(self, level):
+        scale = 2 ** (self.max_level - level)
+        return -(-self.width // scale), -(-self.height // scale)
+
+    def add_row(self, level, row_idx, strip):
+        ts = self.tile_size
+        level_dir = os.path.join(self.files_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        for col_idx in range(-(-strip.shape[1] // ts)):
+            tile = Image.fromarray(strip[:, col_idx * ts:(col_idx + 1) * ts])
+            tile.save(os.path.join(level_dir, f"{col_idx}_{row_idx}.{self.fmt}"), quality=90)
+        if level == self.preview_level:
+            self.preview[row_idx * ts:row_idx * ts + strip.shape[0]] = strip
+        if level == 0:
+            return
+        pending = self.pending.setdefault(level, [])
+        pending.append(strip)
+        last_row = (row_idx + 1) * ts >= self.level_size(level)[1]
+        if len(pending) == 2 or last_row:
+            block = np.concatenate(pending, axis=0) if len(pending) > 1 else pending[0]
+            self.pending[level] = []
+            parent_w, parent_h = self.level_size(level - 1)
+            parent_row = row_idx // 2
+            target_h = min(ts, parent_h - parent_row * ts)
+            resized = Image.fromarray(block).resize((parent_w, target_h), Image.LANCZOS)
+            self.add_row(level - 1, parent_row, np.asarray(resized))
+
+def write_grid_dzi(composer, pixel_budget, name_prefix="ZML_XYZ"):
+    """把超大图表写为 output/ZML_XYZ/<名称>.dzi 与 <名称>_files/，返回 (dzi路径, 不超过像素上限的预览数组)"""
+    out_dir = os.path.join(folder_paths.get_output_directory(), "ZML_XYZ")
+    os.makedirs(out_dir, exist_ok=True)
+    name = f"{name_prefix}_{time.strftime('%Y%m%d_%H%M%S')}"
+    counter = 1
+    while os.path.exists(os.path.join(out_dir, name + ".dzi")):
+        name = f"{name_prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{counter}"
+        counter += 1
+
+    w, h = composer.width, composer.height
+    max_level = max(0, math.ceil(math.log2(max(w, h, 1))))
+    preview_level = max_level
+    while preview_level > 0:
+        scale = 2 ** (max_level - preview_level)
+        if (-(-w // scale)) * (-(-h // scale)) <= pixel_budget:
+            break
+        preview_level -= 1
+
+    writer = DziPyramidWriter(os.path.join(out_dir, name + "_files"), w, h, preview_level)
+    ts = writer.tile_size
+    for row_idx in range(-(-h // ts)):
+        y0 = row_idx * ts
+        writer.add_row(max_level, row_idx, composer.render(0, y0, w, min(y0 + ts, h)))
+
+    dzi_path = os.path.join(out_dir, name + ".dzi")
+    with open(dzi_path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{ts}" Overlap="0" Format="{writer.fmt}">'
+                f'<Size Width="{w}" Height="{h}"/></Image>\n')
+    return dzi_path, writer.preview
+
 # ==========================================
 # 节点 3: ZML_XY_图表拼接
 # ==========================================
@@ -367,6 +693,10 @@ class ZML_XY_Grid_Drawer:
                 "背景颜色": (list(COLOR_MAP.keys()), {"default": "白色"}),
                 "文字颜色": (list(COLOR_MAP.keys()), {"default": "黑色"}),
                 "单元格图片排布": (["横向排列", "竖向排列"], {"default": "横向排列", "tooltip": "一个单元格内有多张图时，它们的排列方向"}),
+            },
+            "optional": {
+                "单元格缩放": ("FLOAT", {"default": 1.0, "min": 0.05, "max": 1.0, "step": 0.05, "tooltip": "拼接前按比例缩小每张图片，用于预览大尺寸、格子很多的图表"}),
+                "分块输出阈值": ("INT", {"default": 0, "min": 0, "max": 100000, "tooltip": "单位：百万像素。图表超过该像素数时写出 Deep Zoom (DZI) 瓦片到 output/ZML_XYZ，节点只返回不超过该像素数的预览图；0为不限制"}),
             }
         }
 
@@ -376,7 +706,11 @@ class ZML_XY_Grid_Drawer:
     FUNCTION = "draw_grid"
     CATEGORY = "image/ZML_图像/XYZ"
 
-    def draw_grid(self, 图像, 图表信息, 字体, 字体大小, 网格间距, 背景颜色, 文字颜色, 单元格图片排布):
+    def __init__(self):
+        # 常驻画布：只改动部分标签或格子时，只重绘变化的区域
+        self.canvas_cache = GridCanvasCache()
+
+    def draw_grid(self, 图像, 图表信息, 字体, 字体大小, 网格间距, 背景颜色, 文字颜色, 单元格图片排布, 单元格缩放=1.0, 分块输出阈值=0):
         def to_scalar(v, default=None):
             if isinstance(v, list): return v[0] if len(v) > 0 else default
             return v
@@ -387,22 +721,23 @@ class ZML_XY_Grid_Drawer:
         txt_name = to_scalar(文字颜色)
         font_name = to_scalar(字体)
         cell_layout = to_scalar(单元格图片排布)
+        cell_scale = to_scalar(单元格缩放, 1.0) or 1.0
+        tile_budget = int((to_scalar(分块输出阈值, 0) or 0) * 1_000_000)
 
-        pil_images_batch = []
-        for img_tensor in 图像:
-            if isinstance(img_tensor, torch.Tensor):
-                if len(img_tensor.shape) == 4:
-                    for i in range(img_tensor.shape[0]):
-                        pil_images_batch.append(Image.fromarray(np.clip(255. * img_tensor[i].cpu().numpy(), 0, 255).astype(np.uint8)))
-                elif len(img_tensor.shape) == 3:
-                    pil_images_batch.append(Image.fromarray(np.clip(255. * img_tensor.cpu().numpy(), 0, 255).astype(np.uint8)))
-            else:
-                pil_images_batch.append(Image.fromarray(np.clip(255. * img_tensor.cpu().numpy(), 0, 255).astype(np.uint8)))
+        # 每帧只在需要绘制时才直接转为 uint8 数组，用切片赋值拼到画布上，不再逐张转换成PIL图像
+        image_frames = flatten_image_frames(图像)
 
-        if not pil_images_batch:
+        if not image_frames:
             return (torch.zeros(1, 64, 64, 3),)
 
-        first_img_h, first_img_w = pil_images_batch[0].height, pil_images_batch[0].width
+        first_img_h, first_img_w = scaled_frame_size(image_frames[0][0], cell_scale)
+        frame_arrays = {}
+        def frame_source(index):
+            def load():
+                if index not in frame_arrays:
+                    frame_arrays[index] = frame_to_uint8(image_frames[index][0], cell_scale)
+                return frame_arrays[index]
+            return load
 
         info = 图表信息[0] if isinstance(图表信息, list) else 图表信息
         x_labels = info.get("x_labels", [])
@@ -521,14 +856,22 @@ class ZML_XY_Grid_Drawer:
 
         canvas_w = sidebar_w + grid_content_w + margin * 2
         canvas_h = header_h + grid_content_h + margin * 2
+
+        # 分块输出或图表过大时不保留常驻画布，也就不必计算每帧的内容摘要
+        tiled = tile_budget > 0 and canvas_w * canvas_h > tile_budget
+        keep_canvas = not tiled and canvas_w * canvas_h <= XY_CANVAS_CACHE_MAX_PIXELS
+        if keep_canvas:
+            image_frames = flatten_image_frames(图像, with_digests=True)
         
         bg_col = COLOR_MAP.get(bg_name, "white")
         txt_col = COLOR_MAP.get(txt_name, "black")
         
-        canvas = Image.new("RGB", (canvas_w, canvas_h), bg_col)
-        draw = ImageDraw.Draw(canvas)
+        # 只有标签文字条用PIL绘制 (按内容缓存)，图片区域直接写入 uint8 画布
+        composer = GridComposer(canvas_w, canvas_h, color_to_rgb(bg_col))
+        header_strip_h = min(header_h + margin, canvas_h)
+        font_key = (font_name, font_size, getattr(font, "path", None))
         
-        _, one_line_h = text_size(draw, "Mg", font)
+        _, one_line_h = text_size(dummy_draw, "Mg", font)
         line_spacing = int(one_line_h * 0.1)
 
         # === 绘制左上角角标 ===
@@ -537,7 +880,8 @@ class ZML_XY_Grid_Drawer:
             cy = margin + (header_h - margin*2 - corner_h) // 2
             cx = max(cx, 0)
             cy = max(cy, 0)
-            draw.text((cx, cy), corner_text, fill=txt_col, font=font)
+            key, strip = get_label_strip(font, font_key, sidebar_w, header_strip_h, ((cx, cy, corner_text),), bg_col, txt_col)
+            composer.add(0, 0, strip, key)
 
         # 绘制 X 轴标签 (应用换行逻辑)
         current_x = sidebar_w + margin
@@ -550,13 +894,16 @@ class ZML_XY_Grid_Drawer:
             block_y_start = margin + (header_h - margin*2 - total_text_h) // 2
             
             current_line_y = block_y_start
+            text_items = []
             for line in lines:
-                lw, lh = text_size(draw, line, font)
-                # 水平居中
-                line_x = current_x + (col_width - lw) // 2
-                draw.text((line_x, current_line_y), line, fill=txt_col, font=font)
+                lw, lh = text_size(dummy_draw, line, font)
+                # 水平居中 (坐标相对于该列的文字条)
+                line_x = (col_width - lw) // 2
+                text_items.append((line_x, current_line_y, line))
                 current_line_y += one_line_h + line_spacing
 
+            key, strip = get_label_strip(font, font_key, col_width, header_strip_h, tuple(text_items), bg_col, txt_col)
+            composer.add(current_x, 0, strip, key)
             current_x += col_width + margin
 
         # 绘制 Y 轴标签
@@ -574,16 +921,19 @@ class ZML_XY_Grid_Drawer:
             block_y_start = current_y + (row_height - total_text_h) // 2
             
             current_line_y = block_y_start
+            text_items = []
             for line in lines:
-                lw, lh = text_size(draw, line, font)
-                # 水平居中于Sidebar
+                lw, lh = text_size(dummy_draw, line, font)
+                # 水平居中于Sidebar (坐标相对于该行的文字条)
                 line_x = margin + (sidebar_w - margin*2 - lw) // 2 
-                draw.text((line_x, current_line_y), line, fill=txt_col, font=font)
+                text_items.append((line_x, current_line_y - current_y, line))
                 current_line_y += one_line_h + line_spacing
                 
+            key, strip = get_label_strip(font, font_key, sidebar_w, row_height, tuple(text_items), bg_col, txt_col)
+            composer.add(0, current_y, strip, key)
             current_y += row_height + margin
 
-        # 绘制图片
+        # 绘制图片 (只记录位置，渲染时按区域切片复制)
         current_image_batch_idx = 0
         for r_idx in range(rows):
             for c_idx in range(cols):
@@ -601,30 +951,40 @@ class ZML_XY_Grid_Drawer:
                 
                 if num_images_in_cell == 0:
                     # 复用第一张图
-                    canvas.paste(pil_images_batch[0], (cell_start_x + (current_cell_actual_w-first_img_w)//2, cell_start_y + (current_cell_actual_h-first_img_h)//2 ))
+                    composer.add_lazy(cell_start_x + (current_cell_actual_w-first_img_w)//2, cell_start_y + (current_cell_actual_h-first_img_h)//2,
+                                      first_img_w, first_img_h, (image_frames[0][1], cell_scale), frame_source(0))
                 else:
                     for k in range(num_images_in_cell):
-                        if current_image_batch_idx >= len(pil_images_batch):
+                        if current_image_batch_idx >= len(image_frames):
                             break
                         
-                        pil_img = pil_images_batch[current_image_batch_idx]
+                        frame, digest = image_frames[current_image_batch_idx]
+                        frame_h, frame_w = scaled_frame_size(frame, cell_scale)
                         
                         if cell_layout == "横向排列":
                             paste_x = cell_start_x + sub_img_x_offset
-                            paste_y = cell_start_y + (current_cell_actual_h - pil_img.height) // 2
-                            sub_img_x_offset += pil_img.width + margin
+                            paste_y = cell_start_y + (current_cell_actual_h - frame_h) // 2
+                            sub_img_x_offset += frame_w + margin
                         else:
-                            paste_x = cell_start_x + (current_cell_actual_w - pil_img.width) // 2
+                            paste_x = cell_start_x + (current_cell_actual_w - frame_w) // 2
                             paste_y = cell_start_y + sub_img_y_offset
-                            sub_img_y_offset += pil_img.height + margin
+                            sub_img_y_offset += frame_h + margin
                         
-                        canvas.paste(pil_img, (paste_x, paste_y))
+                        composer.add_lazy(paste_x, paste_y, frame_w, frame_h, (digest, cell_scale), frame_source(current_image_batch_idx))
                         current_image_batch_idx += 1
                 
                 current_image_batch_idx += (cell_image_counts[linear_idx] - num_images_in_cell)
                 if current_image_batch_idx < 0 : current_image_batch_idx = 0
 
-        return (torch.from_numpy(np.array(canvas).astype(np.float32) / 255.0).unsqueeze(0),)
+        # 超过分块阈值时逐行渲染写出瓦片，只返回预览图，避免生成数GB的整张画布
+        if tiled:
+            self.canvas_cache.clear()
+            dzi_path, canvas = write_grid_dzi(composer, tile_budget)
+            print(f"ZML_XY_图表拼接: 图表尺寸 {canvas_w}x{canvas_h} 超过分块阈值，已写出瓦片: {dzi_path}")
+        else:
+            canvas = self.canvas_cache.render(composer, keep=keep_canvas)
+
+        return (torch.from_numpy(canvas).float().div_(255.0).unsqueeze(0),)
 
 # ==========================================
 # 节点 4: ZML_XY_采样参数 (CFG & Steps)
@@ -726,6 +1086,9 @@ class ZML_XY_LoRA_Loader_V2:
                 "多行文本": ("STRING", {"default": "", "multiline": True, "placeholder": "节点会读取LoRA的子文件夹'zml'里的同名txt文件。若不存在，则读取LoRA相同目录下的同名txt文件。"}),
                 "txt联结方式": (["全部内容", "每行独立"], {"default": "全部内容", "tooltip": "每行独立是将txt里的每一行都独立输出，如果txt里有三行提示词，那就会输出三份条件"}),
                 "XY互换": ("BOOLEAN", {"default": False, "label_on": "(X=权重, Y=LoRA)", "label_off": "(X=LoRA, Y=权重)"}),
+            },
+            "optional": {
+                "加载方式": (XY_LORA_LOAD_MODES, {"default": XY_LORA_LOAD_MODES[0], "tooltip": "逐格按需加载：采样到某一格时才给模型打LoRA补丁，结束后立即撤销，格子很多时可大幅降低内存占用。"}),
             }
         }
 
@@ -735,7 +1098,8 @@ class ZML_XY_LoRA_Loader_V2:
     FUNCTION = "load_batch_loras_v2"
     CATEGORY = "image/ZML_图像/XYZ"
 
-    def load_batch_loras_v2(self, 模型, CLIP, LoRA文件夹路径, LoRA数量, LoRA权重数量, 权重起始值, 权重结束值, 无LoRA对比, 多行文本, txt联结方式, XY互换):
+    def load_batch_loras_v2(self, 模型, CLIP, LoRA文件夹路径, LoRA数量, LoRA权重数量, 权重起始值, 权重结束值, 无LoRA对比, 多行文本, txt联结方式, XY互换, 加载方式="全部预先加载"):
+        lazy = 加载方式 == XY_LORA_LOAD_MODES[1]
         folder_path = LoRA文件夹路径.strip().strip('"')
         found_loras = []
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
@@ -795,7 +1159,6 @@ class ZML_XY_LoRA_Loader_V2:
 
         out_models = []
         out_conds = []
-        loaded_cache = {}
         
         cell_image_counts = []
         base_model_added = False # 标记原始模型是否已经进过采样队列
@@ -882,11 +1245,7 @@ class ZML_XY_LoRA_Loader_V2:
                 
                 if current_lora is not None:
                     try:
-                        if current_lora not in loaded_cache:
-                            loaded_cache[current_lora] = comfy.utils.load_torch_file(current_lora)
-                        lora_data = loaded_cache[current_lora]
-                        
-                        m, c_patched = comfy.sd.load_lora_for_models(模型, CLIP, lora_data, current_weight, current_weight)
+                        m, c_patched = xy_lora_patch(模型, CLIP, current_lora, current_weight, lazy)
                         current_model = m
                         current_patched_clip = c_patched
                     except Exception as e:
@@ -903,8 +1262,6 @@ class ZML_XY_LoRA_Loader_V2:
                     tokens = current_patched_clip.tokenize(prompt_text)
                     cond, pooled = current_patched_clip.encode_from_tokens(tokens, return_pooled=True)
                     out_conds.append([[cond, {"pooled_output": pooled}]])
-                    
-        del loaded_cache
 
         grid_info = {
             "x_labels": x_labels,
@@ -957,6 +1314,10 @@ class ZML_XY_Custom_Grid:
     def IS_CHANGED(cls, **kwargs):
         return float("nan")
 
+    def __init__(self):
+        # 常驻内容画布：布局不变时只重绘图片或标签发生变化的格子
+        self.content_cache = {"layout": None, "canvas": None, "cells": None}
+
     def _parse_color(self, color_str, default_color=(0, 0, 0, 0)):
         if not color_str:
             return default_color
@@ -1015,20 +1376,10 @@ class ZML_XY_Custom_Grid:
         inner_border_col = self._parse_color(内边框颜色, (0, 0, 0, 0))
         outer_border_col = self._parse_color(外边框颜色, (0, 0, 0, 0))
 
-        # 3. 图像展开
-        flattened_images = []
+        # 3. 图像展开 (内容摘要在确定保留常驻画布后才计算)
         if not isinstance(图像, list):
             图像 = [图像]
-            
-        for img in 图像:
-            if isinstance(img, torch.Tensor):
-                if len(img.shape) == 4:
-                    for i in range(img.shape[0]):
-                        flattened_images.append(img[i])
-                elif len(img.shape) == 3:
-                    flattened_images.append(img)
-            else:
-                pass
+        flattened_images = flatten_image_frames(图像)
 
         num_images = len(flattened_images)
         if num_images == 0:
@@ -1053,23 +1404,27 @@ class ZML_XY_Custom_Grid:
         if font is None: font = ImageFont.load_default()
         dummy_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
 
+        # 图片尺寸直接取自张量，只有需要重绘的格子才转换为PIL图像
         max_img_w, max_img_h = 0, 0
-        pil_images = []
-        for tensor in flattened_images:
-            img_np = np.clip(255. * tensor.cpu().numpy(), 0, 255).astype(np.uint8)
-            pil = Image.fromarray(img_np).convert("RGBA")
-            pil_images.append(pil)
-            max_img_w = max(max_img_w, pil.width)
-            max_img_h = max(max_img_h, pil.height)
+        for tensor, _ in flattened_images:
+            max_img_w = max(max_img_w, tensor.shape[1])
+            max_img_h = max(max_img_h, tensor.shape[0])
 
         max_text_h = 0
         text_padding = 0
+        # 标签文字超出格子时，只有按顺序全部重绘才能得到相同的覆盖结果
+        labels_overflow = False
         
         if 类型 != "无":
             for txt in labels:
                 if txt:
-                    _, th = text_size(dummy_draw, str(txt), font)
+                    tw, th = text_size(dummy_draw, str(txt), font)
                     max_text_h = max(max_text_h, th)
+                    if hasattr(dummy_draw, "textbbox"):
+                        ink = dummy_draw.textbbox(((max_img_w - tw) // 2, 0), str(txt), font=font)
+                        labels_overflow = labels_overflow or ink[0] < 0 or ink[1] < 0 or ink[2] > max_img_w
+                    else:
+                        labels_overflow = labels_overflow or tw > max_img_w
             
             if max_text_h > 0:
                 text_padding = max(30, int(字体大小 * 0.50))
@@ -1099,10 +1454,32 @@ class ZML_XY_Custom_Grid:
         
         # --- 绘制逻辑 ---
         
-        content_canvas = Image.new("RGBA", (content_w, content_h), inner_border_col)
+        # 布局与上次相同且没有超出格子的标签时，沿用上次的内容画布，只重绘 (图片摘要, 标签) 变化的格子；
+        # 标签超出格子或画布过大时不保留画布，也不计算内容摘要
+        layout_key = (content_w, content_h, cell_w, cell_h, cols, rows, num_images, 拼接方向, 内边框大小,
+                      inner_border_col, bg_col, txt_col, 字体, 字体大小, max_img_h, max_text_h, text_padding)
+        cache = self.content_cache
+        keep_canvas = not labels_overflow and content_w * content_h <= XY_CANVAS_CACHE_MAX_PIXELS
+        if keep_canvas:
+            flattened_images = flatten_image_frames(图像, with_digests=True)
+            cell_keys = [(digest, label_text) for (_, digest), label_text in zip(flattened_images, labels)]
+        incremental = keep_canvas and cache["canvas"] is not None and cache["layout"] == layout_key
+        
+        if incremental:
+            content_canvas = cache["canvas"]
+            dirty_cells = [idx for idx, key in enumerate(cell_keys) if key != cache["cells"][idx]]
+        else:
+            content_canvas = Image.new("RGBA", (content_w, content_h), inner_border_col)
+            dirty_cells = range(num_images)
         draw_content = ImageDraw.Draw(content_canvas)
+        # 格子背景按半开区间 [x, x + cell_w) 填充，不会画到相邻格子或内边框上，增量与全部重绘结果一致
+        cell_fill = bg_col if bg_col[3] > 0 else (0, 0, 0, 0)
         
-        for idx, (pil_img, label_text) in enumerate(zip(pil_images, labels)):
+        for idx in dirty_cells:
+            tensor, _ = flattened_images[idx]
+            label_text = labels[idx]
+            pil_img = Image.fromarray(np.clip(255. * tensor.cpu().numpy(), 0, 255).astype(np.uint8)).convert("RGBA")
+            
             if 拼接方向 == "右": c, r = idx % cols, idx // cols
             elif 拼接方向 == "左": c, r = idx % cols, idx // cols
             elif 拼接方向 in ["下", "上"]: r, c = idx % rows, idx // rows
@@ -1110,9 +1487,7 @@ class ZML_XY_Custom_Grid:
             x = c * (cell_w + 内边框大小)
             y = r * (cell_h + 内边框大小)
 
-            content_canvas.paste((0, 0, 0, 0), (x, y, x + cell_w, y + cell_h))
-            if bg_col[3] > 0:
-                draw_content.rectangle([x, y, x + cell_w, y + cell_h], fill=bg_col)
+            content_canvas.paste(cell_fill, (x, y, x + cell_w, y + cell_h))
 
             if label_text:
                 tw, th = text_size(draw_content, str(label_text), font)
@@ -1127,7 +1502,7 @@ class ZML_XY_Custom_Grid:
             content_canvas.paste(pil_img, (img_x, img_y), pil_img if pil_img.mode == 'RGBA' else None)
 
         total_slots = cols * rows
-        if num_images < total_slots:
+        if num_images < total_slots and not incremental:
             for idx in range(num_images, total_slots):
                 if 拼接方向 == "右": c, r = idx % cols, idx // cols
                 elif 拼接方向 == "左": c, r = idx % cols, idx // cols
@@ -1136,9 +1511,12 @@ class ZML_XY_Custom_Grid:
                 x = c * (cell_w + 内边框大小)
                 y = r * (cell_h + 内边框大小)
                 
-                content_canvas.paste((0, 0, 0, 0), (x, y, x + cell_w, y + cell_h))
-                if bg_col[3] > 0:
-                    draw_content.rectangle([x, y, x + cell_w, y + cell_h], fill=bg_col)
+                content_canvas.paste(cell_fill, (x, y, x + cell_w, y + cell_h))
+
+        if keep_canvas:
+            cache["layout"], cache["canvas"], cache["cells"] = layout_key, content_canvas, cell_keys
+        else:
+            cache["layout"], cache["canvas"], cache["cells"] = None, None, None
 
         final_canvas = Image.new("RGBA", (total_w, total_h), (0, 0, 0, 0))
         draw_final = ImageDraw.Draw(final_canvas)
@@ -1170,6 +1548,9 @@ class ZML_XY_LoRA_Loader_V3:
                 "固定提示词": ("STRING", {"default": "", "multiline": False}),
                 "多行变量提示词": ("STRING", {"default": "", "multiline": True}),
                 "XY互换": ("BOOLEAN", {"default": False, "label_on": "(X=提示词, Y=LoRA)", "label_off": "(X=LoRA, Y=提示词)"}),
+            },
+            "optional": {
+                "加载方式": (XY_LORA_LOAD_MODES, {"default": XY_LORA_LOAD_MODES[0], "tooltip": "逐格按需加载：采样到某一格时才给模型打LoRA补丁，结束后立即撤销，格子很多时可大幅降低内存占用。"}),
             }
         }
 
@@ -1179,7 +1560,8 @@ class ZML_XY_LoRA_Loader_V3:
     FUNCTION = "load_batch_loras_v3"
     CATEGORY = "image/ZML_图像/XYZ"
 
-    def load_batch_loras_v3(self, 模型, CLIP, LoRA文件夹路径, LoRA数量, LoRA权重, 无LoRA对比, 固定提示词, 多行变量提示词, XY互换):
+    def load_batch_loras_v3(self, 模型, CLIP, LoRA文件夹路径, LoRA数量, LoRA权重, 无LoRA对比, 固定提示词, 多行变量提示词, XY互换, 加载方式="全部预先加载"):
+        lazy = 加载方式 == XY_LORA_LOAD_MODES[1]
         # 1. 扫描 LoRA 文件
         folder_path = LoRA文件夹路径.strip().strip('"')
         found_loras = []
@@ -1236,7 +1618,6 @@ class ZML_XY_LoRA_Loader_V3:
 
         out_models = []
         out_conds = []
-        loaded_cache = {}
 
         # 5. 循环生成模型和条件对
         for outer_item in outer_loop:
@@ -1249,11 +1630,7 @@ class ZML_XY_LoRA_Loader_V3:
                 
                 if current_lora is not None:
                     try:
-                        if current_lora not in loaded_cache:
-                            loaded_cache[current_lora] = comfy.utils.load_torch_file(current_lora)
-                        lora_data = loaded_cache[current_lora]
-                        
-                        m, c = comfy.sd.load_lora_for_models(模型, CLIP, lora_data, LoRA权重, LoRA权重)
+                        m, c = xy_lora_patch(模型, CLIP, current_lora, LoRA权重, lazy)
                         current_model = m
                         current_clip = c
                     except Exception as e:
@@ -1272,8 +1649,6 @@ class ZML_XY_LoRA_Loader_V3:
                 out_models.append(current_model)
                 out_conds.append([[cond, {"pooled_output": pooled}]])
 
-        del loaded_cache
-
         grid_info = {
             "x_labels": x_labels,
             "y_labels": y_labels,